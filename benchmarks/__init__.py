@@ -0,0 +1,4 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Benchmarks for reviewcheck, run from the repository root."""
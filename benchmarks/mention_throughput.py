@@ -0,0 +1,52 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Benchmark the throughput of mention matching on large note bodies.
+
+Compares MentionMatcher with the substring test that used to be done
+once per handle, for a growing number of handles.
+
+Run from the repository root:
+
+    python -m benchmarks.mention_throughput
+"""
+import random
+import timeit
+from typing import List
+
+from benchmarks import synthetic
+from reviewcheck.mentions import MentionMatcher
+
+BODY_SIZE = 1024 * 1024
+HANDLE_COUNTS = [1, 5, 20]
+
+
+def substring_search(handles: List[str], body: str) -> bool:
+    """Search for the handles the way it used to be done."""
+    return any(("@" + handle) in body for handle in handles)
+
+
+def main() -> None:
+    """Print the throughput in MiB/s of each approach."""
+    rng = random.Random(0)
+    body = synthetic.body(BODY_SIZE, rng) + " @someone-else"
+    size_mib = len(body) / 1024 / 1024
+
+    print(f"{'handles':>8} {'substring (MiB/s)':>18} {'matcher (MiB/s)':>16}")
+    for count in HANDLE_COUNTS:
+        handles = [f"user{i}" for i in range(count)]
+        matcher = MentionMatcher(handles)
+        substring_time = min(
+            timeit.repeat(lambda: substring_search(handles, body), number=5, repeat=3)
+        )
+        matcher_time = min(
+            timeit.repeat(lambda: matcher.is_mentioned(body), number=5, repeat=3)
+        )
+        print(
+            f"{count:>8} {5 * size_mib / substring_time:>18.0f}"
+            f" {5 * size_mib / matcher_time:>16.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
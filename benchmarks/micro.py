@@ -0,0 +1,207 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Micro-benchmarks of the CPU cost of classifying and rendering MRs.
+
+Each case is timed relative to a fixed reference workload, so that the
+numbers can be compared between machines. The relative times are
+stored in micro_baseline.json, and tests/test_benchmarks.py fails when
+a case has become slower than its baseline by more than the tolerance
+stored with it.
+
+Run from the repository root to print the numbers:
+
+    python -m benchmarks.micro
+
+and to store them as the new baseline after an intended change:
+
+    python -m benchmarks.micro --update
+"""
+import argparse
+import io
+import json
+import time
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from rich.console import Console
+
+from benchmarks import synthetic
+from reviewcheck.constants import Constants
+from reviewcheck.folding import NoteFolder
+from reviewcheck.jira import JiraExtractor
+from reviewcheck.merge_request import MergeRequest
+from reviewcheck.rich_components import RichGenerator
+from reviewcheck.utils import Utils
+
+BASELINE_PATH = Path(__file__).with_name("micro_baseline.json")
+
+# How much slower than the baseline a case may be, as a share of the
+# baseline, before it counts as a regression
+TOLERANCE = 1.0
+
+# Each case is called repeatedly for about this many seconds per
+# measurement, and the fastest of REPEAT measurements is used
+TARGET_TIME = 0.02
+REPEAT = 5
+
+
+class NullFile(io.StringIO):
+    """A file that throws away everything written to it."""
+
+    def write(self, s: str) -> int:
+        """Discard the text."""
+        return len(s)
+
+
+def reference() -> int:
+    """Do a fixed amount of plain Python work to time the others by."""
+    counts: Dict[str, int] = {}
+    for i in range(2000):
+        key = str(i % 97)
+        counts[key] = counts.get(key, 0) + i
+    return sum(counts.values())
+
+
+def cases() -> Dict[str, Callable[[], Any]]:
+    """Return the benchmarked functions, with their data prepared.
+
+    :return: A function for each case, by name.
+    """
+    user = synthetic.USER
+    metadata = synthetic.merge_request(1)
+    many_threads = synthetic.discussions(100, 4, 400)
+    long_threads = synthetic.discussions(4, 100, 400)
+    large_notes = synthetic.discussions(10, 4, 20000)
+    mr = MergeRequest(many_threads, [], metadata, user)
+    thread = long_threads[0]
+    console = Console(file=NullFile(), width=120, force_terminal=True)
+    folder = NoteFolder(Constants.NOTE_MAX_LINES, Constants.NOTE_MAX_BYTES)
+    # A pasted log after a JIRA marker without a ticket, which must not
+    # make the patterns backtrack, searched bypassing the cache
+    jira = JiraExtractor()
+    long_description: Dict[str, Optional[str]] = {
+        "description": "JIRA" + " " * 20000 + "\n" + "log line\n" * 20000
+    }
+
+    def render_thread_table() -> None:
+        table = RichGenerator.thread_table(
+            RichGenerator.rows_highlighting(thread, True, user), "red", "red", 120
+        )
+        for message in thread["notes"][:10]:
+            table.add_row(
+                Utils.convert_time(message["updated_at"]),
+                message["author"]["name"],
+                message["body"],
+            )
+        console.print(table)
+
+    return {
+        "merge_request_many_threads": lambda: MergeRequest(
+            many_threads, [], metadata, user
+        ),
+        "merge_request_long_threads": lambda: MergeRequest(
+            long_threads, [], metadata, user
+        ),
+        "merge_request_large_notes": lambda: MergeRequest(
+            large_notes, [], metadata, user
+        ),
+        "rows_highlighting": lambda: RichGenerator.rows_highlighting(
+            thread, True, user
+        ),
+        "info_box_content": lambda: RichGenerator.info_box_content(
+            mr, "https://jira.example.com"
+        ),
+        "convert_time": lambda: Utils.convert_time(metadata["updated_at"]),
+        "render_thread_table": render_thread_table,
+        "fold_large_notes": lambda: folder.fold_thread(large_notes[0]["notes"]),
+        "jira_long_description": lambda: jira.search(long_description),
+    }
+
+
+def measure(function: Callable[[], Any]) -> float:
+    """Return the number of seconds one call of a function takes.
+
+    :param function: The function to time.
+
+    :return: The fastest time per call over REPEAT measurements.
+    """
+    start = time.perf_counter()
+    function()
+    number = max(1, int(TARGET_TIME / max(time.perf_counter() - start, 1e-9)))
+    return min(timeit.repeat(function, number=number, repeat=REPEAT)) / number
+
+
+def run() -> Dict[str, float]:
+    """Time all cases.
+
+    :return: The time of each case, by name, relative to the time of
+        the reference workload.
+    """
+    reference_time = measure(reference)
+    return {name: measure(case) / reference_time for name, case in cases().items()}
+
+
+def load_baseline() -> Dict[str, Any]:
+    """Return the stored baseline, or an empty one if there is none."""
+    try:
+        with open(BASELINE_PATH) as f:
+            baseline: Dict[str, Any] = json.load(f)
+    except FileNotFoundError:
+        return {"tolerance": TOLERANCE, "cases": {}}
+    return baseline
+
+
+def regressions(results: Dict[str, float], baseline: Dict[str, Any]) -> List[str]:
+    """Compare results with the baseline.
+
+    :param results: The relative times, as returned by run().
+    :param baseline: The baseline, as returned by load_baseline().
+
+    :return: A description of each case slower than allowed.
+    """
+    tolerance = baseline["tolerance"]
+    found = []
+    for name, result in results.items():
+        expected = baseline["cases"].get(name)
+        if expected is not None and result > expected * (1 + tolerance):
+            found.append(f"{name}: {result:.3g}, baseline {expected:.3g}")
+    return found
+
+
+def main() -> None:
+    """Print the relative times, or store them as the baseline."""
+    parser = argparse.ArgumentParser(description="Run the micro-benchmarks.")
+    parser.add_argument(
+        "--update", action="store_true", help="store the results as the baseline"
+    )
+    args = parser.parse_args()
+
+    results = run()
+    baseline = load_baseline()
+    print(f"{'case':<28} {'relative time':>14} {'baseline':>9}")
+    for name, result in results.items():
+        expected = baseline["cases"].get(name)
+        print(
+            f"{name:<28} {result:>14.3g}"
+            f" {'-' if expected is None else f'{expected:.3g}':>9}"
+        )
+
+    if args.update:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(
+                {
+                    "tolerance": baseline["tolerance"],
+                    "cases": {
+                        name: float(f"{value:.3g}") for name, value in results.items()
+                    },
+                },
+                f,
+                indent=2,
+            )
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Benchmark peak memory use of processing MRs against their number.
+
+Compares the bounded Pipeline with collecting all results of
+ThreadPoolExecutor.map(), the way all MRs used to be processed. The
+downloads are simulated with synthetic data, so only the memory used
+by reviewcheck itself is measured. Each measurement runs in a process
+of its own since the peak RSS of a process never decreases.
+
+Run from the repository root:
+
+    python -m benchmarks.pipeline_memory
+"""
+import argparse
+import resource
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from benchmarks import synthetic
+from reviewcheck.merge_request import MergeRequest
+from reviewcheck.pipeline import Pipeline
+
+SIZES = [500, 2000, 8000]
+
+
+def download(metadata: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+    """Simulate downloading the threads of an MR."""
+    return synthetic.discussions(20, 4, 400, seed=metadata["iid"]), metadata
+
+
+def classify(metadata: Dict[str, Any]) -> MergeRequest:
+    """Simulate downloading and classifying an MR."""
+    threads, metadata = download(metadata)
+    return MergeRequest(threads, [], metadata, synthetic.USER)
+
+
+def measure(mode: str, size: int) -> int:
+    """Process the given number of MRs and return peak RSS in KiB."""
+    mr_pages = [synthetic.merge_request(iid) for iid in range(size)]
+    if mode == "pipeline":
+        threads_needing_reply = 0
+        for mr in Pipeline(classify).run(iter(mr_pages)):
+            threads_needing_reply += mr.number_of_open_threads_needing_user_reply
+    else:
+        mrs: List[MergeRequest] = []
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            for threads, metadata in executor.map(download, mr_pages):
+                mrs.append(MergeRequest(threads, [], metadata, synthetic.USER))
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main() -> None:
+    """Measure each mode and size in a separate process."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mode", choices=["pipeline", "collect"])
+    parser.add_argument("--size", type=int)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(measure(args.mode, args.size))
+        return
+
+    print(f"{'MRs':>8} {'collect (MiB)':>15} {'pipeline (MiB)':>15}")
+    for size in SIZES:
+        results = []
+        for mode in ["collect", "pipeline"]:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.pipeline_memory", "--mode", mode]
+                + ["--size", str(size)],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            results.append(int(output) / 1024)
+        print(f"{size:>8} {results[0]:>15.1f} {results[1]:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
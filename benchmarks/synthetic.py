@@ -0,0 +1,103 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Generators of synthetic GitLab data for benchmarks."""
+import random
+from typing import Any, Dict, List
+
+USER = "JDOE"
+AUTHORS = ["ALICE", "BOB", "CAROL", "DAVE", USER]
+WORDS = "the this should be fixed please see line why not use a function".split()
+
+
+def body(size: int, rng: random.Random) -> str:
+    """Return a note body of roughly the given size in bytes."""
+    words: List[str] = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def note(
+    id: int,
+    author: str,
+    body: str,
+    resolved: bool = False,
+) -> Dict[str, Any]:
+    """Return a note as returned by the discussions endpoint."""
+    return {
+        "id": id,
+        "type": "DiscussionNote",
+        "body": body,
+        "author": {"username": author, "name": author.title()},
+        "created_at": "2024-01-01T10:00:00.000+01:00",
+        "updated_at": "2024-01-01T10:00:00.000+01:00",
+        "system": False,
+        "resolvable": True,
+        "resolved": resolved,
+    }
+
+
+def discussions(
+    threads: int,
+    notes_per_thread: int,
+    body_size: int,
+    involvement: float = 0.2,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """Return the threads of an MR.
+
+    :param threads: The number of threads.
+    :param notes_per_thread: The number of notes in each thread.
+    :param body_size: The approximate size of each note body in bytes.
+    :param involvement: The share of threads the user takes part in.
+    :param seed: Seed for the random generator, for repeatable data.
+
+    :return: The threads as returned by the discussions endpoint.
+    """
+    rng = random.Random(seed)
+    result = []
+    for i in range(threads):
+        involved = rng.random() < involvement
+        notes = []
+        for j in range(notes_per_thread):
+            if involved and j % 2 == 1:
+                author = USER
+            else:
+                author = rng.choice(AUTHORS[:-1])
+            notes.append(
+                note(
+                    i * notes_per_thread + j,
+                    author,
+                    body(body_size, rng),
+                    resolved=rng.random() < 0.3,
+                )
+            )
+        result.append({"id": f"d{i}", "individual_note": False, "notes": notes})
+    return result
+
+
+def merge_request(iid: int, description_size: int = 500) -> Dict[str, Any]:
+    """Return an MR as returned when listing merge requests."""
+    rng = random.Random(iid)
+    return {
+        "iid": iid,
+        "id": 100000 + iid,
+        "project_id": 1,
+        "title": f"Change number {iid}",
+        "author": {"username": rng.choice(AUTHORS), "name": "Author"},
+        "reviewers": [],
+        "assignees": [],
+        "web_url": f"https://gitlab.example.com/group/repo/-/merge_requests/{iid}",
+        "upvotes": 0,
+        "downvotes": 0,
+        "created_at": "2024-01-01T09:00:00.000+01:00",
+        "updated_at": "2024-01-02T09:00:00.000+01:00",
+        "source_branch": f"feature/ABC-{iid}",
+        "target_branch": "main",
+        "description": body(description_size, rng) + f"\n\nJIRA: ABC-{iid}\n",
+        "user_notes_count": 1,
+    }
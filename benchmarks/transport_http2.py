@@ -0,0 +1,133 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Benchmark the http2 transport against the requests transport.
+
+Starts a local HTTPS server speaking HTTP/2 and HTTP/1.1, which answers
+every request with a small page of JSON after a fixed delay, like
+GitLab would. The same number of pages is then downloaded through
+Utils.download_gitlab_data() by the same thread pool for each
+transport, and the time taken and the number of connections opened
+are printed.
+
+Requires the optional dependencies hypercorn and trustme, as well as
+httpx with HTTP/2 support. Run from the repository root:
+
+    python -m benchmarks.transport_http2
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Set, Tuple
+
+import trustme
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+
+from reviewcheck.pipeline import Pipeline
+from reviewcheck.transport import Transport
+from reviewcheck.utils import Utils
+
+REQUESTS = 1000
+DELAY = 0.02
+PORT = 8443
+
+connections: Set[Tuple[str, int]] = set()
+
+
+async def app(
+    scope: Dict[str, Any],
+    receive: Callable[[], Any],
+    send: Callable[[Dict[str, Any]], Any],
+) -> None:
+    """Answer each request with a page of JSON, like GitLab."""
+    if scope["type"] != "http":
+        return
+    connections.add(scope["client"])
+    await asyncio.sleep(DELAY)
+    body = json.dumps([{"id": i, "body": "x" * 200} for i in range(20)]).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"x-total-pages", b"1"),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def start_server(certificate_directory: str) -> None:
+    """Start the server in a background thread."""
+    authority = trustme.CA()
+    certificate = authority.issue_cert("127.0.0.1")
+    certificate_path = os.path.join(certificate_directory, "cert.pem")
+    key_path = os.path.join(certificate_directory, "key.pem")
+    ca_path = os.path.join(certificate_directory, "ca.pem")
+    certificate.cert_chain_pems[0].write_to_path(certificate_path)
+    certificate.private_key_pem.write_to_path(key_path)
+    authority.cert_pem.write_to_path(ca_path)
+
+    # Both transports trust the certificate authority of the server
+    os.environ["REQUESTS_CA_BUNDLE"] = ca_path
+    os.environ["SSL_CERT_FILE"] = ca_path
+
+    config = Config()
+    config.bind = [f"127.0.0.1:{PORT}"]
+    config.certfile = certificate_path
+    config.keyfile = key_path
+    config.alpn_protocols = ["h2", "http/1.1"]
+    config.accesslog = None
+    config.errorlog = None
+
+    async def run_forever() -> None:
+        # Giving a shutdown trigger stops hypercorn from installing
+        # signal handlers, which only works in the main thread.
+        await serve(
+            app,  # type: ignore[arg-type]
+            config,
+            shutdown_trigger=asyncio.Event().wait,
+        )
+
+    def run() -> None:
+        asyncio.run(run_forever())
+
+    threading.Thread(target=run, daemon=True).start()
+    time.sleep(1)
+
+
+def main() -> None:
+    """Download the pages with each transport and print the results."""
+    with tempfile.TemporaryDirectory() as certificate_directory:
+        start_server(certificate_directory)
+        url = f"https://127.0.0.1:{PORT}/api/v4/projects/1/merge_requests?per_page=20"
+
+        print(
+            f"{'transport':>10} {'seconds':>8} {'requests/s':>11} {'connections':>12}"
+        )
+        for name in Transport.NAMES:
+            Utils.set_transport(Transport.create(name))
+            connections.clear()
+            # Warm up the connection pool
+            Utils.download_gitlab_data("token", url)
+
+            start = time.perf_counter()
+            pipeline: Pipeline[int, Any] = Pipeline(
+                lambda _: Utils.download_gitlab_data("token", url)
+            )
+            for _ in pipeline.run(range(REQUESTS)):
+                pass
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name:>10} {elapsed:>8.2f} {REQUESTS / elapsed:>11.0f}"
+                f" {len(connections):>12}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,28 +7,45 @@ You have to configure the script before running it by running
 reviewcheck --configure.
 """
 import json
-import re
 import subprocess
 import sys
 import time
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 from shutil import get_terminal_size
-from typing import Any, Dict, List, Set
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
 
-import requests
-from requests.exceptions import HTTPError, RequestException
-from rich.console import Console
+from rich.console import Console, RenderableType
 from rich.panel import Panel
-from rich.progress import Progress
 from rich.text import Text
 
 from reviewcheck.cli import Cli
+from reviewcheck.concurrency import ConcurrencyLimiter
 from reviewcheck.config import Config
 from reviewcheck.constants import Constants
+from reviewcheck.dashboard import Dashboard
+from reviewcheck.delta import DeltaEngine
 from reviewcheck.exceptions import RCException
+from reviewcheck.fallback import FallbackStore
+from reviewcheck.fetcher import Download, FetchResult, MergeRequestFetcher
+from reviewcheck.filters import ListFilter
+from reviewcheck.folding import NoteFolder
+from reviewcheck.instances import Instance
 from reviewcheck.merge_request import MergeRequest
+from reviewcheck.metrics import Metrics
+from reviewcheck.pipeline import Pipeline
+from reviewcheck.prefilter import PreFilter
+from reviewcheck.prerender import PreRenderer
+from reviewcheck.profiling import Profiler
+from reviewcheck.reactions import ReactionResolver
+from reviewcheck.records import RecordGenerator
 from reviewcheck.rich_components import RichGenerator
+from reviewcheck.scheduling import Scheduler
+from reviewcheck.search import SearchIndex
+from reviewcheck.snapshot import Snapshot, SnapshotProgress
+from reviewcheck.transport import Transport
 from reviewcheck.utils import Utils
 
 console = Console()
@@ -43,223 +60,788 @@ def configure() -> int:
     return 0
 
 
-def read_viewed_message_ids() -> Set[str]:
-    """Read stored comment note IDs from last check.
+def search(query: str, limit: int, output_format: str) -> int:
+    """Show the threads downloaded on earlier runs matching a query.
 
-    :return: The IDs of those comments that were considered in need of a
-        reply on the last run of reviewcheck.
+    Nothing is asked of GitLab, see SearchIndex.
+
+    :param query: What to search for.
+    :param limit: The maximum number of threads to show.
+    :param output_format: How to show them, like the --format option.
+
+    :return: 0 if the search could be made, otherwise 1.
     """
-    old_comment_note_ids: Set[str] = set()
+    if not Constants.SEARCH_INDEX_PATH.exists():
+        print("Nothing has been downloaded to search yet.", file=sys.stderr)
+        return 1
     try:
-        with open(Constants.COMMENT_NOTE_IDS_PATH) as f:
-            lines = f.readlines()
-    except FileNotFoundError:
-        return old_comment_note_ids
+        with SearchIndex() as search_index:
+            threads = search_index.search(query, limit)
+    except RCException as e:
+        print(f"Reviewcheck encountered a problem: {e}", file=sys.stderr)
+        return 1
 
-    for line in lines:
-        old_comment_note_ids.add(line.strip())
+    start, end = SearchIndex.MARKS
+    if output_format != "rich":
+        for thread in threads:
+            for note in thread["notes"]:
+                note["snippet"] = note["snippet"].replace(start, "").replace(end, "")
+        if output_format == "json":
+            print(json.dumps(threads, indent=2))
+        else:
+            for thread in threads:
+                print(json.dumps(thread), flush=True)
+        return 0
+
+    if not threads:
+        console.print("No threads found.")
+    for thread in threads:
+        console.print(Text(thread["merge_request"], style="bold"))
+        for note in thread["notes"]:
+            snippet = Text(
+                f"  {Utils.convert_time(note['updated_at'])}  {note['author']}: "
+            )
+            # Every other part of the snippet is a match
+            for i, part in enumerate(
+                note["snippet"].replace("\n", " ").replace(end, start).split(start)
+            ):
+                snippet.append(part, style="bold yellow" if i % 2 else "")
+            console.print(snippet)
+            console.print(Text(f"  {note['link']}", style="blue"))
+        console.print()
+    return 0
 
-    return old_comment_note_ids
 
+def read_concurrency_limit(host: str) -> ConcurrencyLimiter:
+    """Create a limiter starting where the last run on a host ended.
 
-def write_viewed_message_ids(new_comment_note_ids: Set[str]) -> None:
-    """Write all the comment note IDs from the last run to file.
+    :param host: The host of the GitLab instance.
 
-    :param new_comment_note_ids: The IDs of the comments that are
-        considered in need of a reply during this run of reviewcheck.
+    :return: The limiter of requests sent at the same time.
     """
-    with open(Constants.COMMENT_NOTE_IDS_PATH, "w") as f:
-        for id in new_comment_note_ids:
-            f.write(f"{id}\n")
+    stored = Utils.read_json(Constants.CONCURRENCY_PATH, {})
+    limit = stored.get(host) if isinstance(stored, dict) else None
+    if not isinstance(limit, (int, float)):
+        return ConcurrencyLimiter(host=host)
+    return ConcurrencyLimiter(limit, host)
 
 
-def show_reviews(config: Dict[str, Any], suppress_notifications: bool) -> None:
-    """Download MR data and present review info for each relevant MR.
+def write_concurrency_limits(hosts: List[str]) -> None:
+    """Store the limits of requests reached on hosts for the next run.
+
+    :param hosts: The hosts of the GitLab instances.
+    """
+    stored = Utils.read_json(Constants.CONCURRENCY_PATH, {})
+    if not isinstance(stored, dict):
+        stored = {}
+    for host in hosts:
+        stored[host] = round(Utils.get_limiter(host).limit, 2)
+    Utils.write_json(Constants.CONCURRENCY_PATH, stored)
+
+
+def notify_changes(mr: MergeRequest) -> None:
+    """Send a desktop notification for each changed thread to reply to.
+
+    A notification is sent when the last note of a thread needing a
+    reply is new or edited, or when such a thread was reopened, since
+    the last run, see DeltaEngine.
+
+    :param mr: The merge request to send notifications for.
+    """
+    for thread in mr.threads:
+        last_message = thread["notes"][-1]
+        if not mr.thread_needs_reply(thread):
+            continue
+        if str(thread["id"]) in mr.thread_changes:
+            title = f"Reopened thread on MR !{mr.id}"
+        elif mr.note_changes.get(str(last_message["id"])) == "edited":
+            title = f"Edited comment on MR !{mr.id}"
+        elif str(last_message["id"]) in mr.note_changes:
+            title = f"New comment on MR !{mr.id}"
+        else:
+            continue
+        subprocess.run(
+            [
+                "notify-send",
+                "--expire-time=15000",
+                title,
+                (
+                    f"{last_message['author']['name']} writes:\n\n"
+                    f"{last_message['body']}"
+                ),
+            ]
+        )
+
+
+def is_shown(mr: MergeRequest, config: Dict[str, Any]) -> bool:
+    """Return True if an MR is to be presented.
 
+    :param mr: The merge request in question.
     :param config: The resolved configuration of reviewcheck.
+
+    :return: Whether the MR needs attention, or with --changes-only,
+        whether any of its threads changed since the last run.
+    """
+    if config["changes_only"]:
+        return mr.has_changes()
+    return mr.needs_attention(config["show_all_discussions"])
+
+
+def shown_threads(mr: MergeRequest, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return the threads of an MR to present.
+
+    :param mr: The merge request in question.
+    :param config: The resolved configuration of reviewcheck.
+
+    :return: The visible threads, or with --changes-only, those of them
+        that changed since the last run.
+    """
+    threads = mr.visible_threads(config["hide_replied_discussions"])
+    if config["changes_only"]:
+        return mr.changed_threads(threads)
+    return threads
+
+
+def merge_request_renderables(
+    mr: MergeRequest, config: Dict[str, Any]
+) -> List[RenderableType]:
+    """Create the components presenting the review info for an MR.
+
+    :param mr: The merge request to present.
+    :param config: The resolved configuration of reviewcheck.
+
+    :return: The info panel and the thread tables of the MR, or nothing
+        if the MR is not relevant.
     """
-    secret_token = config["secret_token"]
-    api_url = config["api_url"] + "/api/v4"
-    jira_url = config.get("jira_url")
-    project_ids = config["project_ids"]
-    user = config["user"]
-    ignored_mrs = config["ignored_mrs"]
+    user = mr.user
+    instances = config.get("instances") or [config]
+    jira_url = instances[Instance.index(instances, mr.web_url)].get("jira_url")
     show_all_discussions = config["show_all_discussions"]
-    hide_all_threads_user_already_replied_to = config["hide_replied_discussions"]
+    changes_only = config["changes_only"]
 
-    mr_pages = []
-    with Progress(transient=True, expand=True) as progress:
-        gitlab_download_task = progress.add_task(
-            "[green]Downloading MR data...",
-            start=False,
-        )
-        with requests.Session() as session:
-            for project in project_ids:
-                api_url_project = f"{api_url}/projects/{project}"
-                projects_url = (
-                    f"{api_url_project}/merge_requests?state=opened&per_page=500"
-                )
-                try:
-                    response = session.get(
-                        projects_url,
-                        headers={"PRIVATE-TOKEN": secret_token},
-                    )
-                    response.raise_for_status()
-                except HTTPError as e:
-                    raise RCException(f"Non-OK HTTP response from GitLab: '{e}'")
-                except RequestException:
-                    raise RCException(
-                        "There was an issue connecting to GitLab. "
-                        f"Failed GET {projects_url}"
-                    )
+    if not is_shown(mr, config):
+        return []
 
-                try:
-                    merge_requests_data = json.loads(response.content)
-                except ValueError:
-                    raise RCException(
-                        f"Could not decode JSON. API endpoint might be wrong: {api_url}"
-                    )
+    main_mr_color = Constants.COLORS[mr.id % len(Constants.COLORS)]
+    mr_info_header = Panel(
+        Text(RichGenerator.info_box_content(mr, jira_url)),
+        title=RichGenerator.info_box_title(mr, main_mr_color),
+        width=config["output_width"],
+    )
 
-                else:
-                    mr_pages += [
-                        mr
-                        for mr in merge_requests_data
-                        if str(mr["iid"]) not in ignored_mrs
-                    ]
+    renderables: List[RenderableType] = [mr_info_header]
+    folder = NoteFolder.create(config)
 
-        mrs: List[MergeRequest] = []
+    if changes_only:
+        resolved = [
+            thread_id
+            for thread_id, change in mr.thread_changes.items()
+            if change == "resolved"
+        ]
+        if resolved:
+            renderables.append(
+                Text(f"{len(resolved)} threads resolved since the last run")
+            )
 
-        def reaction_url(project: str, id: str) -> str:
-            """Construct API URL for merge request reactions."""
-            return f"{api_url}/projects/{project}/merge_requests/{id}/award_emoji"
+    # When minimal view is requsted, only show threads where a response
+    # is required.
+    for thread in shown_threads(mr, config):
+        user_needs_to_reply = mr.thread_needs_reply(thread)
+        border_color = f"{main_mr_color}" if user_needs_to_reply else "white"
+        notes = (
+            thread["notes"] if folder is None else folder.fold_thread(thread["notes"])
+        )
+        row_highlighting_style = RichGenerator.rows_highlighting(
+            {"notes": notes},
+            user_needs_to_reply,
+            user,
+        )
+        thread_table = RichGenerator.thread_table(
+            row_styles=row_highlighting_style,
+            border_color=border_color,
+            main_color=main_mr_color,
+            width=config["output_width"],
+        )
+        for message in notes:
+            update_time = Utils.convert_time(message["updated_at"])
+            change = mr.note_changes.get(str(message["id"]))
+            if changes_only and change is not None:
+                update_time += f"\n({change})"
+            thread_table.add_row(
+                update_time,
+                message["author"]["name"],
+                message["body"],
+            )
 
-        def mr_url(project: str, id: str) -> str:
-            """Construct API URL for merge request notes."""
-            return (
-                f"{api_url}/projects/{project}/merge_requests/{id}"
-                "/discussions?per_page=500"
+        if user_needs_to_reply or show_all_discussions:
+            thread_table.add_row(
+                "",
+                "Discussion link",
+                f"{mr.web_url}#note_{thread['notes'][0]['id']}",
             )
 
-        with ThreadPoolExecutor(max_workers=Constants.THREADPOOL_MAXSIZE) as executor:
-            progress.start_task(gitlab_download_task)
-            progress.update(gitlab_download_task, total=len(mrs))
-
-            for mr_response, reaction_response, mr in executor.map(
-                Utils.download_data,
-                [
-                    (
-                        secret_token,
-                        mr_url(mr["project_id"], mr["iid"]),
-                        reaction_url(mr["project_id"], mr["iid"]),
-                        mr,
+        renderables.append(thread_table)
+
+    return renderables
+
+
+def unfold_renderables(
+    mr: MergeRequest, config: Dict[str, Any]
+) -> Optional[Callable[[], List[RenderableType]]]:
+    """Return how to present an MR with its notes in full.
+
+    :param mr: The merge request to present.
+    :param config: The resolved configuration of reviewcheck.
+
+    :return: A function creating the components with the notes in
+        full, or None if the notes are not folded.
+    """
+    if not config["fold_notes"]:
+        return None
+    return lambda: merge_request_renderables(mr, {**config, "fold_notes": False})
+
+
+def render_merge_request(mr: MergeRequest, config: Dict[str, Any]) -> None:
+    """Present the review info for a single MR, if it is relevant.
+
+    :param mr: The merge request to present.
+    :param config: The resolved configuration of reviewcheck.
+    """
+    for renderable in merge_request_renderables(mr, config):
+        console.print(renderable)
+
+
+def print_records(mr: MergeRequest, config: Dict[str, Any]) -> None:
+    """Print the review info for a single MR as JSON lines.
+
+    One line is printed for the MR and one for each of its threads, if
+    the MR is relevant. The output is flushed immediately so that other
+    tools can consume it while reviewcheck is still running.
+
+    :param mr: The merge request to present.
+    :param config: The resolved configuration of reviewcheck.
+    """
+    if not is_shown(mr, config):
+        return
+
+    print(json.dumps(RecordGenerator.merge_request_record(mr)))
+    for thread in shown_threads(mr, config):
+        print(json.dumps(RecordGenerator.thread_record(mr, thread)))
+    sys.stdout.flush()
+
+
+def report_missing(
+    missing: List[FetchResult],
+    config: Dict[str, Any],
+    json_records: List[Dict[str, Any]],
+) -> None:
+    """Present the MRs that could not be downloaded.
+
+    :param missing: The results for the MRs, with the reasons.
+    :param config: The resolved configuration of reviewcheck.
+    :param json_records: The records to add the MRs to, when the
+        output format is json.
+    """
+    records = [
+        RecordGenerator.missing_record(result.metadata, result.error or "")
+        for result in missing
+    ]
+    if config["output_format"] == "json":
+        json_records += records
+    elif config["output_format"] == "ndjson":
+        for record in records:
+            print(json.dumps(record))
+        sys.stdout.flush()
+    else:
+        console.print(
+            Panel(
+                Text(
+                    "\n".join(
+                        f"!{r['iid']} {r['title']}: {r['web_url']} ({r['reason']})"
+                        for r in records
                     )
-                    for mr in mr_pages
-                ],
-            ):
-                mrs.append(
-                    MergeRequest(
-                        mr_response,
-                        reaction_response,
-                        mr,
-                        user,
+                ),
+                title=f"[bold yellow]{len(missing)} merge requests not downloaded",
+                width=config["output_width"],
+            )
+        )
+
+
+def report_unlisted(
+    unlisted: List[Dict[str, Any]],
+    config: Dict[str, Any],
+    json_records: List[Dict[str, Any]],
+) -> None:
+    """Present the projects and groups whose MRs could not be listed.
+
+    :param unlisted: The records of the projects and groups, see
+        RecordGenerator.unlisted_record().
+    :param config: The resolved configuration of reviewcheck.
+    :param json_records: The records to add them to, when the output
+        format is json.
+    """
+    if config["output_format"] == "json":
+        json_records += unlisted
+    elif config["output_format"] == "ndjson":
+        for record in unlisted:
+            print(json.dumps(record))
+        sys.stdout.flush()
+    else:
+        console.print(
+            Panel(
+                Text(
+                    "\n".join(
+                        f"{r['kind']} {r['id']} on {r['host']} ({r['reason']})"
+                        for r in unlisted
                     )
-                )
-                progress.update(gitlab_download_task, advance=1)
+                ),
+                title=f"[bold yellow]{len(unlisted)} projects or groups not listed",
+                width=config["output_width"],
+            )
+        )
+
 
-    console.print(
-        Panel(
-            Text(
-                f"Status as of {datetime.now().strftime('%Y-%m-%d %H:%M')}",
-                justify="center",
+def present_merge_request(
+    merge_request: MergeRequest,
+    config: Dict[str, Any],
+    dashboard: Optional[Dashboard],
+    json_records: List[Dict[str, Any]],
+    renderer: Optional[PreRenderer] = None,
+) -> None:
+    """Present the review info for an MR in the configured format.
+
+    :param merge_request: The merge request to present.
+    :param config: The resolved configuration of reviewcheck.
+    :param dashboard: The dashboard to present the MR on, if any.
+    :param json_records: The records to add the MR to, when the output
+        format is json.
+    :param renderer: The renderer to print the MR with, when the output
+        format is rich. The MR is printed directly if not given.
+    """
+    output_format = config["output_format"]
+    if dashboard is not None:
+        dashboard.update(
+            merge_request.web_url,
+            merge_request_renderables(merge_request, config),
+            RichGenerator.summary_line(
+                merge_request,
+                Constants.COLORS[merge_request.id % len(Constants.COLORS)],
             ),
-            style="reverse bold",
-        ),
-        width=config["output_width"],
-    )
+            unfold_renderables(merge_request, config),
+        )
+    elif output_format == "rich" and renderer is not None:
+        renderer.submit(merge_request)
+    elif output_format == "rich":
+        render_merge_request(merge_request, config)
+    elif output_format == "ndjson":
+        print_records(merge_request, config)
+    elif is_shown(merge_request, config):
+        record = RecordGenerator.merge_request_record(merge_request)
+        record["threads"] = [
+            RecordGenerator.thread_record(merge_request, thread)
+            for thread in shown_threads(merge_request, config)
+        ]
+        json_records.append(record)
 
-    ids_of_seen_messages = read_viewed_message_ids()
-    for mr in mrs:
-        if (
-            mr.user_is_reviewer()
-            and mr.number_of_open_threads_needing_user_reply == 0
-            and (not show_all_discussions or len(mr.threads) == 0)
-        ):
-            continue
 
-        main_mr_color = Constants.COLORS[mr.id % len(Constants.COLORS)]
-        mr_info_header = Panel(
-            Text(RichGenerator.info_box_content(mr, jira_url)),
-            title=RichGenerator.info_box_title(mr, main_mr_color),
+def show_reviews(
+    config: Dict[str, Any],
+    suppress_notifications: bool,
+    dashboard: Optional[Dashboard] = None,
+) -> List[FetchResult]:
+    """Download MR data and present review info for each relevant MR.
+
+    The MRs are downloaded in order of priority, see Scheduler, and
+    each MR is presented as soon as it has been downloaded, so that the
+    MRs most likely to need a reply are shown first.
+
+    An MR that fails to download does not stop the run. It is shown
+    from the data of an earlier run, marked as stale, or reported as
+    missing if there is no such data.
+
+    :param config: The resolved configuration of reviewcheck.
+    :param suppress_notifications: Whether to skip sending desktop
+        notifications for new comments.
+    :param dashboard: The dashboard to present the MRs on, instead of
+        printing them, when refreshing.
+
+    :return: The results for the MRs that failed to download.
+    """
+    start = time.monotonic()
+    Profiler.phase("listing")
+    Utils.set_timeouts(config["request_timeout"], config["deadline"])
+
+    instances = [Instance(instance) for instance in config["instances"]]
+    # The data stored between runs is for all instances together
+    user = Instance.identity(config["instances"])
+    list_filter = ListFilter(config)
+
+    output_format = config["output_format"]
+    json_records: List[Dict[str, Any]] = []
+
+    if dashboard is not None:
+        dashboard.start_cycle()
+    elif output_format == "rich":
+        console.print(
+            Panel(
+                Text(
+                    f"Status as of {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+                    justify="center",
+                ),
+                style="reverse bold",
+            ),
             width=config["output_width"],
         )
 
-        console.print(mr_info_header)
-        if (
-            mr.user_reacted_but_no_upvote()
-            and not mr.is_author
-            and mr.number_of_open_threads_needing_user_reply == 0
-        ):
-            continue
+    # What changed in each MR since the last run, see DeltaEngine
+    delta = DeltaEngine.load(user)
 
-        for thread in mr.threads:
-            last_message = thread["notes"][-1]
-
-            # When minimal view is requsted, only show threads where
-            # a response is required.
-            if hide_all_threads_user_already_replied_to:
-                if last_message["author"]["username"] == user:
-                    continue
-
-            user_needs_to_reply = False
-            if last_message["author"]["username"] != user:
-                user_needs_to_reply = True
-
-                if (
-                    not suppress_notifications
-                    and str(last_message["id"]) not in ids_of_seen_messages
-                ):
-                    subprocess.run(
-                        [
-                            "notify-send",
-                            "--expire-time=15000",
-                            f"New comment on MR !{mr.id}",
-                            (
-                                f"{last_message['author']['name']} writes:\n\n"
-                                f"{last_message['body']}"
-                            ),
-                        ]
-                    )
+    # The MRs are rendered in parallel when printed, see PreRenderer
+    processes = 1
+    if output_format == "rich" and dashboard is None:
+        processes = config["render_processes"]
 
-            border_color = f"{main_mr_color}" if user_needs_to_reply else "white"
-            row_highlighting_style = RichGenerator.rows_highlighting(
-                thread,
-                user_needs_to_reply,
-                user,
+    # The result of the last run is shown above the progress bar until
+    # it has been replaced, see SnapshotProgress. It tells nothing about
+    # what changed since then.
+    snapshot = None
+    if (
+        output_format == "rich"
+        and dashboard is None
+        and console.is_terminal
+        and not config["changes_only"]
+    ):
+        snapshot = Snapshot.load(user)
+
+    attention: List[MergeRequest] = []
+    with SnapshotProgress(
+        snapshot,
+        config,
+        console=console,
+        transient=True,
+        expand=True,
+        disable=output_format != "rich" or dashboard is not None,
+    ) as progress, PreRenderer(
+        console, processes, merge_request_renderables, config
+    ) as renderer, SearchIndex(
+        enabled=config["search_index"]
+    ) as search_index:
+        gitlab_download_task = progress.add_task(
+            "[green]Downloading MR data...",
+            start=False,
+        )
+        # The instances are listed at the same time, so that listing
+        # takes as long as the slowest one, see Instance
+        reactions_cache = ReactionResolver.read_cache()
+        with ThreadPoolExecutor(max_workers=len(instances)) as executor:
+            for future in [
+                executor.submit(
+                    instance.list_merge_requests,
+                    list_filter,
+                    reactions_cache,
+                    search_index,
+                )
+                for instance in instances
+            ]:
+                future.result()
+        for instance in instances:
+            instance.catalog.save(instance.config["group_ids"])
+        unlisted = [record for instance in instances for record in instance.unlisted]
+
+        # Decide up front which MRs cannot produce any output, so that
+        # they are never downloaded. The metadata of each MR is only
+        # kept until it has been processed.
+        prefilter = PreFilter.load(user)
+        for instance in instances:
+            instance.prefilter = PreFilter(
+                instance.user, prefilter.history, instance.reactions
             )
-            thread_table = RichGenerator.thread_table(
-                row_styles=row_highlighting_style,
-                border_color=border_color,
-                main_color=main_mr_color,
-                width=config["output_width"],
+        mr_pages = Scheduler.merge(
+            [(instance.mr_pages, instance.user) for instance in instances]
+        )
+        for instance in instances:
+            instance.mr_pages = []
+        open_mr_keys = set(PreFilter.key(mr) for mr in mr_pages)
+        search_index.prune(open_mr_keys, config["search_retention_days"])
+        downloads: Deque[Download] = deque()
+        for mr in mr_pages:
+            instance = instances[Instance.index(config["instances"], mr["web_url"])]
+            threads_needed, reactions_needed = instance.prefilter.downloads_needed(mr)
+            if threads_needed or reactions_needed:
+                downloads.append((mr, threads_needed, reactions_needed))
+                Metrics.count("reviewcheck_cache_misses_total", cache="prefilter")
+            else:
+                Metrics.count("reviewcheck_cache_hits_total", cache="prefilter")
+                Metrics.count("reviewcheck_merge_requests_total", result="skipped")
+        del mr_pages
+
+        def pending_downloads() -> Iterator[Download]:
+            """Hand out the MRs to download, forgetting each one."""
+            while downloads:
+                yield downloads.popleft()
+
+        Profiler.phase("fetching")
+        progress.start_task(gitlab_download_task)
+        progress.update(gitlab_download_task, total=len(downloads))
+        total = len(downloads)
+        if dashboard is not None:
+            dashboard.set_progress(0, total)
+
+        # The results are returned in order of priority, so each MR can
+        # be presented as soon as it is available.
+        done = 0
+        threads_needing_reply = 0
+        failed: List[FetchResult] = []
+        pipeline = Pipeline(instance_fetch([i.fetcher for i in instances], config))
+        for result in pipeline.run(pending_downloads(), Utils.deadline):
+            done += 1
+            count_result(result)
+            if result.error is not None:
+                failed.append(result)
+            merge_request = result.merge_request
+            if merge_request is None:
+                continue
+            threads_needing_reply += (
+                merge_request.number_of_open_threads_needing_user_reply
             )
-            for message in thread["notes"]:
-                update_time = Utils.convert_time(message["updated_at"])
-                thread_table.add_row(
-                    update_time,
-                    message["author"]["name"],
-                    message["body"],
+            # A stale MR must not be skipped on later runs based on
+            # what it looked like before, nor compared with the last run
+            if result.error is None:
+                instances[
+                    Instance.index(config["instances"], merge_request.web_url)
+                ].prefilter.record(
+                    merge_request, result.metadata, result.threads_needed
                 )
+                if result.threads_needed:
+                    delta.apply(PreFilter.key(result.metadata), merge_request)
+            if not suppress_notifications:
+                notify_changes(merge_request)
 
-            if user_needs_to_reply or show_all_discussions:
-                thread_table.add_row(
-                    "",
-                    "Discussion link",
-                    f"{mr.web_url}#note_{thread['notes'][0]['id']}",
-                )
+            if dashboard is not None:
+                dashboard.set_progress(done, total)
+            present_merge_request(
+                merge_request, config, dashboard, json_records, renderer
+            )
+            progress.forget(merge_request.web_url)
+            # Kept for the snapshot whatever is shown, so that it can be
+            # shown with other options on the next run
+            if merge_request.needs_attention(show_all_discussions=True):
+                attention.append(merge_request)
+            progress.update(gitlab_download_task, advance=1)
 
-            console.print(thread_table)
+        for download in pipeline.missed:
+            failed.append(
+                FetchResult(download, error="not downloaded before the deadline")
+            )
+            count_result(failed[-1])
 
-    write_viewed_message_ids(set([id for mr in mrs for id in mr.all_last_message_ids]))
+    Profiler.phase("saving")
+    missing = [result for result in failed if result.merge_request is None]
+    if dashboard is not None:
+        dashboard.finish_cycle(
+            [result.metadata["web_url"] for result in missing], unlisted=len(unlisted)
+        )
+    else:
+        if missing:
+            report_missing(missing, config, json_records)
+        if unlisted:
+            report_unlisted(unlisted, config, json_records)
+    # The MRs of projects that were not listed may still be open, so
+    # nothing stored about any MR is dropped
+    kept_keys = open_mr_keys
+    if unlisted:
+        kept_keys = (
+            open_mr_keys
+            | set(prefilter.history)
+            | set(delta.merge_requests)
+            | set(reactions_cache)
+        )
+    prefilter.save(kept_keys)
+    if not unlisted:
+        FallbackStore.prune(open_mr_keys)
+    # The resolvers of all instances share the stored reactions
+    for instance in instances:
+        if instance.reactions is not None:
+            instance.reactions.save(kept_keys)
+            break
+    Snapshot.save(user, attention)
+    if output_format == "json":
+        print(json.dumps(json_records, indent=2))
+    delta.save(kept_keys)
+    write_concurrency_limits([instance.host for instance in instances])
+    Metrics.observe("reviewcheck_cycle_duration_seconds", time.monotonic() - start)
+    Metrics.set("reviewcheck_last_cycle_timestamp_seconds", time.time())
+    Metrics.set("reviewcheck_threads_needing_reply", threads_needing_reply)
+    export_metrics(config)
+    return failed
+
+
+def instance_fetch(
+    fetchers: List[MergeRequestFetcher], config: Dict[str, Any]
+) -> Callable[[Download], FetchResult]:
+    """Return how to fetch each MR from the GitLab instance it is on.
+
+    :param fetchers: The fetcher of each instance, in the order of the
+        instances in the configuration.
+    :param config: The resolved configuration of reviewcheck.
+
+    :return: A function fetching an MR with the fetcher of its instance.
+    """
+    return lambda download: fetchers[
+        Instance.index(config["instances"], download[0]["web_url"])
+    ].fetch(download)
+
+
+def count_result(result: FetchResult) -> None:
+    """Count a processed MR in the metrics, by how it went.
+
+    :param result: The result of downloading the MR.
+    """
+    if result.error is None:
+        outcome = "downloaded"
+    elif result.merge_request is not None:
+        outcome = "stale"
+    else:
+        outcome = "missing"
+    Metrics.count("reviewcheck_merge_requests_total", result=outcome)
+
+
+def export_metrics(config: Dict[str, Any]) -> None:
+    """Write the metrics to the configured file, if any.
+
+    :param config: The resolved configuration of reviewcheck.
+    """
+    if config["metrics_file"]:
+        Metrics.write(Path(config["metrics_file"]))
+
+
+def show_snapshot(config: Dict[str, Any], dashboard: Dashboard) -> None:
+    """Show the result of the last run until it has been refreshed.
+
+    :param config: The resolved configuration of reviewcheck.
+    :param dashboard: The dashboard to show the result on.
+    """
+    if config["changes_only"]:
+        return
+    snapshot = Snapshot.load(Instance.identity(config["instances"]))
+    if snapshot is None:
+        return
+    for mr in snapshot.merge_requests:
+        dashboard.update(
+            mr.web_url,
+            merge_request_renderables(mr, config),
+            RichGenerator.summary_line(
+                mr, Constants.COLORS[mr.id % len(Constants.COLORS)]
+            ),
+            unfold_renderables(mr, config),
+        )
+    dashboard.finish_cycle(finished_at=snapshot.age())
+
+
+def retry_failed(
+    config: Dict[str, Any],
+    failed: List[FetchResult],
+    suppress_notifications: bool,
+    dashboard: Optional[Dashboard] = None,
+) -> List[FetchResult]:
+    """Download the MRs that failed again and present those that work.
+
+    What changed in each MR that works is found and notified about as
+    in show_reviews(), and remembered for the next run.
+
+    On the dashboard, each MR that works replaces how it was shown.
+    Otherwise the output cannot be changed once printed, so only the
+    MRs that were reported missing are printed, unless the output
+    format is json, which allows a single document per refresh. The
+    other MRs are shown again on the next refresh.
+
+    :param config: The resolved configuration of reviewcheck.
+    :param failed: The results for the MRs that failed to download.
+    :param suppress_notifications: Whether to skip sending desktop
+        notifications for new comments.
+    :param dashboard: The dashboard to present the MRs on, if any.
+
+    :return: The results for the MRs that failed again.
+    """
+    Utils.set_timeouts(config["request_timeout"], None)
+    still_failed: List[FetchResult] = []
+    delta = DeltaEngine.load(Instance.identity(config["instances"]))
+    missing = {
+        result.metadata["web_url"] for result in failed if result.merge_request is None
+    }
+    Metrics.count("reviewcheck_retries_total", len(failed), reason="merge_request")
+    with SearchIndex(enabled=config["search_index"]) as search_index:
+        fetch = instance_fetch(
+            [
+                MergeRequestFetcher(instance, search_index=search_index)
+                for instance in config["instances"]
+            ],
+            config,
+        )
+        for result in Pipeline(fetch).run(r.download for r in failed):
+            count_result(result)
+            if result.error is not None:
+                still_failed.append(result)
+                continue
+            if result.merge_request is None:
+                continue
+            if result.threads_needed:
+                delta.apply(PreFilter.key(result.metadata), result.merge_request)
+            if not suppress_notifications:
+                notify_changes(result.merge_request)
+            if dashboard is not None or (
+                config["output_format"] != "json"
+                and result.metadata["web_url"] in missing
+            ):
+                present_merge_request(result.merge_request, config, dashboard, [])
+    # The MRs that were not retried are kept as they were stored
+    delta.save(set(delta.merge_requests))
+    if dashboard is not None:
+        dashboard.show_missing(
+            sum(1 for result in still_failed if result.merge_request is None)
+        )
+    export_metrics(config)
+    return still_failed
+
+
+def wait_for_refresh(
+    config: Dict[str, Any],
+    seconds: float,
+    failed: List[FetchResult],
+    suppress_notifications: bool,
+    dashboard: Optional[Dashboard] = None,
+) -> bool:
+    """Wait until the next refresh, retrying failed MRs meanwhile.
+
+    The MRs are retried after RETRY_INITIAL_DELAY seconds, and then
+    after twice as long each time they fail again, until the refresh.
+
+    :param config: The resolved configuration of reviewcheck.
+    :param seconds: The number of seconds until the next refresh.
+    :param failed: The results for the MRs that failed to download.
+    :param suppress_notifications: Whether to skip sending desktop
+        notifications for new comments.
+    :param dashboard: The dashboard to present the MRs on, if any.
+
+    :return: Whether the user quit while waiting.
+    """
+    Profiler.phase("waiting")
+    refresh_at = time.monotonic() + seconds
+    delay: float = Constants.RETRY_INITIAL_DELAY
+    while True:
+        timeout = refresh_at - time.monotonic()
+        if failed:
+            timeout = min(timeout, delay)
+        timeout = max(timeout, 0)
+        if dashboard is not None:
+            if dashboard.wait(timeout):
+                return True
+        else:
+            time.sleep(timeout)
+        if time.monotonic() >= refresh_at:
+            return False
+        failed = retry_failed(config, failed, suppress_notifications, dashboard)
+        delay *= 2
 
 
 def run() -> int:
@@ -272,8 +854,13 @@ def run() -> int:
         print(__version__)
         return 0
 
-    command_palette = {
+    command_palette: Dict[str, Callable[[], int]] = {
         "configure": configure,
+        "search": lambda: search(
+            " ".join(args.query),
+            args.limit or Constants.SEARCH_LIMIT,
+            args.output_format or "rich",
+        ),
     }
 
     if args.command:
@@ -298,7 +885,6 @@ def run() -> int:
 
     if args.user:
         config["user"] = args.user
-    config["user"] = config["user"].upper()
 
     if args.output_width:
         config["output_width"] = args.output_width
@@ -314,22 +900,131 @@ def run() -> int:
     if "hide_replied_discussions" not in config:
         config["hide_replied_discussions"] = args.minimal
 
-    config["api_url"] = re.sub("/api/v4[/]?", "", config["api_url"])
+    if "changes_only" not in config:
+        config["changes_only"] = args.changes_only
+
+    if args.target_branches:
+        config["target_branches"] = args.target_branches
+    else:
+        config.setdefault("target_branches", [])
+
+    if args.updated_within:
+        config["updated_within"] = args.updated_within
+    else:
+        config.setdefault("updated_within", None)
+
+    if "fold_notes" not in config:
+        config["fold_notes"] = args.fold_notes
+
+    config.setdefault("note_max_lines", Constants.NOTE_MAX_LINES)
+    config.setdefault("note_max_bytes", Constants.NOTE_MAX_BYTES)
 
-    config["jira_url"] = re.sub("/browse[/]?", "", config["jira_url"])
+    if "hide_drafts" not in config:
+        config["hide_drafts"] = args.hide_drafts
 
+    config.setdefault("labels", [])
+    config.setdefault("ignored_authors", [])
+
+    if args.output_format:
+        config["output_format"] = args.output_format
+    else:
+        config.setdefault("output_format", "rich")
+
+    if args.deadline:
+        config["deadline"] = args.deadline
+    else:
+        config.setdefault("deadline", None)
+
+    if args.render_processes:
+        config["render_processes"] = args.render_processes
+    else:
+        config.setdefault("render_processes", 1)
+
+    config.setdefault("request_timeout", Constants.REQUEST_TIMEOUT)
+    config.setdefault("transport", "requests")
+    config.setdefault("aliases", [])
+    config.setdefault("project_ids", [])
+    config.setdefault("group_ids", [])
+    config.setdefault("metrics_port", None)
+    # A relative path is taken to be in the data directory
+    if config.setdefault("metrics_file", None):
+        config["metrics_file"] = str(
+            Constants.DATA_DIR / Path(config["metrics_file"]).expanduser()
+        )
+    config.setdefault("group_handles", [])
+
+    if "sync_notes" not in config:
+        config["sync_notes"] = args.sync_notes
+
+    if "pager" not in config:
+        config["pager"] = args.pager
+
+    if args.no_search_index:
+        config["search_index"] = False
+    else:
+        config.setdefault("search_index", True)
+    config.setdefault("search_retention_days", Constants.SEARCH_RETENTION_DAYS)
+
+    # Where the time and memory go is written to the cache directory
+    # when done, see Profiler
+    Profiler.start(args.profile)
     try:
+        # Each GitLab instance has its own connection pool and limit of
+        # requests at the same time, see Instance
+        config["instances"] = Instance.resolve(config, args.user)
+        for instance in config["instances"]:
+            host = Instance.host_of(instance)
+            Utils.set_transport(Transport.create(config["transport"]), host)
+            Utils.set_limiter(read_concurrency_limit(host), host)
+        if config["metrics_port"]:
+            Metrics.serve(config["metrics_port"])
         if args.refresh_time is None:
+            if (
+                config["pager"]
+                and config["output_format"] == "rich"
+                and console.is_terminal
+                and sys.stdin.isatty()
+            ):
+                with Dashboard(console, config["output_width"], True) as dashboard:
+                    show_snapshot(config, dashboard)
+                    show_reviews(config, args.no_notifications, dashboard)
+                    dashboard.wait()
+                return 0
+
             show_reviews(config, args.no_notifications)
             return 0
 
+        if config["output_format"] == "rich" and console.is_terminal:
+            # Keep the last frame on screen while refreshing, and only
+            # redraw what changed.
+            with Dashboard(
+                console, config["output_width"], sys.stdin.isatty()
+            ) as dashboard:
+                show_snapshot(config, dashboard)
+                while True:
+                    failed = show_reviews(config, args.no_notifications, dashboard)
+                    if wait_for_refresh(
+                        config,
+                        args.refresh_time * 60,
+                        failed,
+                        args.no_notifications,
+                        dashboard,
+                    ):
+                        return 0
+
         while True:
             console.clear()
-            show_reviews(config, args.no_notifications)
-            time.sleep(args.refresh_time * 60)
+            failed = show_reviews(config, args.no_notifications)
+            wait_for_refresh(
+                config, args.refresh_time * 60, failed, args.no_notifications
+            )
     except KeyboardInterrupt:
         print("\nBye bye!")
         return 0
     except RCException as e:
         print(f"Reviewcheck encountered a problem: {e}", file=sys.stderr)
         return 1
+    finally:
+        summary = Profiler.stop()
+        if summary is not None:
+            print(summary, file=sys.stderr, end="")
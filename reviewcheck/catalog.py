@@ -0,0 +1,212 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the ProjectCatalog class for expanding groups."""
+import logging
+import time
+from datetime import timezone
+from typing import Any, Dict, List, Optional, Union
+
+from reviewcheck.constants import Constants
+from reviewcheck.exceptions import DeadlineExceeded, RCException
+from reviewcheck.metrics import Metrics
+from reviewcheck.utils import Utils
+
+# A project ID as configured, which may also be the path of the project
+ProjectId = Union[int, str]
+
+
+class ProjectCatalog:
+    """The projects of the configured groups, and which ones to list.
+
+    The projects of each group, including those of its subgroups, are
+    stored together with the time of their last activity. The full
+    list is downloaded again every CATALOG_TTL seconds, so that removed
+    and moved projects are forgotten, and in between only the projects
+    with activity since the last update are downloaded.
+
+    Listing the open MRs of every project of a large group would take
+    a request per project, even though most projects have none. So a
+    project is only listed if it had open MRs when last listed, or has
+    had any activity since, such as an MR being opened. GitLab only
+    updates the activity time of a project once an hour, which is
+    allowed for with PROJECT_ACTIVITY_SLACK.
+
+    Each GitLab instance has its own catalog, since the IDs of groups
+    and projects are only unique within an instance.
+    """
+
+    def __init__(self, host: str, stored: Optional[Dict[str, Any]] = None):
+        """Initialize a ProjectCatalog object.
+
+        :param host: The host of the GitLab instance.
+        :param stored: The catalog as stored by save(). Empty if not
+            given.
+        """
+        stored = stored or {}
+        self.host = host
+        self.groups: Dict[str, Dict[str, Any]] = stored.get("groups", {})
+        self.listings: Dict[str, Dict[str, Any]] = stored.get("listings", {})
+
+    @staticmethod
+    def load(host: str) -> "ProjectCatalog":
+        """Create a ProjectCatalog with the catalog stored on disk.
+
+        :param host: The host of the GitLab instance.
+
+        :return: The new ProjectCatalog object.
+        """
+        return ProjectCatalog(host, ProjectCatalog.read().get(host))
+
+    @staticmethod
+    def read() -> Dict[str, Any]:
+        """Return the stored catalogs of all GitLab instances."""
+        stored = Utils.read_json(Constants.CATALOG_PATH, {})
+        if not isinstance(stored, dict) or not isinstance(
+            stored.get("instances"), dict
+        ):
+            return {}
+        return dict(stored["instances"])
+
+    def save(self, group_ids: List[ProjectId]) -> None:
+        """Store the catalog on disk for the next run.
+
+        The catalogs of other GitLab instances are kept as they are.
+
+        :param group_ids: The configured groups. Any other group, and
+            the projects only in other groups, are dropped.
+        """
+        groups = {
+            str(group): self.groups[str(group)]
+            for group in group_ids
+            if str(group) in self.groups
+        }
+        projects = {
+            project for group in groups.values() for project in group["projects"]
+        }
+        instances = ProjectCatalog.read()
+        instances[self.host] = {
+            "groups": groups,
+            "listings": {
+                project: listing
+                for project, listing in self.listings.items()
+                if project in projects
+            },
+        }
+        Utils.write_json(Constants.CATALOG_PATH, {"instances": instances})
+
+    def refresh(self, secret_token: str, api_url: str, group: ProjectId) -> None:
+        """Update the projects of a group.
+
+        If the projects cannot be downloaded, the stored ones are used.
+
+        :param secret_token: Token to access the GitLab API.
+        :param api_url: The URL of the GitLab API, including /api/v4.
+        :param group: The ID or path of the group.
+
+        :raises RCException: Raised when the projects cannot be
+            downloaded and none are stored.
+        """
+        now = time.time()
+        entry = self.groups.get(str(group))
+        url = (
+            f"{api_url}/groups/{group}/projects?include_subgroups=true"
+            "&archived=false&with_merge_requests_enabled=true&simple=true"
+            "&per_page=100"
+        )
+        full = entry is None or now - entry["listed_at"] > Constants.CATALOG_TTL
+        if entry is not None and not full:
+            updated_after = entry["updated_at"] - Constants.PROJECT_ACTIVITY_SLACK
+            url += "&last_activity_after=" + time.strftime(
+                "%Y-%m-%dT%H:%M:%SZ", time.gmtime(updated_after)
+            )
+        try:
+            found = {
+                str(project["id"]): project["last_activity_at"]
+                for project in Utils.download_gitlab_data(secret_token, url)
+            }
+        except DeadlineExceeded:
+            raise
+        except RCException as e:
+            if entry is None:
+                raise
+            logging.error("failed to list the projects of group %s: %s", group, e)
+            return
+
+        if entry is None or full:
+            entry = {"listed_at": now, "projects": found}
+        else:
+            entry["projects"].update(found)
+        entry["updated_at"] = now
+        self.groups[str(group)] = entry
+
+    def projects(
+        self, project_ids: List[ProjectId], group_ids: List[ProjectId], filters: str
+    ) -> List[ProjectId]:
+        """Return the projects to list the open MRs of.
+
+        :param project_ids: The configured projects, which are always
+            listed.
+        :param group_ids: The configured groups, which must have been
+            refreshed.
+        :param filters: The key of the filters the MRs are listed with,
+            see ListFilter.key().
+
+        :return: The configured projects, followed by the projects of
+            the groups that may have open MRs.
+        """
+        selected = list(project_ids)
+        seen = set(str(project) for project in project_ids)
+        for group in group_ids:
+            for project, activity in self.groups[str(group)]["projects"].items():
+                if project in seen:
+                    continue
+                seen.add(project)
+                if self.may_have_open_mrs(project, activity, filters):
+                    selected.append(project)
+                    Metrics.count("reviewcheck_cache_misses_total", cache="projects")
+                else:
+                    Metrics.count("reviewcheck_cache_hits_total", cache="projects")
+        return selected
+
+    def may_have_open_mrs(self, project: str, activity: str, filters: str) -> bool:
+        """Decide whether a project of a group needs to be listed.
+
+        :param project: The ID of the project.
+        :param activity: The time of the last activity in the project,
+            as given by GitLab.
+        :param filters: The key of the filters the MRs are listed with.
+
+        :return: False if the project had no open MRs when it was last
+            listed with the same filters, and there has been no activity
+            since.
+        """
+        listing = self.listings.get(project)
+        if listing is None or listing["open"] or listing.get("filters") != filters:
+            return True
+        try:
+            active_at = Utils.parse_time(activity)
+        except RCException:
+            return True
+        if active_at.tzinfo is None:
+            active_at = active_at.replace(tzinfo=timezone.utc)
+        return bool(
+            active_at.timestamp()
+            > listing["listed_at"] - Constants.PROJECT_ACTIVITY_SLACK
+        )
+
+    def record(
+        self, project: ProjectId, has_open_mrs: bool, listed_at: float, filters: str
+    ) -> None:
+        """Remember whether a project had open MRs.
+
+        :param project: The ID or path of the project.
+        :param has_open_mrs: Whether any open MRs were listed.
+        :param listed_at: The time the listing was started.
+        :param filters: The key of the filters the MRs were listed with.
+        """
+        self.listings[str(project)] = {
+            "listed_at": listed_at,
+            "open": has_open_mrs,
+            "filters": filters,
+        }
@@ -95,6 +95,37 @@ class Cli:
             dest="ignore",
         )
 
+        parser.add_argument(
+            "-t",
+            "--target-branch",
+            help=(
+                "Space separated list of target branches, only MRs to these\n"
+                "branches are shown, e.g. '-t main release'"
+            ),
+            action="store",
+            nargs="+",
+            default=[],
+            dest="target_branches",
+        )
+
+        parser.add_argument(
+            "-U",
+            "--updated-within",
+            help="Only show MRs updated within this many days",
+            type=Cli.check_positive_int,
+            action="store",
+            dest="updated_within",
+        )
+
+        parser.add_argument(
+            "-d",
+            "--hide-drafts",
+            help="Do not show draft MRs",
+            action="store_true",
+            default=False,
+            dest="hide_drafts",
+        )
+
         parser.add_argument(
             "-r",
             "--refresh",
@@ -114,6 +145,30 @@ class Cli:
             dest="minimal",
         )
 
+        parser.add_argument(
+            "-c",
+            "--changes-only",
+            help=(
+                "Only show threads with notes that are new or edited, or\n"
+                "that were reopened, since the last run"
+            ),
+            action="store_true",
+            default=False,
+            dest="changes_only",
+        )
+
+        parser.add_argument(
+            "-F",
+            "--fold-notes",
+            help=(
+                "Shorten long notes and fold code blocks, with --pager the\n"
+                "notes of an MR are shown in full with F"
+            ),
+            action="store_true",
+            default=False,
+            dest="fold_notes",
+        )
+
         parser.add_argument(
             "-w",
             "--width",
@@ -123,6 +178,18 @@ class Cli:
             dest="output_width",
         )
 
+        parser.add_argument(
+            "-f",
+            "--format",
+            help=(
+                "Output format. 'json' prints one document when done, 'ndjson'\n"
+                "prints one line per MR and thread as soon as it is available"
+            ),
+            choices=["rich", "json", "ndjson"],
+            action="store",
+            dest="output_format",
+        )
+
         parser.add_argument(
             "-N",
             "--no-notifications",
@@ -131,6 +198,77 @@ class Cli:
             default=False,
         )
 
+        parser.add_argument(
+            "-D",
+            "--deadline",
+            help=(
+                "Stop downloading after this many seconds and show what has\n"
+                "been downloaded"
+            ),
+            type=Cli.check_positive_int,
+            action="store",
+            dest="deadline",
+        )
+
+        parser.add_argument(
+            "-j",
+            "--render-processes",
+            help=(
+                "Render merge requests in this many processes, for faster\n"
+                "output when there are many threads"
+            ),
+            type=Cli.check_positive_int,
+            action="store",
+            dest="render_processes",
+        )
+
+        parser.add_argument(
+            "-p",
+            "--pager",
+            help=(
+                "Show the result on the full screen, where it can be scrolled\n"
+                "and merge requests can be collapsed"
+            ),
+            action="store_true",
+            default=False,
+            dest="pager",
+        )
+
+        parser.add_argument(
+            "-S",
+            "--sync",
+            help=(
+                "Keep threads stored locally and only download notes that\n"
+                "changed since the last run"
+            ),
+            action="store_true",
+            default=False,
+            dest="sync_notes",
+        )
+
+        parser.add_argument(
+            "--no-search-index",
+            help=(
+                "Do not add the downloaded notes to the index searched by\n"
+                "the search command"
+            ),
+            action="store_true",
+            default=False,
+            dest="no_search_index",
+        )
+
+        parser.add_argument(
+            "--profile",
+            help=(
+                "Profile where the time ('cpu') or memory ('memory') goes, and\n"
+                "write the reports to the cache directory. Can be given twice"
+            ),
+            choices=["cpu", "memory"],
+            action="append",
+            default=[],
+            dest="profile",
+        )
+
         subparsers = parser.add_subparsers(dest="command")
 
         subparsers.add_parser(
@@ -139,4 +277,30 @@ class Cli:
             description="Asks for input to write to the configuration file.",
         )
 
+        search_parser = subparsers.add_parser(
+            "search",
+            help="Search the threads downloaded on earlier runs",
+            description=(
+                "Shows the threads with notes matching the query, from the merge\n"
+                "requests downloaded on earlier runs, without asking GitLab."
+            ),
+            formatter_class=RawTextHelpFormatter,
+        )
+        search_parser.add_argument(
+            "query",
+            help=(
+                "Words to search for. Quotes, OR, NOT and prefix* work like in\n"
+                "SQLite FTS5 queries"
+            ),
+            nargs="+",
+        )
+        search_parser.add_argument(
+            "-n",
+            "--limit",
+            help="Show at most this many threads",
+            type=Cli.check_positive_int,
+            action="store",
+            dest="limit",
+        )
+
         return parser.parse_args()
@@ -0,0 +1,211 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the ConcurrencyLimiter class."""
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+from reviewcheck.constants import Constants
+from reviewcheck.exceptions import TransportError
+from reviewcheck.metrics import Metrics
+
+R = TypeVar("R")
+
+# HTTP status codes telling that the server is overloaded
+OVERLOAD_STATUS_CODES = (429, 502, 503, 504)
+
+
+class ConcurrencyLimiter:
+    """Limit the number of requests to GitLab sent at the same time.
+
+    The limit is adjusted while running, in the same way as TCP adjusts
+    the number of packets in flight (AIMD). While the server keeps up,
+    the limit grows by one for each round of requests that used all of
+    it. When the server is overloaded, which it tells by failing or
+    rejecting requests, the limit is halved, and when requests become
+    much slower than usual, it is lowered by a tenth. Only requests
+    sent after the last decrease can cause another, so a burst of
+    failures lowers the limit once.
+
+    The limit stays between CONCURRENCY_MIN and THREADPOOL_MAXSIZE.
+    Each run ends where the server can keep up, and the limit reached
+    is stored per GitLab host as the starting point of the next run.
+    """
+
+    def __init__(self, limit: float = Constants.CONCURRENCY_INITIAL, host: str = ""):
+        """Initialize a ConcurrencyLimiter object.
+
+        :param limit: The number of requests to allow at the same time
+            to begin with.
+        :param host: The host the requests are sent to, to label the
+            limit with in the metrics.
+        """
+        self.limit = ConcurrencyLimiter.clamp(limit)
+        self.host = host
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        # The number of requests started, and that number when all
+        # requests allowed were last in flight, and when the limit was
+        # last decreased
+        self.started = 0
+        self.full_at = 0
+        self.decreased_at = 0
+        # Averages of recent latencies, over a short and a long time
+        self.samples = 0
+        self.short_latency = 0.0
+        self.long_latency = 0.0
+        Metrics.set("reviewcheck_concurrency_limit", self.limit, host=self.host)
+
+    @staticmethod
+    def clamp(limit: float) -> float:
+        """Return the limit, moved to within the allowed range."""
+        return float(
+            min(max(limit, Constants.CONCURRENCY_MIN), Constants.THREADPOOL_MAXSIZE)
+        )
+
+    def call(self, request: Callable[[], R], status: Callable[[R], int]) -> R:
+        """Make a request when the limit allows it.
+
+        :param request: The function making the request.
+        :param status: A function returning the HTTP status code of the
+            result of the request.
+
+        :raises Exception: Whatever the request raised.
+
+        :return: The result of the request.
+        """
+        reserved = self.reserve(request, status)
+        assert reserved is not None
+        return reserved()
+
+    def reserve(
+        self,
+        request: Callable[[], R],
+        status: Callable[[R], int],
+        blocking: bool = True,
+    ) -> Optional[Callable[[], R]]:
+        """Reserve the right to make a request, to make it later.
+
+        The request is counted as in flight from now on, until it has
+        been made with the returned function, which must be called
+        once.
+
+        :param request: The function making the request.
+        :param status: A function returning the HTTP status code of the
+            result of the request.
+        :param blocking: Whether to wait until the limit allows the
+            request. Otherwise nothing is reserved if it doesn't.
+
+        :return: A function making the request and returning its
+            result, or None if the limit did not allow it.
+        """
+        ticket = self.acquire() if blocking else self.try_acquire()
+        if ticket is None:
+            return None
+
+        def reserved() -> R:
+            start = time.monotonic()
+            try:
+                result = request()
+            except TransportError:
+                self.release(ticket, None)
+                raise
+            except BaseException:
+                self.release(ticket, 0.0, count=False)
+                raise
+            overloaded = status(result) in OVERLOAD_STATUS_CODES
+            self.release(ticket, None if overloaded else time.monotonic() - start)
+            return result
+
+        return reserved
+
+    def acquire(self) -> int:
+        """Wait until a request may be sent.
+
+        :return: The number of the request.
+        """
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            return self.admit()
+
+    def try_acquire(self) -> Optional[int]:
+        """Let a request be sent if the limit allows it right now.
+
+        :return: The number of the request, or None if not allowed.
+        """
+        with self.condition:
+            if self.in_flight >= int(self.limit):
+                return None
+            return self.admit()
+
+    def admit(self) -> int:
+        """Count a request as in flight, holding the condition.
+
+        :return: The number of the request.
+        """
+        self.in_flight += 1
+        self.started += 1
+        if self.in_flight >= int(self.limit):
+            self.full_at = self.started
+        return self.started
+
+    def release(
+        self,
+        ticket: int,
+        latency: Optional[float],
+        count: bool = True,
+    ) -> None:
+        """Let the next request be sent, and adjust the limit.
+
+        :param ticket: The number of the request, see acquire().
+        :param latency: The number of seconds the request took, or None
+            if the server was overloaded.
+        :param count: Whether the request tells anything about the
+            server. Requests that were interrupted do not.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+            if not count:
+                return
+            if latency is None:
+                self.decrease(ticket, 0.5)
+            elif self.record(latency):
+                self.decrease(ticket, 0.9)
+            elif ticket <= self.full_at:
+                # All requests allowed were in flight with this one, so
+                # more might have been sent
+                self.limit = ConcurrencyLimiter.clamp(self.limit + 1 / self.limit)
+            Metrics.set("reviewcheck_concurrency_limit", self.limit, host=self.host)
+
+    def record(self, latency: float) -> bool:
+        """Add a latency to the averages.
+
+        :param latency: The number of seconds a request took.
+
+        :return: Whether recent requests have become much slower than
+            usual.
+        """
+        if self.samples == 0:
+            self.short_latency = self.long_latency = latency
+        self.samples += 1
+        self.short_latency += (latency - self.short_latency) * 0.2
+        self.long_latency += (latency - self.long_latency) * 0.02
+        return bool(
+            self.samples >= Constants.CONCURRENCY_MIN_SAMPLES
+            and self.short_latency
+            > self.long_latency * Constants.CONCURRENCY_LATENCY_TOLERANCE
+        )
+
+    def decrease(self, ticket: int, factor: float) -> None:
+        """Lower the limit, unless lowered since the request was sent.
+
+        :param ticket: The number of the request, see acquire().
+        :param factor: The factor to multiply the limit by.
+        """
+        if ticket <= self.decreased_at:
+            return
+        self.limit = ConcurrencyLimiter.clamp(self.limit * factor)
+        self.decreased_at = self.started
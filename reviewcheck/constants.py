@@ -46,6 +46,16 @@ class Constants:
     CACHE_DIR: Path = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
     DATA_DIR: Path = CACHE_DIR / "reviewcheck"
     COMMENT_NOTE_IDS_PATH: Path = DATA_DIR / "old_comment_ids"
+    PARTICIPATION_PATH: Path = DATA_DIR / "participation.json"
+    DISCUSSIONS_DIR: Path = DATA_DIR / "discussions"
+    FALLBACK_DIR: Path = DATA_DIR / "merge_requests"
+    REACTIONS_PATH: Path = DATA_DIR / "reactions.json"
+    SNAPSHOT_PATH: Path = DATA_DIR / "snapshot.json"
+    CATALOG_PATH: Path = DATA_DIR / "projects.json"
+    NOTES_PATH: Path = DATA_DIR / "notes.json"
+    CONCURRENCY_PATH: Path = DATA_DIR / "concurrency.json"
+    PROFILE_DIR: Path = DATA_DIR / "profile"
+    SEARCH_INDEX_PATH: Path = DATA_DIR / "search.sqlite"
 
     TUI_AUTHOR_WIDTH = 16
     TUI_DATE_WIDTH = 12
@@ -53,3 +63,92 @@ class Constants:
     TUI_THREE_COL_PADDING_WIDTH = 10
 
     THREADPOOL_MAXSIZE = 32
+    # The number of requests to GitLab sent at the same time is adjusted
+    # while running, see ConcurrencyLimiter. It starts at
+    # CONCURRENCY_INITIAL unless a limit was stored by an earlier run,
+    # and stays between CONCURRENCY_MIN and THREADPOOL_MAXSIZE. Before
+    # it is lowered because requests have become slow, at least
+    # CONCURRENCY_MIN_SAMPLES requests must have been made, and recent
+    # requests must be CONCURRENCY_LATENCY_TOLERANCE times slower than
+    # usual.
+    CONCURRENCY_INITIAL = 8
+    CONCURRENCY_MIN = 1
+    CONCURRENCY_MIN_SAMPLES = 20
+    CONCURRENCY_LATENCY_TOLERANCE = 2.0
+    # The maximum number of connections opened by the http2 transport,
+    # each of which can carry many concurrent requests.
+    HTTP2_MAX_CONNECTIONS = 2
+    # The number of seconds to wait for an answer to a request, unless
+    # configured otherwise
+    REQUEST_TIMEOUT = 30
+    # The number of recent requests whose latency decides when to send
+    # a duplicate of a slow request, the number needed before any
+    # duplicate is sent, and the maximum number of duplicates in flight
+    HEDGE_WINDOW = 200
+    HEDGE_MIN_SAMPLES = 20
+    HEDGE_MAX_IN_FLIGHT = 4
+    # How many times a request is sent again when the server closes an
+    # HTTP/2 connection before answering it.
+    HTTP2_GOAWAY_RETRIES = 3
+    # The number of seconds to give GitLab a break after it fails a
+    # request with a server error, since it may be overloaded
+    SERVER_ERROR_BACKOFF = 5
+    # The maximum number of MRs being downloaded or waiting to be
+    # presented at the same time.
+    PIPELINE_MAX_IN_FLIGHT = 2 * THREADPOOL_MAXSIZE
+
+    # Weights used when deciding in which order MRs are downloaded. The
+    # weights are powers of two so that a higher role always outranks
+    # any combination of lower ones.
+    PRIORITY_AUTHOR = 8
+    PRIORITY_REVIEWER = 4
+    PRIORITY_ASSIGNEE = 2
+    PRIORITY_RECENTLY_UPDATED = 1
+    PRIORITY_RECENT_HOURS = 24
+
+    # Notes to download per page when syncing notes, and the number of
+    # seconds after which all threads of an MR are downloaded again
+    # anyway, in case a change was missed.
+    NOTE_SYNC_PAGE_SIZE = 100
+    NOTE_SYNC_FULL_INTERVAL = 24 * 60 * 60
+
+    # The number of seconds after which all projects of a group are
+    # listed again, see ProjectCatalog, and the number of seconds that
+    # GitLab may be late in updating the activity time of a project
+    CATALOG_TTL = 24 * 60 * 60
+    PROJECT_ACTIVITY_SLACK = 60 * 60
+
+    # The number of MRs to remember the Jira ticket of, see
+    # JiraExtractor
+    JIRA_CACHE_SIZE = 4096
+
+    # The number of frames of the traceback stored for each allocation
+    # with --profile memory, and the number of functions and allocation
+    # sites in the summary and in the reports of --profile, see Profiler
+    PROFILE_MEMORY_FRAMES = 10
+    PROFILE_SUMMARY_SIZE = 10
+    PROFILE_REPORT_SIZE = 50
+
+    # The number of threads shown by the search command unless asked
+    # for more, and the number of words in the snippet of each note
+    SEARCH_LIMIT = 20
+    SEARCH_SNIPPET_TOKENS = 16
+
+    # The number of days the notes of an MR are kept in the search
+    # index after it was last seen open, see SearchIndex.prune()
+    SEARCH_RETENTION_DAYS = 180
+
+    # The minimum number of seconds between two frames of the dashboard
+    # shown with --refresh
+    DASHBOARD_DRAW_INTERVAL = 0.1
+
+    # The number of seconds to wait before retrying MRs that failed to
+    # download with --refresh. The wait doubles after each attempt.
+    RETRY_INITIAL_DELAY = 15
+
+    # The number of lines and bytes to cut notes at when folding them,
+    # unless configured otherwise, and the number of lines of code
+    # blocks that are folded away, see NoteFolder
+    NOTE_MAX_LINES = 15
+    NOTE_MAX_BYTES = 2000
+    CODE_BLOCK_MAX_LINES = 5
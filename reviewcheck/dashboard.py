@@ -0,0 +1,669 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the full screen view of reviewcheck."""
+import bisect
+import os
+import re
+import signal
+import sys
+import threading
+import time
+from types import TracebackType
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+)
+
+from rich.console import Console, RenderableType
+from rich.panel import Panel
+from rich.text import Text
+
+from reviewcheck.constants import Constants
+
+# A part of an MR shown on screen: the key of the MR, and the index of
+# one of its renderables, -1 for its summary when it is collapsed, or
+# -2 for the line below it telling how far it has been refreshed.
+Block = Tuple[str, int]
+
+
+class ScreenWriter:
+    """Write frames to the terminal, redrawing only changed lines.
+
+    The writer remembers the last frame written. When a new frame is
+    written, the cursor is moved to each line that differs from the
+    last frame and only that line is written, so the number of bytes
+    sent to the terminal grows with the number of changed lines rather
+    than with the size of the frame.
+    """
+
+    def __init__(self, file: IO[str]):
+        """Initialize a ScreenWriter object.
+
+        :param file: The terminal to write to.
+        """
+        self.file = file
+        self.lines: List[str] = []
+
+    def write(self, lines: Sequence[str]) -> int:
+        """Write a frame, one string with escape codes for each line.
+
+        :param lines: The lines of the frame, none of which may be wider
+            than the terminal.
+
+        :return: The number of characters written to the terminal.
+        """
+        output = []
+        for row, line in enumerate(lines):
+            if row >= len(self.lines) or self.lines[row] != line:
+                # Move to the start of the row, write the line and erase
+                # whatever is left of the old line.
+                output.append(f"\x1b[{row + 1};1H{line}\x1b[0m\x1b[K")
+        for row in range(len(lines), len(self.lines)):
+            output.append(f"\x1b[{row + 1};1H\x1b[K")
+
+        data = "".join(output)
+        if data:
+            self.file.write(data)
+            self.file.flush()
+        self.lines = list(lines)
+        return len(data)
+
+    def clear(self) -> None:
+        """Clear the screen, so the next frame is written in full."""
+        self.file.write("\x1b[2J")
+        self.file.flush()
+        self.lines = []
+
+
+class Dashboard:
+    """Show the review info of the MRs on one screen, like a pager.
+
+    The dashboard takes over the alternate screen of the terminal. Each
+    MR replaces its old version as soon as it has been downloaded, and
+    when refreshing, the MRs of the last cycle stay on screen until the
+    next cycle is done.
+
+    Only the parts of MRs that are on screen are rendered, and they are
+    rendered once until the MR is updated or the terminal is resized,
+    so drawing a frame takes time in proportion to the size of the
+    screen rather than the number of threads. Only the lines that
+    changed since the last frame are written to the terminal.
+
+    When interactive, the view is scrolled and MRs are collapsed to a
+    single line with the keys listed in HELP.
+    """
+
+    HELP = (
+        "j/k: scroll  space/b: page  n/p: next/previous MR  "
+        "enter: collapse  C/E: collapse/expand all  F: full notes  q: quit"
+    )
+
+    KEYS = {
+        "j": "down",
+        "\x1b[B": "down",
+        "k": "up",
+        "\x1b[A": "up",
+        " ": "page_down",
+        "f": "page_down",
+        "\x1b[6~": "page_down",
+        "b": "page_up",
+        "\x1b[5~": "page_up",
+        "g": "home",
+        "\x1b[H": "home",
+        "\x1b[1~": "home",
+        "G": "end",
+        "\x1b[F": "end",
+        "\x1b[4~": "end",
+        "n": "next_mr",
+        "p": "previous_mr",
+        "\n": "toggle",
+        "\r": "toggle",
+        "o": "toggle",
+        "C": "collapse_all",
+        "E": "expand_all",
+        "F": "unfold",
+        "q": "quit",
+    }
+
+    # The line below an MR from the last cycle until it is downloaded
+    # again, and below an MR that could not be downloaded, see mark()
+    PENDING_MARK = "waiting to be downloaded again"
+    MISSING_MARK = "could not be downloaded, shown from an earlier refresh"
+
+    KEY_REGEX = re.compile(r"\x1b\[[0-9;]*[~A-Za-z]|\x1bO[A-Za-z]|.", flags=re.DOTALL)
+
+    def __init__(self, console: Console, width: int, interactive: bool = False):
+        """Initialize a Dashboard object.
+
+        :param console: The console of the terminal to draw on.
+        :param width: The width to render MRs at, if the terminal is
+            wide enough.
+        :param interactive: Whether to read keys from standard input to
+            scroll and collapse. Only possible on POSIX terminals.
+        """
+        self.console = console
+        self.width = width
+        self.interactive = interactive
+        self.writer = ScreenWriter(console.file)
+        self.size = console.size
+        self.lock = threading.RLock()
+        self.closed = threading.Event()
+        self.waiting = False
+        self.terminal_settings: Any = None
+
+        self.status = ""
+        self.finished_at = ""
+        # The number of projects and groups not listed in the last cycle
+        self.unlisted = 0
+        # The renderables of each MR and the summary shown when it is
+        # collapsed, by key, and the lines of the parts rendered so far
+        self.renderables: Dict[str, Sequence[RenderableType]] = {}
+        self.summaries: Dict[str, RenderableType] = {}
+        self.lines: Dict[str, Dict[int, List[str]]] = {}
+        self.collapsed: Set[str] = set()
+        # How to create the renderables of each MR with its notes in
+        # full, the MRs to show that way, and those created so far
+        self.unfolders: Dict[str, Callable[[], Sequence[RenderableType]]] = {}
+        self.unfolded: Set[str] = set()
+        self.full_renderables: Dict[str, Sequence[RenderableType]] = {}
+        # Whether a cycle is in progress, the MRs that could not be
+        # downloaded in the last one, and the rendered lines below MRs
+        self.cycling = False
+        self.missing: Set[str] = set()
+        self.marks: Dict[str, List[str]] = {}
+        # The MRs shown by the last cycle, and those updated so far in
+        # the current cycle, in order
+        self.shown: List[str] = []
+        self.updated: List[str] = []
+        self.updated_keys: Set[str] = set()
+        # The parts to show of all MRs, and the index of the first part
+        # of each MR, until something changes, see layout()
+        self.blocks: Optional[List[Block]] = None
+        self.first_block: Dict[str, int] = {}
+        self.first_blocks: List[int] = []
+        # The part at the top of the screen and how many of its lines
+        # are scrolled past, or None to show the first MR
+        self.top: Optional[Tuple[Block, int]] = None
+        self.last_draw = 0.0
+
+    def __enter__(self) -> "Dashboard":
+        """Switch to the alternate screen and start reading keys."""
+        self.console.set_alt_screen(True)
+        self.console.show_cursor(False)
+        self.writer.clear()
+        if self.interactive:
+            try:
+                import termios
+                import tty
+            except ImportError:
+                self.interactive = False
+            else:
+                # Keys are read one by one without echo, while Ctrl-C
+                # still interrupts.
+                self.terminal_settings = termios.tcgetattr(sys.stdin.fileno())
+                tty.setcbreak(sys.stdin.fileno())
+                threading.Thread(target=self.read_keys, daemon=True).start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Restore the terminal."""
+        if self.terminal_settings is not None:
+            import termios
+
+            termios.tcsetattr(
+                sys.stdin.fileno(), termios.TCSADRAIN, self.terminal_settings
+            )
+        self.console.show_cursor(True)
+        self.console.set_alt_screen(False)
+
+    def start_cycle(self) -> None:
+        """Start a refresh cycle, keeping the last frame on screen."""
+        with self.lock:
+            self.cycling = True
+            self.updated = []
+            self.updated_keys = set()
+            self.blocks = None
+            self.set_status(self.refreshing("listing merge requests..."))
+
+    def set_progress(self, done: int, total: int) -> None:
+        """Show how many MRs of this cycle have been downloaded."""
+        self.set_status(self.refreshing(f"downloaded {done} of {total} merge requests"))
+
+    def refreshing(self, progress: str) -> str:
+        """Return the status while refreshing.
+
+        :param progress: How far the refresh has come.
+
+        :return: The status, telling how old the MRs still shown from
+            the last cycle are.
+        """
+        if self.finished_at:
+            return f"Status as of {self.finished_at}, refreshing, {progress}"
+        return f"Refreshing, {progress}"
+
+    def update(
+        self,
+        key: str,
+        renderables: Sequence[RenderableType],
+        summary: RenderableType = "",
+        unfold: Optional[Callable[[], Sequence[RenderableType]]] = None,
+    ) -> None:
+        """Replace the old version of an MR with a new one.
+
+        The MR is not rendered until it is on screen.
+
+        :param key: A key identifying the MR between cycles.
+        :param renderables: What to show for the MR, which is nothing if
+            the MR doesn't need attention.
+        :param summary: What to show for the MR when it is collapsed.
+        :param unfold: A function creating what to show for the MR with
+            its notes in full, if they are folded. It is only called
+            when the user asks for the full notes.
+        """
+        with self.lock:
+            self.renderables[key] = renderables
+            self.summaries[key] = summary
+            self.full_renderables.pop(key, None)
+            if unfold is None:
+                self.unfolders.pop(key, None)
+            else:
+                self.unfolders[key] = unfold
+            self.lines[key] = {}
+            if key not in self.updated_keys:
+                self.updated.append(key)
+                self.updated_keys.add(key)
+            self.blocks = None
+            self.draw()
+
+    def finish_cycle(
+        self,
+        missing: Sequence[str] = (),
+        finished_at: Optional[str] = None,
+        unlisted: int = 0,
+    ) -> None:
+        """Remove the MRs that were not updated in this cycle.
+
+        :param missing: The keys of MRs that could not be downloaded.
+            Their old versions are kept, if any.
+        :param finished_at: When the MRs shown were downloaded, if not
+            now. Used to show the snapshot of the last run, see
+            Snapshot.
+        :param unlisted: The number of projects and groups whose MRs
+            could not be listed. If any, the old versions of all MRs
+            are kept, since they may be in one of them.
+        """
+        with self.lock:
+            self.unlisted = unlisted
+            kept = list(self.shown) if unlisted else missing
+            for key in kept:
+                if key in self.renderables and key not in self.updated_keys:
+                    self.updated.append(key)
+                    self.updated_keys.add(key)
+            for key in self.shown:
+                if key not in self.updated_keys:
+                    self.forget(key)
+            self.cycling = False
+            self.missing = set(missing)
+            self.shown = self.updated
+            self.updated = []
+            self.updated_keys = set()
+            self.blocks = None
+            self.finished_at = finished_at or time.strftime("%Y-%m-%d %H:%M")
+            self.show_missing(len(missing))
+
+    def forget(self, key: str) -> None:
+        """Remove everything kept for an MR that is no longer shown."""
+        self.renderables.pop(key, None)
+        self.summaries.pop(key, None)
+        self.lines.pop(key, None)
+        self.unfolders.pop(key, None)
+        self.full_renderables.pop(key, None)
+        self.unfolded.discard(key)
+        self.collapsed.discard(key)
+
+    def show_missing(self, count: int) -> None:
+        """Show how many MRs could not be downloaded in the status bar.
+
+        :param count: The number of MRs, which changes when MRs that
+            failed are downloaded again between cycles.
+        """
+        status = f"Status as of {self.finished_at}"
+        if count:
+            status += f", {count} merge requests could not be downloaded"
+        if self.unlisted:
+            status += f", {self.unlisted} projects or groups could not be listed"
+        self.set_status(status, True)
+
+    def set_status(self, status: str, force: bool = False) -> None:
+        """Change the text of the status bar and draw the frame."""
+        with self.lock:
+            self.status = status
+            self.draw(force)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the user quits or the timeout has passed.
+
+        :param timeout: The number of seconds to wait, or None to wait
+            until the user quits.
+
+        :return: True if the user has quit.
+        """
+        with self.lock:
+            self.waiting = True
+        try:
+            return self.closed.wait(timeout)
+        finally:
+            with self.lock:
+                self.waiting = False
+
+    def read_keys(self) -> None:
+        """Read keys from standard input and act on them."""
+        while True:
+            data = os.read(sys.stdin.fileno(), 32).decode(errors="ignore")
+            if not data:
+                return
+            for key in Dashboard.KEY_REGEX.findall(data):
+                self.handle_key(key)
+
+    def handle_key(self, key: str) -> None:
+        """Act on a key pressed by the user.
+
+        :param key: The key, as the characters sent by the terminal.
+        """
+        action = Dashboard.KEYS.get(key)
+        if action is None:
+            return
+        if action == "quit":
+            with self.lock:
+                self.closed.set()
+                if not self.waiting:
+                    # Stop the downloads, just like Ctrl-C does
+                    os.kill(os.getpid(), signal.SIGINT)
+            return
+
+        with self.lock:
+            blocks = self.layout()
+            if blocks:
+                index, offset = self.locate(blocks)
+                page = max(self.view_height() - 1, 1)
+                if action == "down":
+                    index, offset = self.scroll(blocks, index, offset, 1)
+                elif action == "up":
+                    index, offset = self.scroll(blocks, index, offset, -1)
+                elif action == "page_down":
+                    index, offset = self.scroll(blocks, index, offset, page)
+                elif action == "page_up":
+                    index, offset = self.scroll(blocks, index, offset, -page)
+                elif action == "home":
+                    index, offset = 0, 0
+                elif action == "end":
+                    index, offset = len(blocks) - 1, 0
+                elif action == "next_mr":
+                    key = blocks[index][0]
+                    while index < len(blocks) - 1 and blocks[index][0] == key:
+                        index += 1
+                    offset = 0
+                elif action == "previous_mr":
+                    if offset == 0 and index > 0:
+                        index -= 1
+                    key = blocks[index][0]
+                    while index > 0 and blocks[index - 1][0] == key:
+                        index -= 1
+                    offset = 0
+                else:
+                    key = blocks[index][0]
+                    self.toggle(key, action)
+                    blocks = self.layout()
+                    index, offset = self.first_block[key], 0
+                self.top = (blocks[index], offset)
+            self.draw(True)
+
+    def toggle(self, key: str, action: str) -> None:
+        """Collapse or expand MRs.
+
+        :param key: The key of the MR at the top of the screen.
+        :param action: "toggle" to collapse or expand that MR,
+            "collapse_all" or "expand_all", or "unfold" to show the
+            notes of that MR in full or folded again.
+        """
+        if action == "unfold":
+            if key in self.unfolded:
+                self.unfolded.remove(key)
+            elif key in self.unfolders:
+                self.unfolded.add(key)
+            self.lines[key] = {}
+        elif action == "collapse_all":
+            self.collapsed = set(self.renderables)
+        elif action == "expand_all":
+            self.collapsed = set()
+        elif key in self.collapsed:
+            self.collapsed.remove(key)
+        else:
+            self.collapsed.add(key)
+        self.blocks = None
+
+    def layout(self) -> List[Block]:
+        """Return the parts to show of all MRs, in order.
+
+        Nothing is rendered, and the list is only made again when MRs
+        have been updated, collapsed or expanded.
+        """
+        if self.blocks is None:
+            self.blocks = []
+            self.first_block = {}
+            for key in self.updated + [
+                key for key in self.shown if key not in self.updated_keys
+            ]:
+                if not self.renderables[key]:
+                    continue
+                self.first_block[key] = len(self.blocks)
+                if key in self.collapsed:
+                    self.blocks.append((key, -1))
+                else:
+                    self.blocks += [(key, i) for i in range(len(self.parts(key)))]
+                # Always there, so that marking the MR moves nothing
+                self.blocks.append((key, -2))
+            self.first_blocks = list(self.first_block.values())
+        return self.blocks
+
+    def locate(self, blocks: List[Block]) -> Tuple[int, int]:
+        """Find the part at the top of the screen.
+
+        :param blocks: The parts to show, see blocks().
+
+        :return: The index of the part, and how many of its lines are
+            scrolled past.
+        """
+        if self.top is None:
+            return 0, 0
+        (key, part), offset = self.top
+        if key not in self.first_block:
+            return 0, 0
+        index = self.first_block[key] + max(part, 0)
+        if index < len(blocks) and blocks[index] == (key, part):
+            return index, offset
+        # The part is gone, so show what is left of its MR
+        return self.first_block[key], 0
+
+    def scroll(
+        self, blocks: List[Block], index: int, offset: int, delta: int
+    ) -> Tuple[int, int]:
+        """Move the top of the screen by a number of lines.
+
+        Only the parts scrolled past are rendered.
+
+        :param blocks: The parts to show, see blocks().
+        :param index: The index of the part at the top of the screen.
+        :param offset: The number of lines of the part scrolled past.
+        :param delta: The number of lines to scroll, negative for up.
+
+        :return: The new index and offset.
+        """
+        offset += delta
+        while offset < 0 and index > 0:
+            index -= 1
+            offset += len(self.render_block(blocks[index]))
+        offset = max(offset, 0)
+        while offset >= len(self.render_block(blocks[index])):
+            if index == len(blocks) - 1:
+                return index, max(len(self.render_block(blocks[index])) - 1, 0)
+            offset -= len(self.render_block(blocks[index]))
+            index += 1
+        return index, offset
+
+    def view_height(self) -> int:
+        """Return the number of lines available for MRs."""
+        # The status bar takes three lines and the footer one
+        return max(self.size.height - 4, 1)
+
+    def draw(self, force: bool = False) -> None:
+        """Write the changed lines of the frame to the terminal.
+
+        Frames are drawn at most every DASHBOARD_DRAW_INTERVAL seconds,
+        unless forced.
+
+        :param force: Whether to draw even if a frame was just drawn.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.last_draw < Constants.DASHBOARD_DRAW_INTERVAL:
+                return
+            self.last_draw = now
+
+            if self.console.size != self.size:
+                # Everything has to be laid out again for the new size.
+                self.size = self.console.size
+                self.lines = {key: {} for key in self.lines}
+                self.marks = {}
+                self.writer.clear()
+
+            status_bar = Panel(
+                Text(self.status, justify="center"), style="reverse bold"
+            )
+            frame = self.render([status_bar])
+
+            blocks = self.layout()
+            height = self.view_height()
+            index, offset = self.locate(blocks)
+            body: List[str] = []
+            below = index
+            while below < len(blocks) and len(body) < offset + height:
+                body += self.render_block(blocks[below])
+                below += 1
+            body = body[offset:]
+            # Scroll up rather than leave the bottom of the screen empty
+            while len(body) < height and (index > 0 or offset > 0):
+                if offset == 0:
+                    index -= 1
+                    offset = len(self.render_block(blocks[index]))
+                start = max(offset - (height - len(body)), 0)
+                body = self.render_block(blocks[index])[start:offset] + body
+                offset = start
+            if self.top is not None and blocks:
+                self.top = (blocks[index], offset)
+            more = len(body) > height or below < len(blocks)
+            frame += body[:height]
+
+            frame += [""] * (self.size.height - 1 - len(frame))
+            frame += self.render([self.footer(blocks, index, more)])
+            self.writer.write(frame[: self.size.height])
+
+    def footer(self, blocks: List[Block], index: int, more: bool) -> Text:
+        """Return the line at the bottom of the screen.
+
+        :param blocks: The parts to show, see blocks().
+        :param index: The index of the part at the top of the screen.
+        :param more: Whether there is more to show below the screen.
+
+        :return: The position in the list of MRs, and help on the keys
+            if interactive.
+        """
+        position = bisect.bisect_right(self.first_blocks, index) if blocks else 0
+        text = f"MR {position} of {len(self.first_blocks)}"
+        if more:
+            text += ", more below"
+        if self.interactive:
+            text += f" | {Dashboard.HELP}"
+        return Text(text, style="dim", no_wrap=True, overflow="ellipsis")
+
+    def parts(self, key: str) -> Sequence[RenderableType]:
+        """Return the renderables of an MR, with full notes if asked.
+
+        :param key: The key of the MR.
+        """
+        if key in self.unfolded and key in self.unfolders:
+            if key not in self.full_renderables:
+                self.full_renderables[key] = self.unfolders[key]()
+            return self.full_renderables[key]
+        return self.renderables[key]
+
+    def render_block(self, block: Block) -> List[str]:
+        """Render one part of an MR, unless already rendered.
+
+        :param block: The part to render.
+
+        :return: The rendered lines.
+        """
+        key, part = block
+        if part == -2:
+            mark = self.mark(key)
+            if mark not in self.marks:
+                self.marks[mark] = self.render(
+                    [Text(mark, style="dim italic", no_wrap=True, overflow="ellipsis")]
+                )
+            return self.marks[mark]
+        if part not in self.lines[key]:
+            if part == -1:
+                renderable = self.summaries[key]
+            else:
+                renderable = self.parts(key)[part]
+            self.lines[key][part] = self.render([renderable])
+        return self.lines[key][part]
+
+    def mark(self, key: str) -> str:
+        """Return the line to show below an MR.
+
+        :param key: The key of the MR.
+
+        :return: Whether the MR is waiting to be downloaded again in
+            this cycle or could not be downloaded, or an empty line.
+        """
+        if self.cycling and key not in self.updated_keys:
+            return Dashboard.PENDING_MARK
+        if key in self.missing and key not in self.updated_keys:
+            return Dashboard.MISSING_MARK
+        return ""
+
+    def render(self, renderables: Sequence[RenderableType]) -> List[str]:
+        """Render to lines of text with escape codes.
+
+        :param renderables: The components to render.
+
+        :return: The rendered lines.
+        """
+        width = min(self.width, self.size.width)
+        # Colors are detected the same way as for the terminal itself
+        renderer = Console(
+            width=width,
+            color_system="auto" if self.console.color_system else None,
+            force_terminal=True,
+            legacy_windows=False,
+        )
+        with renderer.capture() as capture:
+            for renderable in renderables:
+                renderer.print(renderable, width=width)
+        return capture.get().splitlines()
@@ -0,0 +1,156 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the DeltaEngine class for finding changed notes."""
+import hashlib
+from typing import Any, Dict, List, Optional, Set
+
+from reviewcheck.constants import Constants
+from reviewcheck.merge_request import MergeRequest
+from reviewcheck.utils import Utils
+
+
+class DeltaEngine:
+    """Find what changed in the threads of each MR since the last run.
+
+    For each thread the user takes part in, a fingerprint is stored:
+    whether the thread is resolved, and for each note its update time
+    and a short hash of its body. Comparing the threads of a downloaded
+    MR with the fingerprints tells which notes are new or edited and
+    which threads were resolved or reopened. A note is only hashed
+    again when its update time has changed, so the cost of each run is
+    in proportion to the number of changes. MRs that are not downloaded
+    keep their fingerprints until they are closed.
+
+    The changes are set on the MR, see MergeRequest.note_changes and
+    MergeRequest.thread_changes, and decide which notifications are
+    sent and what is shown with --changes-only.
+    """
+
+    def __init__(
+        self,
+        user: str,
+        merge_requests: Optional[Dict[str, Dict[str, Any]]] = None,
+        seen_ids: Optional[Set[str]] = None,
+    ):
+        """Initialize a DeltaEngine object.
+
+        :param user: The username of the configured user.
+        :param merge_requests: The fingerprints of the threads of each
+            MR, as stored by save(). Empty if not given.
+        :param seen_ids: The IDs of the last notes of the threads
+            needing a reply on the last run, as stored by earlier
+            versions of reviewcheck. Threads ending with one of these
+            are not considered changed when there are no fingerprints
+            for their MR.
+        """
+        self.user = user
+        self.merge_requests: Dict[str, Dict[str, Any]] = merge_requests or {}
+        self.seen_ids = seen_ids
+
+    @staticmethod
+    def load(user: str) -> "DeltaEngine":
+        """Create a DeltaEngine with the fingerprints stored on disk.
+
+        The fingerprints are only used if they were stored for the same
+        user. If none have been stored yet, the note IDs stored by
+        earlier versions of reviewcheck are used instead.
+
+        :param user: The username of the configured user.
+
+        :return: The new DeltaEngine object.
+        """
+        stored = Utils.read_json(Constants.NOTES_PATH, None)
+        if stored is None:
+            try:
+                with open(Constants.COMMENT_NOTE_IDS_PATH) as f:
+                    return DeltaEngine(user, seen_ids=set(f.read().split()))
+            except FileNotFoundError:
+                return DeltaEngine(user)
+        if not isinstance(stored, dict) or stored.get("user") != user:
+            return DeltaEngine(user)
+        return DeltaEngine(user, stored.get("merge_requests"))
+
+    def save(self, open_keys: Set[str]) -> None:
+        """Store the fingerprints on disk for the next run.
+
+        :param open_keys: The keys of all MRs that are still open, see
+            PreFilter.key(). The fingerprints of any other MR are
+            dropped.
+        """
+        Utils.write_json(
+            Constants.NOTES_PATH,
+            {
+                "user": self.user,
+                "merge_requests": {
+                    key: value
+                    for key, value in self.merge_requests.items()
+                    if key in open_keys
+                },
+            },
+        )
+        Constants.COMMENT_NOTE_IDS_PATH.unlink(missing_ok=True)
+
+    @staticmethod
+    def fingerprint(
+        thread: Dict[str, Any], previous: Dict[str, List[str]]
+    ) -> Dict[str, Any]:
+        """Return the fingerprint of an open thread.
+
+        :param thread: The thread, as downloaded.
+        :param previous: The fingerprints of the notes of the thread on
+            the last run, by note ID. The hash of a note that has not
+            been updated since is reused.
+
+        :return: Whether the thread is resolved, and the update time and
+            a hash of the body of each note, by note ID.
+        """
+        notes = {}
+        for note in thread["notes"]:
+            note_id = str(note["id"])
+            old = previous.get(note_id)
+            if old is not None and old[0] == note["updated_at"]:
+                notes[note_id] = old
+            else:
+                digest = hashlib.blake2b(note["body"].encode(), digest_size=8)
+                notes[note_id] = [note["updated_at"], digest.hexdigest()]
+        return {"resolved": False, "notes": notes}
+
+    def apply(self, key: str, mr: MergeRequest) -> None:
+        """Find the changes in a downloaded MR and remember its threads.
+
+        :param key: The key of the MR, see PreFilter.key().
+        :param mr: The MR created from the downloaded data. Its
+            note_changes and thread_changes are set.
+        """
+        previous = self.merge_requests.get(key)
+        threads: Dict[str, Any] = {}
+        for thread in mr.threads:
+            thread_id = str(thread["id"])
+            old = None if previous is None else previous.get(thread_id)
+            old_notes = {} if old is None else old["notes"]
+            threads[thread_id] = fingerprint = self.fingerprint(thread, old_notes)
+            if (
+                previous is None
+                and self.seen_ids is not None
+                and str(thread["notes"][-1]["id"]) in self.seen_ids
+            ):
+                continue
+            for note_id, (_, digest) in fingerprint["notes"].items():
+                if note_id not in old_notes:
+                    mr.note_changes[note_id] = "new"
+                elif old_notes[note_id][1] != digest:
+                    mr.note_changes[note_id] = "edited"
+            if old is not None and old["resolved"]:
+                mr.thread_changes[thread_id] = "reopened"
+
+        # Resolved threads are only followed if they were followed when
+        # open, and keep their fingerprints in case they are reopened
+        for thread_id in mr.resolved_thread_ids:
+            old = None if previous is None else previous.get(thread_id)
+            if old is None:
+                continue
+            threads[thread_id] = {**old, "resolved": True}
+            if not old["resolved"]:
+                mr.thread_changes[thread_id] = "resolved"
+        self.merge_requests[key] = threads
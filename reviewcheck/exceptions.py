@@ -11,3 +11,11 @@ class RCException(Exception):
     to use directly when it's not necessary to differentiate excepitons.
     It is caught in main and will print the message in the exceptions.
     """
+
+
+class TransportError(RCException):
+    """Exception for when no response could be received from GitLab."""
+
+
+class DeadlineExceeded(RCException):
+    """Exception for when the deadline of a run has passed."""
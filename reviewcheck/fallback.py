@@ -0,0 +1,87 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the FallbackStore class for stale MR data."""
+import hashlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+from reviewcheck.constants import Constants
+from reviewcheck.utils import Utils
+
+
+class FallbackStore:
+    """Keep the last downloaded data of each MR on disk.
+
+    When downloading an MR fails, its last downloaded threads and
+    reactions are used instead, so that the MR can still be shown,
+    marked as stale, rather than making the whole run fail.
+    """
+
+    @staticmethod
+    def save(
+        metadata: Dict[str, Any],
+        threads: Optional[Any],
+        reactions: Optional[Any],
+    ) -> None:
+        """Store the data downloaded for an MR.
+
+        Data that was not downloaded this time is kept from before.
+
+        :param metadata: The MR as listed by GitLab.
+        :param threads: The threads, or None if not downloaded.
+        :param reactions: The reactions, or None if not downloaded.
+        """
+        path = FallbackStore.path(metadata)
+        stored = FallbackStore.load(metadata) or {}
+        Utils.write_json(
+            path,
+            {
+                # Always with microseconds, as Utils.parse_time expects
+                "downloaded_at": datetime.now(timezone.utc).isoformat(
+                    timespec="microseconds"
+                ),
+                "threads": threads if threads is not None else stored.get("threads"),
+                "reactions": (
+                    reactions if reactions is not None else stored.get("reactions")
+                ),
+            },
+        )
+
+    @staticmethod
+    def load(metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the stored data of an MR.
+
+        :param metadata: The MR as listed by GitLab.
+
+        :return: A dict with the threads, the reactions and the time
+            they were downloaded, or None if nothing is stored.
+        """
+        stored = Utils.read_json(FallbackStore.path(metadata), None)
+        if not isinstance(stored, dict):
+            return None
+        return stored
+
+    @staticmethod
+    def prune(open_urls: Set[str]) -> None:
+        """Remove the data of MRs that are no longer open.
+
+        :param open_urls: The web URLs of all MRs that are still open.
+        """
+        if not Constants.FALLBACK_DIR.is_dir():
+            return
+        keep = set(FallbackStore.file_name(url) for url in open_urls)
+        for path in Constants.FALLBACK_DIR.iterdir():
+            if path.name not in keep:
+                path.unlink()
+
+    @staticmethod
+    def path(metadata: Dict[str, Any]) -> Path:
+        """Return the file where the data of an MR is stored."""
+        return Constants.FALLBACK_DIR / FallbackStore.file_name(metadata["web_url"])
+
+    @staticmethod
+    def file_name(web_url: str) -> str:
+        """Return the name of the file for the MR with the URL."""
+        return f"{hashlib.sha1(web_url.encode()).hexdigest()}.json"
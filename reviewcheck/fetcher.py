@@ -0,0 +1,158 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the MergeRequestFetcher class."""
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from reviewcheck.exceptions import DeadlineExceeded, RCException
+from reviewcheck.fallback import FallbackStore
+from reviewcheck.jira import JiraExtractor
+from reviewcheck.mentions import MentionMatcher
+from reviewcheck.merge_request import MergeRequest
+from reviewcheck.note_sync import NoteSync
+from reviewcheck.reactions import ReactionResolver
+from reviewcheck.search import SearchIndex
+from reviewcheck.utils import Utils
+
+# An MR as listed by GitLab, and whether its threads and its reactions
+# need to be downloaded
+Download = Tuple[Dict[str, Any], bool, bool]
+
+
+class FetchResult:
+    """The outcome of downloading and classifying one MR."""
+
+    def __init__(
+        self,
+        download: Download,
+        merge_request: Optional[MergeRequest] = None,
+        error: Optional[str] = None,
+    ):
+        """Initialize a FetchResult object.
+
+        :param download: What was to be downloaded.
+        :param merge_request: The classified MR, or None if it could not
+            be downloaded and nothing was stored from before.
+        :param error: Why the download failed, or None if it didn't. If
+            there is both an MR and an error, the MR is stale.
+        """
+        self.download = download
+        self.metadata, self.threads_needed, self.reactions_needed = download
+        self.merge_request = merge_request
+        self.error = error
+
+
+class MergeRequestFetcher:
+    """Download the data of MRs and classify them, one MR at a time.
+
+    A failure to download or classify an MR only affects that MR. Its
+    last downloaded data is used instead, see FallbackStore, and the
+    MR is marked as stale.
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        reactions: Optional[ReactionResolver] = None,
+        search_index: Optional[SearchIndex] = None,
+    ):
+        """Initialize a MergeRequestFetcher object.
+
+        :param config: The resolved configuration of reviewcheck.
+        :param reactions: The resolver to get the reactions from, if
+            any. Otherwise they are downloaded for each MR.
+        :param search_index: The index to add the downloaded notes to,
+            if any.
+        """
+        self.secret_token = config["secret_token"]
+        self.show_all_discussions = config["show_all_discussions"]
+        self.reactions = reactions
+        self.search_index = search_index
+        self.api_url = config["api_url"] + "/api/v4"
+        self.user = config["user"]
+        self.mentions = MentionMatcher.create(
+            (self.user, *config["aliases"], *config["group_handles"])
+        )
+        self.jira = JiraExtractor.create(
+            config.get("jira_patterns"), config.get("jira_projects")
+        )
+        if config["sync_notes"]:
+            self.download_data = NoteSync(self.api_url).download_data
+        else:
+            self.download_data = Utils.download_data
+
+    def fetch(self, download: Download) -> FetchResult:
+        """Download the data for an MR and create a MergeRequest.
+
+        Only the MergeRequest is kept, so the downloaded data can be
+        released as soon as the MR has been classified.
+
+        :param download: The MR and what to download for it.
+
+        :return: The result, which has no MR if the deadline passed.
+        """
+        mr, threads_needed, reactions_needed = download
+        project, iid = mr["project_id"], mr["iid"]
+        mr_api_url = f"{self.api_url}/projects/{project}/merge_requests/{iid}"
+        try:
+            threads, reactions, _ = self.download_data(
+                (
+                    self.secret_token,
+                    (
+                        f"{mr_api_url}/discussions?per_page=500"
+                        if threads_needed
+                        else None
+                    ),
+                    (
+                        f"{mr_api_url}/award_emoji"
+                        if reactions_needed and self.reactions is None
+                        else None
+                    ),
+                    mr,
+                )
+            )
+            merge_request = MergeRequest(
+                threads, reactions, mr, self.user, self.mentions, self.jira
+            )
+            if self.reactions is not None:
+                self.reactions.resolve(merge_request, mr, self.show_all_discussions)
+        except DeadlineExceeded as e:
+            return FetchResult(download, error=str(e))
+        except RCException as e:
+            logging.error("failed to download MR %s: %s", mr["web_url"], e)
+            return self.fallback(download, str(e))
+
+        FallbackStore.save(mr, threads, reactions)
+        if self.search_index is not None:
+            self.search_index.add(mr, threads)
+        return FetchResult(download, merge_request)
+
+    def fallback(self, download: Download, error: str) -> FetchResult:
+        """Classify an MR from the data stored when it last succeeded.
+
+        :param download: The MR and what was to be downloaded for it.
+        :param error: Why the download failed.
+
+        :return: The result with a stale MR, or without an MR if nothing
+            usable was stored.
+        """
+        mr, threads_needed, reactions_needed = download
+        stored = FallbackStore.load(mr)
+        if stored is None:
+            return FetchResult(download, error=error)
+        try:
+            merge_request = MergeRequest(
+                stored.get("threads") if threads_needed else None,
+                stored.get("reactions") if reactions_needed else None,
+                mr,
+                self.user,
+                self.mentions,
+                self.jira,
+            )
+            if self.reactions is not None:
+                self.reactions.resolve(merge_request, mr, self.show_all_discussions)
+        except RCException:
+            return FetchResult(download, error=error)
+        merge_request.stale_since = stored.get("downloaded_at")
+        return FetchResult(download, merge_request, error)
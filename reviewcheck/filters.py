@@ -0,0 +1,116 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the ListFilter class for choosing MRs to list."""
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+from reviewcheck.exceptions import RCException
+from reviewcheck.utils import Utils
+
+
+class ListFilter:
+    """The configured filters on which MRs to check.
+
+    As much as possible of the filtering is done by GitLab when listing
+    the MRs of a project, see query(), so that fewer MRs are listed.
+    What GitLab cannot filter on, like more than one target branch or
+    author, is filtered by matches() before any MR is downloaded. All
+    filters are checked by matches(), in case the GitLab version does
+    not support some of the parameters.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        """Initialize a ListFilter object.
+
+        :param config: The resolved configuration of reviewcheck.
+        """
+        self.ignored_mrs = set(str(iid) for iid in config["ignored_mrs"])
+        self.ignored_authors = [
+            str(author).casefold() for author in config["ignored_authors"]
+        ]
+        self.labels: List[str] = [str(label) for label in config["labels"]]
+        self.target_branches: List[str] = [
+            str(branch) for branch in config["target_branches"]
+        ]
+        self.hide_drafts: bool = config["hide_drafts"]
+        self.updated_within: Optional[int] = config["updated_within"]
+        self.updated_after: Optional[datetime] = None
+        if self.updated_within is not None:
+            self.updated_after = datetime.now(timezone.utc) - timedelta(
+                days=self.updated_within
+            )
+
+    def key(self) -> str:
+        """Return a key that changes when the filters are changed.
+
+        The key is the same on every run with the same configuration,
+        even though the time that updated_within counts from is not.
+        """
+        return json.dumps(
+            [
+                sorted(self.ignored_authors),
+                sorted(self.labels),
+                sorted(self.target_branches),
+                self.hide_drafts,
+                self.updated_within,
+            ]
+        )
+
+    def query(self) -> str:
+        """Return the parameters for the filters GitLab can apply.
+
+        :return: The parameters, each starting with &, to add to the
+            URL listing the open MRs of a project.
+        """
+        parameters = []
+        if self.updated_after is not None:
+            parameters.append(
+                ("updated_after", self.updated_after.strftime("%Y-%m-%dT%H:%M:%SZ"))
+            )
+        if self.hide_drafts:
+            parameters.append(("wip", "no"))
+        if self.labels:
+            parameters.append(("labels", ",".join(self.labels)))
+        # GitLab only filters on a single target branch and author
+        if len(self.target_branches) == 1:
+            parameters.append(("target_branch", self.target_branches[0]))
+        if self.ignored_authors:
+            parameters.append(("not[author_username]", self.ignored_authors[0]))
+        return "".join(f"&{name}={quote(value, safe='')}" for name, value in parameters)
+
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        """Check whether an MR passes all filters.
+
+        :param metadata: The data for the MR as returned when listing
+            merge requests.
+
+        :return: True if the MR is to be checked.
+        """
+        if str(metadata["iid"]) in self.ignored_mrs:
+            return False
+        author = metadata.get("author") or {}
+        if str(author.get("username", "")).casefold() in self.ignored_authors:
+            return False
+        if self.labels and not set(self.labels) <= set(metadata.get("labels") or []):
+            return False
+        if (
+            self.target_branches
+            and metadata.get("target_branch") not in self.target_branches
+        ):
+            return False
+        if self.hide_drafts and (
+            metadata.get("draft") or metadata.get("work_in_progress")
+        ):
+            return False
+        if self.updated_after is not None and "updated_at" in metadata:
+            try:
+                updated_at = Utils.parse_time(metadata["updated_at"])
+            except RCException:
+                return True
+            if updated_at.tzinfo is None:
+                updated_at = updated_at.replace(tzinfo=timezone.utc)
+            return updated_at >= self.updated_after
+        return True
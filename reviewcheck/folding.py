@@ -0,0 +1,110 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the NoteFolder class for shortening long notes."""
+import re
+from typing import Any, Dict, List, Optional
+
+from reviewcheck.constants import Constants
+
+
+class NoteFolder:
+    """Shorten long notes, so that threads are quick to show and read.
+
+    Comments by bots with pasted CI logs, diffs or suggestions can be
+    thousands of lines long, and rendering them takes most of the time
+    and screen space. When folding is enabled, code blocks longer than
+    CODE_BLOCK_MAX_LINES lines are folded away, and what is left of a
+    note is cut at a number of lines and bytes, so that the time taken
+    to render a note is bounded. Consecutive notes by the same author
+    that only differ in numbers, like a bot reporting one failed
+    pipeline after another, are shown once.
+    """
+
+    CODE_BLOCK_REGEX = re.compile(
+        r"^(?P<fence>[ \t]*(?P<marker>```|~~~).*)\n"
+        r"(?P<code>(?:.*\n)*?)"
+        r"(?:[ \t]*(?P=marker)[ \t]*$|.*\Z)",
+        flags=re.MULTILINE,
+    )
+
+    def __init__(self, max_lines: int, max_bytes: int):
+        """Initialize a NoteFolder object.
+
+        :param max_lines: The number of lines to cut notes at.
+        :param max_bytes: The number of bytes to cut notes at.
+        """
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def create(config: Dict[str, Any]) -> Optional["NoteFolder"]:
+        """Create a NoteFolder, if folding is enabled.
+
+        :param config: The resolved configuration of reviewcheck.
+
+        :return: The new NoteFolder object, or None if notes are to be
+            shown in full.
+        """
+        if not config["fold_notes"]:
+            return None
+        return NoteFolder(config["note_max_lines"], config["note_max_bytes"])
+
+    def fold_thread(self, notes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the notes of a thread to show.
+
+        :param notes: The notes of the thread.
+
+        :return: Copies of the notes with their bodies folded. Of each
+            run of similar notes by the same author, only the newest is
+            kept, with the number of notes in the run.
+        """
+        folded = []
+        similar = 1
+        for i, note in enumerate(notes):
+            if i + 1 < len(notes) and NoteFolder.similar(note, notes[i + 1]):
+                similar += 1
+                continue
+            body = self.fold(note["body"])
+            if similar > 1:
+                body = f"({similar} similar notes, showing the last)\n{body}"
+            folded.append({**note, "body": body})
+            similar = 1
+        return folded
+
+    @staticmethod
+    def similar(note: Dict[str, Any], other: Dict[str, Any]) -> bool:
+        """Check if two notes by one author only differ in numbers."""
+        return bool(
+            note["author"]["username"] == other["author"]["username"]
+            and re.sub(r"\d+", "0", note["body"]) == re.sub(r"\d+", "0", other["body"])
+        )
+
+    def fold(self, body: str) -> str:
+        """Shorten the body of a note.
+
+        :param body: The body, in Markdown.
+
+        :return: The body with long code blocks folded, cut at the
+            maximum number of lines and bytes.
+        """
+        body = NoteFolder.CODE_BLOCK_REGEX.sub(NoteFolder.fold_code_block, body)
+
+        lines = body.split("\n")
+        if len(lines) > self.max_lines:
+            body = "\n".join(lines[: self.max_lines])
+            body += f"\n(... {len(lines) - self.max_lines} more lines)"
+
+        encoded = body.encode()
+        if len(encoded) > self.max_bytes:
+            body = encoded[: self.max_bytes].decode(errors="ignore")
+            body += f"\n(... {len(encoded) - self.max_bytes} more bytes)"
+        return body
+
+    @staticmethod
+    def fold_code_block(match: "re.Match[str]") -> str:
+        """Replace a long code block with a line telling its length."""
+        code_lines = match["code"].count("\n")
+        if code_lines <= Constants.CODE_BLOCK_MAX_LINES:
+            return match[0]
+        return f"{match['fence']}\n(... {code_lines} lines of code)\n{match['marker']}"
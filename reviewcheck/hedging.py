@@ -0,0 +1,118 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the Hedger class for cutting tail latency."""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, List, Optional, TypeVar
+
+from reviewcheck.constants import Constants
+from reviewcheck.metrics import Metrics
+
+R = TypeVar("R")
+
+
+class Hedger:
+    """Send a duplicate of requests that take longer than usual.
+
+    The time taken by recent requests is tracked, and when a request
+    has taken longer than the 95th percentile of those, the same
+    request is sent again. Whichever answer arrives first is used, so
+    a single stalled connection or slow server process does not delay
+    the run. At most HEDGE_MAX_IN_FLIGHT requests are hedged at the
+    same time, counting each until both it and its duplicate are done,
+    so that requests that lost to their duplicate but are still waiting
+    for the server stay few. This keeps the extra load on GitLab small.
+    """
+
+    def __init__(self) -> None:
+        """Initialize a Hedger object."""
+        self.latencies: Deque[float] = deque(maxlen=Constants.HEDGE_WINDOW)
+        self.lock = threading.Lock()
+        self.hedges = threading.BoundedSemaphore(Constants.HEDGE_MAX_IN_FLIGHT)
+        # Requests are sent from these threads, so that the caller can
+        # stop waiting for the first one when the duplicate wins.
+        self.executor = ThreadPoolExecutor(
+            max_workers=Constants.THREADPOOL_MAXSIZE + Constants.HEDGE_MAX_IN_FLIGHT,
+            thread_name_prefix="hedge",
+        )
+
+    def threshold(self) -> Optional[float]:
+        """Return the time after which a duplicate request is sent.
+
+        :return: The 95th percentile of the recent latencies, or None
+            if too few requests have been made to tell.
+        """
+        with self.lock:
+            if len(self.latencies) < Constants.HEDGE_MIN_SAMPLES:
+                return None
+            latencies = sorted(self.latencies)
+        return latencies[int(len(latencies) * 0.95)]
+
+    def call(
+        self,
+        request: Callable[[], R],
+        duplicate: Optional[Callable[[], Optional[Callable[[], R]]]] = None,
+    ) -> R:
+        """Make a request, and a duplicate if it is slow.
+
+        :param request: The function making the request. It may be
+            called twice at the same time, unless duplicate is given.
+            How long it takes decides when to send duplicates, so it
+            should not wait for anything but the server.
+        :param duplicate: Called when a duplicate is due, to return the
+            function making it, or None if it may not be sent now. By
+            default, the request is made again.
+
+        :raises Exception: Whatever the request raised, if both the
+            request and its duplicate failed.
+
+        :return: The result of whichever request finished first.
+        """
+        start = time.monotonic()
+        threshold = self.threshold()
+        if threshold is None:
+            result = request()
+            self.record(time.monotonic() - start)
+            return result
+
+        first = self.executor.submit(request)
+        done, pending = wait({first}, timeout=threshold)
+        if not done and self.hedges.acquire(blocking=False):
+            hedge_request = request if duplicate is None else duplicate()
+            if hedge_request is None:
+                self.hedges.release()
+            else:
+                hedge = self.executor.submit(hedge_request)
+                Metrics.count("reviewcheck_retries_total", reason="hedge")
+                pending.add(hedge)
+                # The hedge is counted until the loser is done too
+                unfinished = [2]
+
+                def finished(_: "Future[R]") -> None:
+                    with self.lock:
+                        unfinished[0] -= 1
+                        if unfinished[0] == 0:
+                            self.hedges.release()
+
+                first.add_done_callback(finished)
+                hedge.add_done_callback(finished)
+
+        errors: List[BaseException] = []
+        while True:
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    self.record(time.monotonic() - start)
+                    return future.result()
+                errors.append(error)
+            if not pending:
+                raise errors[0]
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+    def record(self, latency: float) -> None:
+        """Remember the time taken by a successful request."""
+        with self.lock:
+            self.latencies.append(latency)
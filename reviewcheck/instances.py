@@ -0,0 +1,263 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the Instance class for checking several GitLabs."""
+import re
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from reviewcheck.catalog import ProjectCatalog
+from reviewcheck.exceptions import DeadlineExceeded, RCException
+from reviewcheck.fetcher import MergeRequestFetcher
+from reviewcheck.filters import ListFilter
+from reviewcheck.metrics import Metrics
+from reviewcheck.prefilter import PreFilter
+from reviewcheck.reactions import ReactionResolver
+from reviewcheck.records import RecordGenerator
+from reviewcheck.search import SearchIndex
+from reviewcheck.utils import Utils
+
+
+class Instance:
+    """A GitLab instance to check, and the MRs listed on it.
+
+    Each instance in the instances setting has its own URL, token,
+    user and projects, and otherwise the top-level settings are used.
+    Without the setting, the top-level settings are the only instance.
+
+    The instances are listed at the same time, and the MRs of all of
+    them are downloaded together in order of priority, so that a run
+    takes as long as the slowest instance rather than all of them
+    together. Requests to each host have their own connection pool and
+    concurrency limit, see Utils.get_transport() and
+    ConcurrencyLimiter. The MRs of an instance are told apart by the
+    host of their web URL, so each instance must have a host of its
+    own.
+    """
+
+    # The settings that can be made for each instance
+    SETTINGS = (
+        "api_url",
+        "secret_token",
+        "user",
+        "project_ids",
+        "group_ids",
+        "jira_url",
+        "jira_projects",
+        "aliases",
+        "group_handles",
+    )
+    # Why a project or group was not listed, see unlisted
+    UNLISTED_REASON = "not listed before the deadline"
+
+    def __init__(self, config: Dict[str, Any]):
+        """Initialize an Instance object.
+
+        :param config: The resolved configuration of the instance, see
+            resolve().
+        """
+        self.config = config
+        self.host = Instance.host_of(config)
+        self.user: str = config["user"]
+        self.mr_pages: List[Dict[str, Any]] = []
+        # The projects and groups that could not be listed in time, see
+        # RecordGenerator.unlisted_record()
+        self.unlisted: List[Dict[str, Any]] = []
+        self.catalog = ProjectCatalog(self.host)
+        self.reactions: Optional[ReactionResolver] = None
+        self.fetcher = MergeRequestFetcher(config)
+        self.prefilter = PreFilter(self.user)
+
+    @staticmethod
+    def resolve(
+        config: Dict[str, Any], user: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Return the configuration of each GitLab instance to check.
+
+        :param config: The configuration of reviewcheck, with the
+            defaults set.
+        :param user: The user given with the --user option, if any,
+            which is used on every instance instead of the configured
+            one.
+
+        :raises RCException: Raised when the instances setting is
+            malformed, or two instances have the same host.
+
+        :return: The top-level configuration with the settings of each
+            instance applied, in the order the instances are given.
+        """
+        instances = config.get("instances") or [{}]
+        if not isinstance(instances, list) or not all(
+            isinstance(instance, dict) for instance in instances
+        ):
+            raise RCException("The instances setting must be a list of mappings")
+
+        resolved = []
+        for instance in instances:
+            unknown = sorted(set(instance) - set(Instance.SETTINGS))
+            if unknown:
+                raise RCException(
+                    f"Unknown settings for a GitLab instance: {', '.join(unknown)}"
+                )
+            settings = {
+                key: value for key, value in config.items() if key != "instances"
+            }
+            settings.update(instance)
+            if user:
+                settings["user"] = user
+            missing = [
+                key
+                for key in ("api_url", "secret_token", "user")
+                if key not in settings
+            ]
+            if missing:
+                raise RCException(
+                    f"Missing settings for a GitLab instance: {', '.join(missing)}"
+                )
+            settings["user"] = str(settings["user"]).upper()
+            settings["api_url"] = re.sub("/api/v4[/]?", "", settings["api_url"])
+            if settings.get("jira_url"):
+                settings["jira_url"] = re.sub("/browse[/]?", "", settings["jira_url"])
+            resolved.append(settings)
+
+        hosts = [Instance.host_of(settings) for settings in resolved]
+        if len(set(hosts)) < len(hosts):
+            raise RCException("Each GitLab instance must have a host of its own")
+        return resolved
+
+    @staticmethod
+    def host_of(config: Dict[str, Any]) -> str:
+        """Return the host, with the port if any, of a GitLab instance.
+
+        :param config: The resolved configuration of the instance.
+        """
+        return urlsplit(str(config["api_url"])).netloc
+
+    @staticmethod
+    def index(configs: List[Dict[str, Any]], web_url: str) -> int:
+        """Return which GitLab instance an MR is on.
+
+        :param configs: The resolved configuration of each instance.
+        :param web_url: The web URL of the MR.
+
+        :raises RCException: Raised when the MR is on none of the
+            instances.
+
+        :return: The index of the instance in configs.
+        """
+        if len(configs) == 1:
+            return 0
+        host = urlsplit(web_url).netloc
+        for i, config in enumerate(configs):
+            if Instance.host_of(config) == host:
+                return i
+        raise RCException(f"{web_url} is not on any of the configured GitLab hosts")
+
+    @staticmethod
+    def identity(configs: List[Dict[str, Any]]) -> str:
+        """Return who the data stored between runs is for.
+
+        The stored data is only used on a later run for the same users
+        on the same instances.
+
+        :param configs: The resolved configuration of each instance.
+
+        :return: The username if there is one instance, otherwise the
+            username and host of each instance.
+        """
+        if len(configs) == 1:
+            return str(configs[0]["user"])
+        return " ".join(
+            f"{config['user']}@{Instance.host_of(config)}" for config in configs
+        )
+
+    @staticmethod
+    def past_deadline(error: RCException) -> bool:
+        """Return whether a request failed because of the deadline."""
+        return isinstance(error, DeadlineExceeded) or Utils.deadline_passed()
+
+    def list_merge_requests(
+        self,
+        list_filter: ListFilter,
+        reactions_cache: Dict[str, Any],
+        search_index: Optional[SearchIndex] = None,
+    ) -> None:
+        """List the open MRs to check on the instance.
+
+        The MRs that pass the filters are kept in mr_pages, and the
+        reactions of the user are listed for their projects. The
+        projects and groups that are not listed before the deadline are
+        kept in unlisted, and the MRs listed until then are checked.
+
+        :param list_filter: The configured filters.
+        :param reactions_cache: The reactions downloaded on earlier
+            runs, shared by all instances.
+        :param search_index: The index to add the downloaded notes to,
+            if any.
+        """
+        secret_token = self.config["secret_token"]
+        api_url = self.config["api_url"] + "/api/v4"
+        project_ids = self.config["project_ids"]
+        group_ids = self.config["group_ids"]
+
+        # The groups are expanded to those of their projects that may
+        # have open MRs, see ProjectCatalog
+        self.catalog = ProjectCatalog.load(self.host)
+        self.unlisted = []
+        listed_groups = []
+        for group in group_ids:
+            try:
+                self.catalog.refresh(secret_token, api_url, group)
+            except RCException as error:
+                # A request cut short by the deadline fails like any
+                # other. The projects stored for the group are used, if
+                # any.
+                if not Instance.past_deadline(error):
+                    raise
+                if str(group) not in self.catalog.groups:
+                    self.unlisted.append(
+                        RecordGenerator.unlisted_record(
+                            self.host, "group", group, Instance.UNLISTED_REASON
+                        )
+                    )
+                    continue
+            listed_groups.append(group)
+        for project in self.catalog.projects(
+            project_ids, listed_groups, list_filter.key()
+        ):
+            listed_at = time.time()
+            projects_url = (
+                f"{api_url}/projects/{project}/merge_requests?state=opened"
+                f"&per_page=100{list_filter.query()}"
+            )
+            try:
+                project_mrs = Utils.download_gitlab_data(secret_token, projects_url)
+            except RCException as error:
+                if not Instance.past_deadline(error):
+                    raise
+                self.unlisted.append(
+                    RecordGenerator.unlisted_record(
+                        self.host, "project", project, Instance.UNLISTED_REASON
+                    )
+                )
+                continue
+            self.catalog.record(
+                project, bool(project_mrs), listed_at, list_filter.key()
+            )
+            # The filters GitLab could not apply are applied before any
+            # MR is scheduled for download
+            for mr in project_mrs:
+                if list_filter.matches(mr):
+                    self.mr_pages.append(mr)
+                else:
+                    Metrics.count("reviewcheck_merge_requests_total", result="filtered")
+
+        # The reactions of the user are listed per project, so that all
+        # reactions only need to be downloaded for the MRs shown
+        self.reactions = ReactionResolver.create(
+            self.config,
+            sorted(set(mr["project_id"] for mr in self.mr_pages)),
+            reactions_cache,
+        )
+        self.fetcher = MergeRequestFetcher(self.config, self.reactions, search_index)
@@ -0,0 +1,170 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the JiraExtractor class for finding Jira tickets."""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from reviewcheck.constants import Constants
+from reviewcheck.exceptions import RCException
+
+
+class JiraExtractor:
+    """Find the Jira ticket an MR refers to.
+
+    The patterns are tried in order, and the first one that matches
+    decides the ticket. Each pattern is applied to one field of the MR,
+    the description, the title or the source branch, and should have
+    one group capturing the ticket. If a pattern matches several times,
+    the last match is used, so that a corrected "JIRA:" line further
+    down in a description wins.
+
+    By default only the description is searched. Words like UTF-8 or
+    SHA-256 look like tickets, so a ticket in the title or the source
+    branch is only used if its project key is one of the configured
+    Jira projects.
+
+    The patterns are compiled once, and none of them can backtrack
+    beyond a single line, so the time taken grows linearly with the
+    length of the description. Results are cached by a hash of the
+    fields, so unchanged MRs are not searched again on later refresh
+    cycles.
+    """
+
+    FIELDS = ["description", "title", "source_branch"]
+
+    DEFAULT_PATTERNS: List[Dict[str, str]] = [
+        # A "JIRA: <ticket>" line, where the ticket may be a link
+        {"field": "description", "pattern": r"(?im)^JIRA:(.*)$"},
+        # A markdown link with a ticket as text
+        {"field": "description", "pattern": r"\[([A-Z][A-Z0-9]+-[0-9]+)\]\("},
+    ]
+    # A ticket of one of the Jira projects, see default_patterns()
+    PROJECT_TICKET_PATTERN = r"\b((?:{keys})-[0-9]+)\b"
+
+    LINK_REGEX = re.compile(r"\[([^\]]*)\]")
+
+    # Extractors shared between callers, see create()
+    shared: Dict[str, "JiraExtractor"] = {}
+    shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        patterns: Optional[List[Dict[str, str]]] = None,
+        projects: Optional[List[str]] = None,
+    ):
+        """Initialize a JiraExtractor object.
+
+        :param patterns: The patterns to use, each a dict with the field
+            to search and the regular expression. Defaults to
+            default_patterns().
+        :param projects: The keys of the Jira projects whose tickets to
+            look for in the title and the source branch, if patterns is
+            not given.
+
+        :raises RCException: Raised when a pattern is invalid.
+        """
+        self.patterns: List[Tuple[str, "re.Pattern[str]"]] = []
+        for pattern in patterns or JiraExtractor.default_patterns(projects):
+            field = pattern.get("field", "description")
+            if field not in JiraExtractor.FIELDS:
+                raise RCException(
+                    f"Invalid field '{field}' in jira_patterns, must be one of "
+                    f"{', '.join(JiraExtractor.FIELDS)}"
+                )
+            try:
+                regex = re.compile(pattern["pattern"])
+            except (KeyError, re.error) as e:
+                raise RCException(f"Invalid pattern in jira_patterns: {e}")
+            self.patterns.append((field, regex))
+
+        self.cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def default_patterns(projects: Optional[List[str]] = None) -> List[Dict[str, str]]:
+        """Return the patterns used if none are configured.
+
+        :param projects: The keys of the Jira projects whose tickets to
+            look for in the title and the source branch, if any.
+
+        :return: DEFAULT_PATTERNS, followed by patterns for the title
+            and the source branch if there are projects.
+        """
+        if not projects:
+            return JiraExtractor.DEFAULT_PATTERNS
+        keys = "|".join(re.escape(str(project)) for project in projects)
+        pattern = JiraExtractor.PROJECT_TICKET_PATTERN.format(keys=keys)
+        return [
+            *JiraExtractor.DEFAULT_PATTERNS,
+            {"field": "title", "pattern": pattern},
+            {"field": "source_branch", "pattern": pattern},
+        ]
+
+    @staticmethod
+    def create(
+        patterns: Optional[List[Dict[str, str]]] = None,
+        projects: Optional[List[str]] = None,
+    ) -> "JiraExtractor":
+        """Return an extractor for the patterns, created only once.
+
+        Sharing the extractor means that its cache is kept between
+        refresh cycles.
+
+        :param patterns: The patterns to use, see __init__().
+        :param projects: The Jira projects, see __init__().
+
+        :return: An extractor shared by all callers with the same
+            patterns and projects.
+        """
+        key = repr((patterns, projects))
+        with JiraExtractor.shared_lock:
+            if key not in JiraExtractor.shared:
+                JiraExtractor.shared[key] = JiraExtractor(patterns, projects)
+            return JiraExtractor.shared[key]
+
+    def extract(self, fields: Dict[str, Optional[str]]) -> Optional[str]:
+        """Extract the Jira ticket from the fields of an MR.
+
+        :param fields: The description, title and source branch of the
+            MR, any of which may be None.
+
+        :return: The Jira ticket if found, otherwise None.
+        """
+        text = "\0".join(fields.get(field) or "" for field in JiraExtractor.FIELDS)
+        digest = hashlib.sha1(text.encode(errors="replace")).hexdigest()
+
+        with self.lock:
+            if digest in self.cache:
+                self.cache.move_to_end(digest)
+                return self.cache[digest]
+
+        ticket = self.search(fields)
+
+        with self.lock:
+            self.cache[digest] = ticket
+            if len(self.cache) > Constants.JIRA_CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return ticket
+
+    def search(self, fields: Dict[str, Optional[str]]) -> Optional[str]:
+        """Search the fields for a Jira ticket, bypassing the cache."""
+        for field, regex in self.patterns:
+            text = fields.get(field)
+            if not text:
+                continue
+            ticket = None
+            for match in regex.finditer(text):
+                ticket = match.group(1) if regex.groups else match.group(0)
+            if ticket is None:
+                continue
+            ticket = ticket.strip()
+            already_a_link = JiraExtractor.LINK_REGEX.match(ticket)
+            if already_a_link:
+                ticket = already_a_link.group(1)
+            if ticket:
+                return ticket
+        return None
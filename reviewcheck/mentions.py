@@ -0,0 +1,62 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the MentionMatcher class for finding @-mentions."""
+import re
+from functools import lru_cache
+from typing import Iterable, Set, Tuple
+
+
+class MentionMatcher:
+    """Find mentions of any of several handles in a text.
+
+    All handles are matched at once with a single compiled regular
+    expression, without regard to case. A mention has to be a complete
+    handle, so @bob does not match @bobby or @bob-team, and an e-mail
+    address such as alice@bob.com is not a mention of @bob. A trailing
+    dot, as in "Thanks @bob.", is still a mention of @bob.
+    """
+
+    def __init__(self, handles: Iterable[str]):
+        """Initialize a MentionMatcher object.
+
+        :param handles: The usernames, aliases and group handles to
+            match, with or without a leading @. Group handles may
+            contain slashes, like @group/subgroup.
+        """
+        self.handles: Set[str] = set(
+            handle.lstrip("@").casefold() for handle in handles if handle.lstrip("@")
+        )
+        # Longer handles first, so that the longest handle is matched
+        # when one handle is a prefix of another.
+        alternatives = "|".join(
+            re.escape(handle) for handle in sorted(self.handles, key=len, reverse=True)
+        )
+        # The pattern starts with a literal @, which lets the regex
+        # engine skip quickly to the next @ instead of trying to match
+        # at every position in the text.
+        self.regex = re.compile(
+            rf"@(?<![\w.+-]@)({alternatives})(?![\w/-]|\.[\w-])",
+            flags=re.IGNORECASE,
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def create(handles: Tuple[str, ...]) -> "MentionMatcher":
+        """Return a matcher for the handles, compiled only once.
+
+        :param handles: The handles to match.
+
+        :return: A matcher shared by all callers with the same handles.
+        """
+        return MentionMatcher(handles)
+
+    def is_mentioned(self, text: str) -> bool:
+        """Return True if any handle is mentioned in the text."""
+        return bool(self.handles) and self.regex.search(text) is not None
+
+    def find_mentions(self, text: str) -> Set[str]:
+        """Return the handles mentioned in the text, in lower case."""
+        if not self.handles:
+            return set()
+        return set(match.casefold() for match in self.regex.findall(text))
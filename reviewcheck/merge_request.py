@@ -2,18 +2,42 @@
 # Licensed under Apache 2.0.
 
 """File for storing the MergeRequest class."""
-import re
 from collections import defaultdict
 from typing import Any, DefaultDict, Dict, List, Optional
 
 from reviewcheck.exceptions import RCException
+from reviewcheck.jira import JiraExtractor
+from reviewcheck.mentions import MentionMatcher
 
 
 class MergeRequest:
     """Class representing a merge request."""
 
-    def __init__(self, threads: Any, reactions: Any, metadata: Any, user: str):
-        """Initialize a MergeRequest object."""
+    def __init__(
+        self,
+        threads: Any,
+        reactions: Any,
+        metadata: Any,
+        user: str,
+        mentions: Optional[MentionMatcher] = None,
+        jira: Optional[JiraExtractor] = None,
+    ):
+        """Initialize a MergeRequest object.
+
+        :param threads: The threads of the MR, or None if they were not
+            downloaded.
+        :param reactions: The reactions on the MR, or None if they were
+            not downloaded.
+        :param metadata: The data for the MR as returned when listing
+            merge requests.
+        :param user: The username of the configured user.
+        :param mentions: Matcher for the handles that count as
+            mentioning the user. Defaults to only the username.
+        :param jira: Extractor for the Jira ticket of the MR. Defaults
+            to one with the default patterns.
+        """
+        if threads is None:
+            threads = []
         if reactions is None:
             reactions = []
         if (
@@ -25,7 +49,8 @@ class MergeRequest:
         self.title: str = metadata["title"]
         self.mr_author: str = metadata["author"]["username"]
         self.user: str = user
-        self.is_author = self.mr_author == self.user
+        self.mentions = mentions or MentionMatcher.create((user,))
+        self.is_author = self.is_user(self.mr_author)
         self.id: int = metadata["iid"]
         self.project: int = metadata["project_id"]
         self.web_url: str = metadata["web_url"]
@@ -33,17 +58,34 @@ class MergeRequest:
         self.creation_time: str = metadata["created_at"]
         self.source_branch: str = metadata["source_branch"]
         self.description: str = metadata["description"]
+        self.jira = jira or JiraExtractor.create()
         self.jira_ticket_number = self.extract_jira()
+        # When the MR could not be downloaded and is classified from the
+        # data stored on an earlier run, the time that data is from.
+        self.stale_since: Optional[str] = None
 
         self.threads: List[Dict[str, Any]] = []
         self.number_of_open_threads = 0
         self.number_of_open_threads_for_user = 0
         self.number_of_open_threads_needing_user_reply = 0
-        self.all_last_message_ids: List[str] = []
+        # The IDs of the resolved threads, and what changed in the
+        # threads since the last run, see DeltaEngine
+        self.resolved_thread_ids: List[str] = []
+        self.note_changes: Dict[str, str] = {}
+        self.thread_changes: Dict[str, str] = {}
+        # Whether the user has written or been mentioned in any thread,
+        # resolved or not. Used to decide whether the MR can be skipped
+        # on later runs, see PreFilter.
+        self.user_has_participated = False
         for thread in threads:
             messages = thread["notes"]
             first_message = thread["notes"][0]
             last_message = thread["notes"][-1]
+            if not self.user_has_participated and (
+                self.user_is_participant(messages)
+                or self.user_is_referenced_in_thread(messages)
+            ):
+                self.user_has_participated = True
             # Filter out comments that are not threads (not resolvable)
             if "resolved" in first_message:
                 # ...and only those that are not already resolved
@@ -57,10 +99,23 @@ class MergeRequest:
                     ):
                         self.number_of_open_threads_for_user += 1
                         self.threads.append(thread)
-                        self.all_last_message_ids.append(last_message["id"])
-                        if last_message["author"]["username"] != self.user:
+                        if not self.is_user(last_message["author"]["username"]):
                             self.number_of_open_threads_needing_user_reply += 1
+                else:
+                    self.resolved_thread_ids.append(str(thread["id"]))
+
+        self.set_reactions(reactions)
 
+    def set_reactions(self, reactions: List[Dict[str, Any]]) -> None:
+        """Set the reactions on the MR, replacing any earlier ones.
+
+        Whether the user has reacted and upvoted is derived from the
+        reactions. When those are known without downloading all the
+        reactions, see ReactionResolver, user_reacted and user_upvoted
+        can be set directly instead.
+
+        :param reactions: The reactions as returned by GitLab.
+        """
         self.reaction_and_name: DefaultDict[str, List[str]] = defaultdict(list)
         self.reaction_and_gitlab_user: DefaultDict[str, List[str]] = defaultdict(list)
         for reaction in reactions:
@@ -68,6 +123,60 @@ class MergeRequest:
             self.reaction_and_gitlab_user[reaction["name"]].append(
                 reaction["user"]["username"]
             )
+        self.user_reacted = any(
+            self.is_user(name)
+            for names in self.reaction_and_gitlab_user.values()
+            for name in names
+        )
+        self.user_upvoted = any(
+            self.is_user(name)
+            for name in self.reaction_and_gitlab_user.get("thumbsup", [])
+        )
+
+    def is_user(self, username: str) -> bool:
+        """Return True if the username is that of the configured user.
+
+        The configured username is made into uppercase, while GitLab
+        gives usernames as they were registered, so they are compared
+        without regard to case. GitLab does not allow usernames that
+        only differ in case.
+
+        :param username: A username as given by GitLab.
+
+        :return: True if it is the configured user, otherwise False.
+        """
+        return username.casefold() == self.user.casefold()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Return the state of the MR to pickle or store.
+
+        The MR is pickled to render it in another process, see
+        PreRenderer, and stored to show it on the next run, see
+        Snapshot. The mention matcher and the Jira extractor are only
+        used while the MR is created, and the extractor holds a lock
+        that cannot be pickled, so they are left out.
+        """
+        state = self.__dict__.copy()
+        state["mentions"] = None
+        state["jira"] = None
+        return state
+
+    @staticmethod
+    def from_state(state: Dict[str, Any]) -> "MergeRequest":
+        """Recreate an MR from the state returned by __getstate__().
+
+        :param state: The state of the MR, as stored by Snapshot.
+
+        :return: The MR, which can be presented but not classified
+            again.
+        """
+        mr = MergeRequest.__new__(MergeRequest)
+        mr.__dict__.update(state)
+        return mr
+
+    def has_changes(self) -> bool:
+        """Return True if any thread changed since the last run."""
+        return bool(self.note_changes or self.thread_changes)
 
     def jira_link(self, jira_base_url: str) -> Optional[str]:
         """Getter for JIRA URL."""
@@ -78,27 +187,18 @@ class MergeRequest:
     def extract_jira(self) -> Optional[str]:
         """Extract JIRA ticket number from MR description.
 
-        :param description: The description of the MR.
+        The description is searched first, then the title and the source
+        branch, see JiraExtractor.
+
         :return: Jira ticket number if found, otherwise None.
         """
-        if self.description is None:
-            return None
-        # Parse the VIRA ticket number
-        jira_regex = re.compile(
-            # Use +? for non-greedy matching, so we don't get everything
-            # until the last end-of-line in the description
-            r".*^JIRA: (.+?)$",
-            flags=re.IGNORECASE | re.MULTILINE | re.DOTALL,
+        return self.jira.extract(
+            {
+                "description": self.description,
+                "title": self.title,
+                "source_branch": self.source_branch,
+            }
         )
-        jira_match = jira_regex.match(self.description)
-        jira = None
-        if jira_match:
-            jira = str(jira_match.group(1))
-            already_a_link_regex = re.compile(r"\[(.*)\].*")
-            already_a_link = already_a_link_regex.match(jira)
-            if already_a_link:
-                jira = str(already_a_link.group(1))
-        return jira
 
     def print_reactors(self) -> Optional[str]:
         """:return: Printable list of people who have reacted."""
@@ -120,16 +220,16 @@ class MergeRequest:
         all_upvoters.sort()
         return " | ".join(all_upvoters)
 
+    def user_has_reacted(self) -> bool:
+        """Return True if the user has left any reaction on the MR."""
+        return self.user_reacted
+
     def user_reacted_but_no_upvote(self) -> bool:
         """Return True if user has left a reaction without upvoting.
 
         :return: True if the user forgot to thumb up, otherwise False.
         """
-        has_reacted = any(
-            self.user in names for names in self.reaction_and_gitlab_user.values()
-        )
-        has_upvoted = self.user in self.reaction_and_gitlab_user.get("thumbsup", [])
-        if has_reacted and not has_upvoted:
+        if self.user_reacted and not self.user_upvoted:
             return True
         return False
 
@@ -143,17 +243,82 @@ class MergeRequest:
         """
         return not (self.user_reacted_but_no_upvote() and not self.is_author)
 
+    def needs_attention(self, show_all_discussions: bool) -> bool:
+        """Return True if the MR should be presented to the user.
+
+        :param show_all_discussions: Whether the user has asked to see
+            all threads they are involved in, even when they don't need
+            to reply.
+
+        :return: True if the MR should be presented, otherwise False.
+        """
+        return not (
+            self.user_is_reviewer()
+            and self.number_of_open_threads_needing_user_reply == 0
+            and (not show_all_discussions or len(self.threads) == 0)
+        )
+
+    def thread_needs_reply(self, thread: Dict[str, Any]) -> bool:
+        """Return True if someone else has the last word in a thread.
+
+        :param thread: One of the threads of the MR.
+
+        :return: True if the user needs to reply, otherwise False.
+        """
+        return not self.is_user(thread["notes"][-1]["author"]["username"])
+
+    def visible_threads(self, hide_replied_discussions: bool) -> List[Dict[str, Any]]:
+        """Return the threads of the MR to present to the user.
+
+        No threads are presented when the only reason to present the MR
+        is that the user has reacted to it without upvoting.
+
+        :param hide_replied_discussions: Whether the user has asked to
+            only see threads where they need to reply.
+
+        :return: The threads to present.
+        """
+        if (
+            self.user_reacted_but_no_upvote()
+            and not self.is_author
+            and self.number_of_open_threads_needing_user_reply == 0
+        ):
+            return []
+        return [
+            thread
+            for thread in self.threads
+            if not hide_replied_discussions or self.thread_needs_reply(thread)
+        ]
+
+    def changed_threads(self, threads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the threads with changes since the last run.
+
+        :param threads: The threads to choose from, like the visible
+            threads.
+
+        :return: The threads with a new or edited note, or that were
+            reopened.
+        """
+        return [
+            thread
+            for thread in threads
+            if str(thread["id"]) in self.thread_changes
+            or any(str(note["id"]) in self.note_changes for note in thread["notes"])
+        ]
+
     def user_is_referenced_in_thread(self, messages: List[Dict[str, Any]]) -> bool:
         """Check if configured user is mentioned in a given thread.
 
+        The user is mentioned if their username, one of their aliases or
+        one of their groups is mentioned, see MentionMatcher.
+
         :param messages: The thread to check as a list of messages.
-        :param username: The username of the configured user.
 
         :return: True if the user is mentioned in the given thread,
             otherwise false.
         """
         for message in messages:
-            if ("@" + self.user) in message["body"]:
+            if self.mentions.is_mentioned(message["body"]):
                 return True
         return False
 
@@ -171,8 +336,8 @@ class MergeRequest:
         :return: False if the user doesn't have anything to respond to,
             otherwise True.
         """
-        if self.mr_author == self.user:
-            if messages[-1]["author"]["username"] != self.user:
+        if self.is_author:
+            if not self.is_user(messages[-1]["author"]["username"]):
                 return True
         return False
 
@@ -187,6 +352,6 @@ class MergeRequest:
             otherwise False.
         """
         for message in messages:
-            if message["author"]["username"] == self.user:
+            if self.is_user(message["author"]["username"]):
                 return True
         return False
@@ -0,0 +1,273 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the Metrics class for Prometheus metrics."""
+import os
+import re
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from reviewcheck.exceptions import RCException
+
+# The label names and values of one time series, sorted by name
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """Count what reviewcheck asks of GitLab, in the Prometheus format.
+
+    The metrics are collected for the whole life of the process, so
+    with --refresh they add up over all refresh cycles, and can be
+    written to a file for the textfile collector of node_exporter,
+    see write(), or served over HTTP on localhost, see serve().
+    """
+
+    # The type and description of each metric, in the order they are
+    # exported
+    DEFINITIONS: Dict[str, Tuple[str, str]] = {
+        "reviewcheck_requests_total": (
+            "counter",
+            "Requests sent to GitLab, by endpoint and HTTP status code.",
+        ),
+        "reviewcheck_request_duration_seconds": (
+            "histogram",
+            "Time taken by requests to GitLab, including duplicates.",
+        ),
+        "reviewcheck_retries_total": (
+            "counter",
+            "Requests and merge requests sent again, by reason.",
+        ),
+        "reviewcheck_concurrency_limit": (
+            "gauge",
+            "Requests to GitLab allowed at the same time, by host.",
+        ),
+        "reviewcheck_cache_hits_total": (
+            "counter",
+            "Downloads avoided with data stored locally, by cache.",
+        ),
+        "reviewcheck_cache_misses_total": (
+            "counter",
+            "Downloads made since stored data could not be used, by cache.",
+        ),
+        "reviewcheck_merge_requests_total": (
+            "counter",
+            "Merge requests processed, by result.",
+        ),
+        "reviewcheck_cycle_duration_seconds": (
+            "histogram",
+            "Time taken to download and present all merge requests.",
+        ),
+        "reviewcheck_last_cycle_timestamp_seconds": (
+            "gauge",
+            "Time the last cycle finished, in seconds since the epoch.",
+        ),
+        "reviewcheck_threads_needing_reply": (
+            "gauge",
+            "Threads needing a reply from the user in the last cycle.",
+        ),
+    }
+    BUCKETS: Dict[str, Tuple[float, ...]] = {
+        "reviewcheck_request_duration_seconds": (
+            0.05,
+            0.1,
+            0.25,
+            0.5,
+            1,
+            2.5,
+            5,
+            10,
+            30,
+        ),
+        "reviewcheck_cycle_duration_seconds": (1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+    }
+
+    lock = threading.Lock()
+    # The value of each counter and gauge, and the count in each bucket
+    # of each histogram, the last one being +Inf, followed by its sum
+    # and count
+    values: Dict[str, Dict[Labels, float]] = {}
+    histograms: Dict[str, Dict[Labels, List[float]]] = {}
+    server: Optional[ThreadingHTTPServer] = None
+
+    @staticmethod
+    def count(name: str, amount: float = 1, **labels: str) -> None:
+        """Increase a counter.
+
+        :param name: The name of the counter.
+        :param amount: How much to increase it by.
+        :param labels: The labels of the time series to increase.
+        """
+        key = tuple(sorted(labels.items()))
+        with Metrics.lock:
+            series = Metrics.values.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    @staticmethod
+    def set(name: str, value: float, **labels: str) -> None:
+        """Set a gauge.
+
+        :param name: The name of the gauge.
+        :param value: The new value.
+        :param labels: The labels of the time series to set.
+        """
+        key = tuple(sorted(labels.items()))
+        with Metrics.lock:
+            Metrics.values.setdefault(name, {})[key] = value
+
+    @staticmethod
+    def observe(name: str, value: float, **labels: str) -> None:
+        """Add an observation to a histogram.
+
+        :param name: The name of the histogram.
+        :param value: The observed value.
+        :param labels: The labels of the time series to add to.
+        """
+        buckets = Metrics.BUCKETS[name]
+        key = tuple(sorted(labels.items()))
+        with Metrics.lock:
+            series = Metrics.histograms.setdefault(name, {})
+            counts = series.setdefault(key, [0] * (len(buckets) + 3))
+            counts[bisect_left(buckets, value)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    @staticmethod
+    def reset() -> None:
+        """Forget all collected values."""
+        with Metrics.lock:
+            Metrics.values.clear()
+            Metrics.histograms.clear()
+
+    @staticmethod
+    def endpoint(url: str) -> str:
+        """Return the API endpoint of a URL, to label requests with.
+
+        The IDs in the path are replaced, so that all requests to the
+        same endpoint share one time series.
+
+        :param url: The requested URL.
+
+        :return: The path after /api/v4, like
+            projects/:id/merge_requests/:iid/discussions.
+        """
+        path = urlsplit(url).path.split("/api/v4/", 1)[-1].strip("/")
+        segments = path.split("/")
+        for i in range(1, len(segments)):
+            if segments[i - 1] in ("projects", "groups"):
+                segments[i] = ":id"
+            elif segments[i - 1] == "merge_requests" and segments[i].isdigit():
+                segments[i] = ":iid"
+        return "/".join(segments)
+
+    @staticmethod
+    def render() -> str:
+        """Return the metrics in the Prometheus text format."""
+        lines: List[str] = []
+        with Metrics.lock:
+            for name, (kind, description) in Metrics.DEFINITIONS.items():
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind != "histogram":
+                    for labels, value in sorted(Metrics.values.get(name, {}).items()):
+                        lines.append(
+                            f"{name}{Metrics.format_labels(labels)} "
+                            f"{Metrics.format_value(value)}"
+                        )
+                    continue
+                buckets = Metrics.BUCKETS[name]
+                for labels, counts in sorted(Metrics.histograms.get(name, {}).items()):
+                    cumulative = 0.0
+                    bounds = [Metrics.format_value(b) for b in buckets] + ["+Inf"]
+                    for bound, bucket_count in zip(bounds, counts[:-2]):
+                        cumulative += bucket_count
+                        lines.append(
+                            f"{name}_bucket"
+                            f"{Metrics.format_labels(labels + (('le', bound),))} "
+                            f"{Metrics.format_value(cumulative)}"
+                        )
+                    lines.append(
+                        f"{name}_sum{Metrics.format_labels(labels)} "
+                        f"{Metrics.format_value(counts[-2])}"
+                    )
+                    lines.append(
+                        f"{name}_count{Metrics.format_labels(labels)} "
+                        f"{Metrics.format_value(counts[-1])}"
+                    )
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def format_labels(labels: Labels) -> str:
+        """Format labels as in the Prometheus text format."""
+        if not labels:
+            return ""
+        escaped = (
+            (name, re.sub(r'(["\\])', r"\\\1", value).replace("\n", "\\n"))
+            for name, value in labels
+        )
+        return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+    @staticmethod
+    def format_value(value: float) -> str:
+        """Format a value, without decimals if it is a whole number."""
+        if float(value).is_integer():
+            return str(int(value))
+        return repr(float(value))
+
+    @staticmethod
+    def write(path: Path) -> None:
+        """Write the metrics to a file.
+
+        The file is replaced in one step, so that the textfile collector
+        never reads a half-written file.
+
+        :param path: The file to write.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_name(f".{path.name}.tmp")
+        with open(temporary_path, "w") as f:
+            f.write(Metrics.render())
+        os.replace(temporary_path, path)
+
+    @staticmethod
+    def serve(port: int) -> int:
+        """Serve the metrics over HTTP on localhost, in the background.
+
+        :param port: The port to listen on, or 0 for any free port.
+
+        :raises RCException: Raised when the port cannot be used.
+
+        :return: The port listened on.
+        """
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+        except OSError as e:
+            raise RCException(f"Could not serve metrics on port {port}: {e}")
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, name="metrics", daemon=True
+        ).start()
+        Metrics.server = server
+        return int(server.server_address[1])
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Answer requests for the metrics, see Metrics.serve()."""
+
+    def do_GET(self) -> None:
+        """Send the metrics, at / or /metrics."""
+        if urlsplit(self.path).path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = Metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Log nothing, since the terminal is used for the output."""
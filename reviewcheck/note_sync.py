@@ -0,0 +1,236 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the NoteSync class for syncing threads of MRs."""
+import hashlib
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from reviewcheck.constants import Constants
+from reviewcheck.exceptions import RCException
+from reviewcheck.metrics import Metrics
+from reviewcheck.utils import Utils
+
+
+class NoteSync:
+    """Keep the threads of each MR locally and download only changes.
+
+    The first time an MR is seen, all of its threads are downloaded
+    from the discussions endpoint and stored in the data directory.
+    After that, only the notes that have been updated since the newest
+    stored note are downloaded, from the notes endpoint ordered by
+    update time, and merged into the stored threads.
+
+    Edited notes and resolved or reopened threads are merged in place.
+    New replies are added to their thread, found by the discussion_id
+    of the note, and new notes that are not part of a thread, such as
+    system notes, are added as threads of their own. When a new thread
+    appears, or a reply that does not tell its thread, or when the
+    number of notes does not match the MR metadata, all threads are
+    downloaded again.
+    """
+
+    def __init__(self, api_url: str):
+        """Initialize a NoteSync object.
+
+        :param api_url: The URL of the GitLab API, including /api/v4.
+        """
+        self.api_url = api_url
+
+    def download_data(
+        self, params: Tuple[str, Optional[str], Optional[str], Any]
+    ) -> Tuple[Any, Any, Any]:
+        """Download data for MR, and for reaction if requested.
+
+        Works like Utils.download_data(), but the threads are synced
+        with the locally stored ones instead of downloaded in full.
+        """
+        token, mr_url, reaction_url, metadata = params
+        mr_response, reaction_response, metadata = Utils.download_data(
+            (token, None, reaction_url, metadata)
+        )
+        if mr_url:
+            mr_response = self.sync(token, mr_url, metadata)
+        return mr_response, reaction_response, metadata
+
+    def sync(
+        self,
+        secret_token: str,
+        discussions_url: str,
+        metadata: Dict[str, Any],
+    ) -> List[Dict[str, Any]]:
+        """Return the up to date threads of an MR.
+
+        :param secret_token: Token to access the GitLab API.
+        :param discussions_url: The URL to download all threads from.
+        :param metadata: The data for the MR as returned when listing
+            merge requests.
+
+        :return: All threads of the MR.
+        """
+        path = NoteSync.cache_path(metadata)
+        cached = Utils.read_json(path, None)
+        if (
+            not isinstance(cached, dict)
+            or time.time() - cached.get("full_sync_time", 0)
+            > Constants.NOTE_SYNC_FULL_INTERVAL
+        ):
+            return self.full_sync(secret_token, discussions_url, metadata)
+
+        discussions: List[Dict[str, Any]] = cached["discussions"]
+        high_water_mark = NoteSync.parse_time(cached["high_water_mark"])
+
+        changed_notes: List[Dict[str, Any]] = []
+        reached_high_water_mark = False
+        for page in Utils.download_gitlab_pages(secret_token, self.notes_url(metadata)):
+            for note in page:
+                if NoteSync.parse_time(note["updated_at"]) <= high_water_mark:
+                    reached_high_water_mark = True
+                    break
+                changed_notes.append(note)
+            if reached_high_water_mark:
+                break
+
+        if not NoteSync.merge(discussions, changed_notes):
+            return self.full_sync(secret_token, discussions_url, metadata)
+
+        # Deleted notes are not listed at all, but they show up as a
+        # difference in the number of notes.
+        number_of_notes = NoteSync.count_user_notes(discussions)
+        if number_of_notes != metadata.get("user_notes_count", number_of_notes):
+            return self.full_sync(secret_token, discussions_url, metadata)
+
+        Metrics.count("reviewcheck_cache_hits_total", cache="notes")
+        if not changed_notes:
+            return discussions
+
+        cached["discussions"] = discussions
+        cached["high_water_mark"] = NoteSync.newest_update(discussions)
+        Utils.write_json(path, cached)
+        return discussions
+
+    def full_sync(
+        self,
+        secret_token: str,
+        discussions_url: str,
+        metadata: Dict[str, Any],
+    ) -> List[Dict[str, Any]]:
+        """Download and store all threads of an MR.
+
+        :param secret_token: Token to access the GitLab API.
+        :param discussions_url: The URL to download all threads from.
+        :param metadata: The data for the MR as returned when listing
+            merge requests.
+
+        :return: All threads of the MR.
+        """
+        Metrics.count("reviewcheck_cache_misses_total", cache="notes")
+        discussions = Utils.download_gitlab_data(secret_token, discussions_url)
+        Utils.write_json(
+            NoteSync.cache_path(metadata),
+            {
+                "full_sync_time": time.time(),
+                "high_water_mark": NoteSync.newest_update(discussions),
+                "discussions": discussions,
+            },
+        )
+        return discussions
+
+    @staticmethod
+    def merge(
+        discussions: List[Dict[str, Any]],
+        changed_notes: List[Dict[str, Any]],
+    ) -> bool:
+        """Merge changed notes into the stored threads of an MR.
+
+        :param discussions: The stored threads, updated in place.
+        :param changed_notes: The notes that have changed since the
+            threads were stored.
+
+        :return: True if all notes could be merged, False if the
+            threads have to be downloaded again.
+        """
+        note_locations: Dict[int, Tuple[int, int]] = {}
+        thread_locations: Dict[str, int] = {}
+        for i, discussion in enumerate(discussions):
+            thread_locations[str(discussion["id"])] = i
+            for j, note in enumerate(discussion["notes"]):
+                note_locations[note["id"]] = (i, j)
+
+        # Apply the oldest change first, so the newest state wins
+        for note in reversed(changed_notes):
+            thread_id = note.get("discussion_id")
+            if note["id"] in note_locations:
+                i, j = note_locations[note["id"]]
+                discussion = discussions[i]
+                discussion["notes"][j] = note
+            elif thread_id is not None and str(thread_id) in thread_locations:
+                # A new reply, newer than the rest of its thread
+                i = thread_locations[str(thread_id)]
+                discussion = discussions[i]
+                note_locations[note["id"]] = (i, len(discussion["notes"]))
+                discussion["notes"].append(note)
+            elif not note.get("resolvable") and note.get("type") is None:
+                i = len(discussions)
+                discussion = {
+                    "id": f"note_{note['id']}" if thread_id is None else thread_id,
+                    "individual_note": True,
+                    "notes": [note],
+                }
+                thread_locations[str(discussion["id"])] = i
+                note_locations[note["id"]] = (i, 0)
+                discussions.append(discussion)
+            else:
+                return False
+            # All notes in a thread share the resolved state
+            if "resolved" in note:
+                for other_note in discussion["notes"]:
+                    if "resolved" in other_note:
+                        other_note["resolved"] = note["resolved"]
+        return True
+
+    def notes_url(self, metadata: Dict[str, Any]) -> str:
+        """Construct API URL for the notes of an MR, newest first."""
+        return (
+            f"{self.api_url}/projects/{metadata['project_id']}/merge_requests/"
+            f"{metadata['iid']}/notes?order_by=updated_at&sort=desc"
+            f"&per_page={Constants.NOTE_SYNC_PAGE_SIZE}"
+        )
+
+    @staticmethod
+    def cache_path(metadata: Dict[str, Any]) -> Path:
+        """Return the path of the file storing the threads of an MR."""
+        digest = hashlib.sha1(metadata["web_url"].encode()).hexdigest()
+        return Constants.DISCUSSIONS_DIR / f"{digest}.json"
+
+    @staticmethod
+    def count_user_notes(discussions: List[Dict[str, Any]]) -> int:
+        """Return the number of notes not generated by GitLab itself."""
+        return sum(
+            1
+            for discussion in discussions
+            for note in discussion["notes"]
+            if not note.get("system")
+        )
+
+    @staticmethod
+    def newest_update(discussions: List[Dict[str, Any]]) -> str:
+        """Return the time of the latest update of any note."""
+        return max(
+            (note["updated_at"] for d in discussions for note in d["notes"]),
+            key=NoteSync.parse_time,
+            default="1970-01-01T00:00:00.000Z",
+        )
+
+    @staticmethod
+    def parse_time(timestamp: str) -> datetime:
+        """Parse a GitLab timestamp so that it can be compared."""
+        try:
+            parsed = Utils.parse_time(timestamp)
+        except RCException:
+            return datetime.min.replace(tzinfo=timezone.utc)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed
@@ -0,0 +1,120 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the Pipeline class for bounded concurrent work."""
+import concurrent.futures
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Callable,
+    Deque,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from reviewcheck.constants import Constants
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class Pipeline(Generic[T, R]):
+    """Process items concurrently while keeping memory use bounded.
+
+    Unlike ThreadPoolExecutor.map(), which submits every item up front
+    and keeps every result until it has been consumed, the pipeline
+    only takes a new item from the input when an earlier one has been
+    consumed. At most max_in_flight items are being processed or waiting
+    to be consumed at any time, so the memory used does not grow with
+    the number of items.
+
+    The results are returned in the same order as the items, so
+    prioritized items are still presented first. If a deadline is
+    given, the pipeline stops waiting when it has passed, and the items
+    that were not done are kept in missed.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[T], R],
+        workers: int = Constants.THREADPOOL_MAXSIZE,
+        max_in_flight: int = Constants.PIPELINE_MAX_IN_FLIGHT,
+    ):
+        """Initialize a Pipeline object.
+
+        :param process: The function to run for each item. It should
+            return only what is needed later, so that the raw data can
+            be released as soon as the item has been processed.
+        :param workers: The number of threads processing items.
+        :param max_in_flight: The maximum number of items that are
+            being processed or are waiting to be consumed.
+        """
+        self.process = process
+        self.workers = workers
+        self.max_in_flight = max(max_in_flight, 1)
+        self.missed: List[T] = []
+
+    def run(self, items: Iterable[T], deadline: Optional[float] = None) -> Iterator[R]:
+        """Process the items and return the results as they are done.
+
+        :param items: The items to process. They are consumed lazily.
+        :param deadline: The time on the monotonic clock after which to
+            stop waiting for results, or None to wait for all of them.
+
+        :return: An iterator over the results, in the order of the
+            items. When the deadline has passed, only the results that
+            were already done are returned.
+        """
+        self.missed = []
+        in_flight: Deque[Tuple[T, "Future[R]"]] = deque()
+        item_iterator = iter(items)
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            for item in item_iterator:
+                in_flight.append((item, executor.submit(self.process, item)))
+                if len(in_flight) < self.max_in_flight:
+                    continue
+                if not Pipeline.wait(in_flight[0][1], deadline):
+                    break
+                yield in_flight.popleft()[1].result()
+
+            while in_flight and Pipeline.wait(in_flight[0][1], deadline):
+                yield in_flight.popleft()[1].result()
+
+            # The deadline has passed if anything is left
+            while in_flight:
+                item, future = in_flight.popleft()
+                if future.done():
+                    yield future.result()
+                else:
+                    future.cancel()
+                    self.missed.append(item)
+            self.missed += item_iterator
+        finally:
+            # If the consumer stops early, don't start on the items that
+            # are still waiting.
+            for _, future in in_flight:
+                future.cancel()
+            # Items missed by the deadline are left to finish in the
+            # background, so that the results can be shown right away.
+            executor.shutdown(wait=not self.missed)
+
+    @staticmethod
+    def wait(future: "Future[R]", deadline: Optional[float]) -> bool:
+        """Wait for a result until the deadline.
+
+        :param future: The result to wait for.
+        :param deadline: The time on the monotonic clock to wait until,
+            or None to wait as long as it takes.
+
+        :return: True if the result is done.
+        """
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+        concurrent.futures.wait([future], timeout=timeout)
+        return future.done()
@@ -0,0 +1,167 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the PreFilter class for skipping irrelevant MRs."""
+from typing import Any, Dict, Optional, Set, Tuple
+
+from reviewcheck.constants import Constants
+from reviewcheck.merge_request import MergeRequest
+from reviewcheck.reactions import ReactionResolver
+from reviewcheck.utils import Utils
+
+
+class PreFilter:
+    """Decide which MRs need to be downloaded before downloading them.
+
+    Downloading the threads and reactions of an MR is only worthwhile
+    if the result can be shown to the user. The decision is made from
+    the metadata returned when listing the merge requests, together
+    with what was learned about each MR the last time it was
+    downloaded:
+
+    - The threads can only be relevant if the MR has any notes, and the
+      user is the author, reviewer or assignee of the MR, or has
+      written or been mentioned in it before. Since a mention can be
+      added in any new or edited note, the threads are downloaded again
+      whenever the number of notes or the update time of the MR
+      changes. GitLab updates the MR when one of its notes is edited.
+    - The reactions decide whether the MR is shown when the user has
+      reacted to it without upvoting, and are listed in the info box of
+      each MR shown. When the reactions of the user are known from the
+      lists of a ReactionResolver, which also downloads all reactions
+      of the MRs shown, they are only needed if the user has reacted
+      without upvoting. Otherwise a new reaction of the user cannot be
+      told from the listed MR, so they are needed unless the user is
+      the author and the threads are not needed.
+
+    The threads of MRs with notes that have never been downloaded are
+    always downloaded.
+    """
+
+    def __init__(
+        self,
+        user: str,
+        history: Optional[Dict[str, Any]] = None,
+        reactions: Optional[ReactionResolver] = None,
+    ):
+        """Initialize a PreFilter object.
+
+        :param user: The username of the configured user.
+        :param history: What is known about each MR since earlier runs,
+            as stored by save(). Empty if not given.
+        :param reactions: The resolver that listed the MRs the user has
+            reacted to, if any.
+        """
+        self.user = user
+        self.history: Dict[str, Dict[str, Any]] = {} if history is None else history
+        self.reactions = reactions
+
+    @staticmethod
+    def load(user: str) -> "PreFilter":
+        """Create a PreFilter with the history stored on disk.
+
+        The history is only used if it was recorded for the same user.
+
+        :param user: The username of the configured user.
+
+        :return: The new PreFilter object.
+        """
+        stored = Utils.read_json(Constants.PARTICIPATION_PATH, {})
+        if not isinstance(stored, dict) or stored.get("user") != user:
+            return PreFilter(user)
+        return PreFilter(user, stored.get("merge_requests"))
+
+    def save(self, open_keys: Set[str]) -> None:
+        """Store the history on disk for the next run.
+
+        :param open_keys: The keys of all MRs that are still open, see
+            key(). The history of any other MR is dropped.
+        """
+        Utils.write_json(
+            Constants.PARTICIPATION_PATH,
+            {
+                "user": self.user,
+                "merge_requests": {
+                    key: value
+                    for key, value in self.history.items()
+                    if key in open_keys
+                },
+            },
+        )
+
+    @staticmethod
+    def key(metadata: Dict[str, Any]) -> str:
+        """Return the key identifying an MR in the history.
+
+        The URL of the MR is used since it is unique even across GitLab
+        instances.
+        """
+        return str(metadata["web_url"])
+
+    def downloads_needed(self, metadata: Dict[str, Any]) -> Tuple[bool, bool]:
+        """Decide what needs to be downloaded for an MR.
+
+        :param metadata: The data for the MR as returned when listing
+            merge requests.
+
+        :return: Whether the threads and whether the reactions of the
+            MR need to be downloaded, in that order.
+        """
+        entry = self.history.get(self.key(metadata))
+        notes = metadata.get("user_notes_count")
+        user = self.user.casefold()
+
+        def is_user(person: Optional[Dict[str, Any]]) -> bool:
+            return person is not None and person["username"].casefold() == user
+
+        is_author = is_user(metadata.get("author"))
+        has_role = (
+            is_author
+            or any(is_user(person) for person in metadata.get("reviewers") or [])
+            or any(is_user(person) for person in metadata.get("assignees") or [])
+        )
+
+        if notes is None:
+            threads_needed = True
+        elif notes == 0:
+            threads_needed = False
+        else:
+            threads_needed = (
+                has_role
+                or entry is None
+                or "involved" not in entry
+                or entry["involved"]
+                or entry["notes"] != notes
+                or entry.get("updated_at") != metadata.get("updated_at")
+            )
+
+        if self.reactions is not None:
+            url = metadata["web_url"]
+            reactions_needed = (
+                not is_author
+                and url in self.reactions.reacted
+                and url not in self.reactions.upvoted
+            )
+        else:
+            reactions_needed = threads_needed or not is_author
+
+        return threads_needed, reactions_needed
+
+    def record(
+        self,
+        mr: MergeRequest,
+        metadata: Dict[str, Any],
+        threads_downloaded: bool,
+    ) -> None:
+        """Remember what was learned about an MR from downloading it.
+
+        :param mr: The MR created from the downloaded data.
+        :param metadata: The data for the MR as returned when listing
+            merge requests.
+        :param threads_downloaded: Whether the threads were downloaded.
+        """
+        entry = self.history.setdefault(self.key(metadata), {})
+        if threads_downloaded:
+            entry["notes"] = metadata.get("user_notes_count")
+            entry["updated_at"] = metadata.get("updated_at")
+            entry["involved"] = mr.user_has_participated
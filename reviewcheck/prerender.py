@@ -0,0 +1,181 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the PreRenderer class for rendering in parallel."""
+import multiprocessing
+import signal
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from types import TracebackType
+from typing import Any, Callable, Deque, Dict, List, Optional, Type
+
+from rich.console import Console, ConsoleOptions, RenderableType, RenderResult
+from rich.segment import Segment
+
+from reviewcheck.merge_request import MergeRequest
+
+# Creates the components presenting an MR, see
+# merge_request_renderables() in app.py
+Render = Callable[[MergeRequest, Dict[str, Any]], List[RenderableType]]
+
+# The console each worker process renders with, see start_worker()
+worker_console: Optional[Console] = None
+
+
+def start_worker(
+    width: int,
+    color_system: Optional[str],
+    is_terminal: bool,
+    no_color: bool,
+    legacy_windows: bool,
+) -> None:
+    """Set up a worker process with a console like the main one.
+
+    Interrupts are left to the main process, which stops the workers.
+    """
+    global worker_console
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_console = Console(
+        width=width,
+        color_system=color_system,  # type: ignore[arg-type]
+        force_terminal=is_terminal,
+        no_color=no_color,
+        legacy_windows=legacy_windows,
+    )
+
+
+def render_to_text(render: Render, mr: MergeRequest, config: Dict[str, Any]) -> str:
+    """Render an MR in a worker process.
+
+    :param render: The function creating the components of the MR.
+    :param mr: The merge request to render.
+    :param config: The resolved configuration of reviewcheck.
+
+    :return: The text the console of the main process would write for
+        the MR, including the escape codes for colors.
+    """
+    assert worker_console is not None
+    with worker_console.capture() as capture:
+        for renderable in render(mr, config):
+            worker_console.print(renderable)
+    return capture.get()
+
+
+class RenderedText:
+    """Text already rendered for the console, written as it is."""
+
+    def __init__(self, text: str):
+        """Initialize a RenderedText object."""
+        self.text = text
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        """Yield the text as a single segment without style."""
+        yield Segment(self.text)
+
+
+class PreRenderer:
+    """Render MRs in a pool of processes and print them in order.
+
+    Laying out the tables of MRs with many threads takes a lot of CPU,
+    so with more than one process the MRs are rendered to text in
+    worker processes, each with a console set up like the given one.
+    The text of each MR is printed as soon as it and all MRs submitted
+    before it are done, which gives the same output as printing the
+    MRs one by one. With one process, the MRs are printed directly.
+    """
+
+    def __init__(
+        self,
+        console: Console,
+        processes: int,
+        render: Render,
+        config: Dict[str, Any],
+    ):
+        """Initialize a PreRenderer object.
+
+        :param console: The console to print to.
+        :param processes: The number of processes to render in.
+        :param render: The function creating the components of an MR.
+            It must be defined at the top level of a module, so that it
+            can be called in the worker processes.
+        :param config: The resolved configuration of reviewcheck.
+        """
+        self.console = console
+        self.render = render
+        self.config = config
+        self.pending: Deque["Future[str]"] = deque()
+        self.executor: Optional[ProcessPoolExecutor] = None
+        # The workers render text for a UTF-8 console, so other
+        # encodings, where rich draws boxes with ASCII, are rendered
+        # directly.
+        if processes > 1 and console.encoding.startswith("utf"):
+            # Worker processes are started fresh rather than forked,
+            # since the download threads may hold locks when forking.
+            self.executor = ProcessPoolExecutor(
+                processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=start_worker,
+                initargs=(
+                    console.width,
+                    console.color_system,
+                    console.is_terminal,
+                    console.no_color,
+                    console.legacy_windows,
+                ),
+            )
+
+    def __enter__(self) -> "PreRenderer":
+        """Return the PreRenderer."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Print the rest of the MRs and stop the worker processes.
+
+        Nothing more is printed if an exception was raised.
+        """
+        if exc_type is None:
+            self.flush()
+        # MRs left after an exception are not rendered. This is what
+        # shutdown(cancel_futures=True) does, which needs Python 3.9.
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=exc_type is None)
+
+    def submit(self, mr: MergeRequest) -> None:
+        """Render an MR and print it after the MRs submitted before it.
+
+        :param mr: The merge request to present.
+        """
+        if self.executor is None:
+            for renderable in self.render(mr, self.config):
+                self.console.print(renderable)
+            return
+
+        self.pending.append(
+            self.executor.submit(render_to_text, self.render, mr, self.config)
+        )
+        while self.pending and self.pending[0].done():
+            self.write(self.pending.popleft().result())
+
+    def flush(self) -> None:
+        """Wait for all submitted MRs to be rendered and print them."""
+        while self.pending:
+            self.write(self.pending.popleft().result())
+
+    def write(self, text: str) -> None:
+        """Print the rendered text of an MR.
+
+        The text is not cropped to the width of the console, since the
+        escape codes in it would count as characters.
+        """
+        if text:
+            self.console.print(RenderedText(text), end="", crop=False)
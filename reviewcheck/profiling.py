@@ -0,0 +1,237 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the Profiler class for finding what is slow."""
+import cProfile
+import pstats
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Set, Tuple
+
+from reviewcheck.constants import Constants
+
+
+class Profiler:
+    """Profile where reviewcheck spends its time and memory.
+
+    With the cpu mode, every thread is profiled with cProfile, so that
+    the time spent downloading in the worker threads is counted along
+    with the time spent classifying and rendering in the main thread.
+    With the memory mode, allocations are traced with tracemalloc.
+
+    A run is split into phases, see phase(): startup, and then listing,
+    fetching, saving and waiting for each refresh cycle. MRs are
+    classified and rendered as soon as they have been downloaded, so
+    all three happen while fetching, and the functions in the CPU
+    profile tell them apart. MRs rendered in other processes, see
+    PreRenderer, are not profiled.
+
+    The reports are written to Constants.PROFILE_DIR by stop(), which
+    also returns a summary of the hotspots.
+    """
+
+    lock = threading.Lock()
+    modes: Set[str] = set()
+    # The profile of each thread, the first one being the main thread
+    profiles: List[cProfile.Profile] = []
+    # The name, duration, and traced memory at the end and at the peak
+    # of each finished phase
+    phases: List[Tuple[str, float, int, int]] = []
+    # The name and start time of the current phase, if profiling
+    current: Optional[Tuple[str, float]] = None
+    # The memory snapshot at the end of the last phase, and the name,
+    # growth in memory and snapshots at the start and end of the phase
+    # whose peak grew the most from its start, which are compared when
+    # done
+    snapshot: Optional[tracemalloc.Snapshot] = None
+    peak_phase: Optional[
+        Tuple[str, int, tracemalloc.Snapshot, tracemalloc.Snapshot]
+    ] = None
+
+    @staticmethod
+    def start(modes: Sequence[str]) -> None:
+        """Start profiling, unless no mode is given.
+
+        :param modes: What to profile, cpu and/or memory.
+        """
+        Profiler.modes = set(modes)
+        if not Profiler.modes:
+            return
+        Profiler.reset()
+        Constants.PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        for old_report in Constants.PROFILE_DIR.glob("memory-*.tracemalloc"):
+            old_report.unlink()
+        if "memory" in Profiler.modes:
+            tracemalloc.start(Constants.PROFILE_MEMORY_FRAMES)
+            Profiler.snapshot = Profiler.take_snapshot()
+        if "cpu" in Profiler.modes:
+            # Each thread started from now on profiles itself
+            threading.setprofile(Profiler.profile_thread)
+            Profiler.profile_thread()
+        Profiler.current = ("startup", time.perf_counter())
+
+    @staticmethod
+    def profile_thread(*_: Any) -> None:
+        """Start profiling the calling thread.
+
+        Called in each new thread on its first call, see
+        threading.setprofile(), and replaced by the profile of the
+        thread.
+        """
+        profile = cProfile.Profile()
+        with Profiler.lock:
+            Profiler.profiles.append(profile)
+        profile.enable()
+
+    @staticmethod
+    def phase(name: str) -> None:
+        """End the current phase and start another, if profiling.
+
+        :param name: The name of the new phase.
+        """
+        if Profiler.current is None:
+            return
+        Profiler.end_phase()
+        Profiler.current = (name, time.perf_counter())
+
+    @staticmethod
+    def end_phase() -> None:
+        """Record how long the current phase took and what it used."""
+        assert Profiler.current is not None
+        name, started = Profiler.current
+        duration = time.perf_counter() - started
+        current = peak = 0
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # Taking the snapshot is left out of the CPU profile of this
+            # thread and of the peak of the next phase
+            if Profiler.profiles:
+                Profiler.profiles[0].disable()
+            snapshot = Profiler.take_snapshot()
+            snapshot.dump(
+                str(
+                    Constants.PROFILE_DIR
+                    / f"memory-{len(Profiler.phases):03d}-{name}.tracemalloc"
+                )
+            )
+            growth = peak - (Profiler.phases[-1][2] if Profiler.phases else 0)
+            if Profiler.snapshot is not None and (
+                Profiler.peak_phase is None or growth > Profiler.peak_phase[1]
+            ):
+                Profiler.peak_phase = (name, growth, Profiler.snapshot, snapshot)
+            Profiler.snapshot = snapshot
+            # Before Python 3.9, the peak of each phase is the highest
+            # memory traced so far instead
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            if Profiler.profiles:
+                Profiler.profiles[0].enable()
+        Profiler.phases.append((name, duration, current, peak))
+
+    @staticmethod
+    def take_snapshot() -> tracemalloc.Snapshot:
+        """Return the memory allocated, except by the profiling."""
+        return tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ]
+        )
+
+    @staticmethod
+    def stop() -> Optional[str]:
+        """Stop profiling and write the reports.
+
+        :return: A summary of the reports to show the user, or None if
+            not profiling.
+        """
+        if Profiler.current is None:
+            return None
+        Profiler.end_phase()
+        Profiler.current = None
+        lines = [f"Profile written to {Constants.PROFILE_DIR}", ""]
+        header = f"{'Phase':<12}{'Seconds':>10}"
+        if "memory" in Profiler.modes:
+            header += f"{'Memory':>12}{'Peak':>12}"
+        lines.append(header)
+        for name, duration, current, peak in Profiler.phases:
+            memory = ""
+            if "memory" in Profiler.modes:
+                memory = f"{Profiler.size(current):>12}{Profiler.size(peak):>12}"
+            lines.append(f"{name:<12}{duration:>10.3f}{memory}")
+
+        if "cpu" in Profiler.modes:
+            threading.setprofile(None)
+            with Profiler.lock:
+                # The first profile is of this thread, which stops being
+                # profiled when its stats are created
+                stats = pstats.Stats(*Profiler.profiles)
+            stats.dump_stats(Constants.PROFILE_DIR / "cpu.pstats")
+            with open(Constants.PROFILE_DIR / "cpu.txt", "w") as f:
+                stats.stream = f  # type: ignore[attr-defined]
+                stats.sort_stats("cumulative").print_stats(
+                    Constants.PROFILE_REPORT_SIZE
+                )
+                stats.sort_stats("tottime").print_stats(Constants.PROFILE_REPORT_SIZE)
+            lines += ["", "Functions taking the most time, in all threads:"]
+            hotspots = sorted(
+                stats.stats.items(),  # type: ignore[attr-defined]
+                key=lambda item: item[1][2],
+                reverse=True,
+            )
+            for (filename, lineno, function), (
+                _,
+                calls,
+                own_time,
+                cumulative,
+                _,
+            ) in hotspots[: Constants.PROFILE_SUMMARY_SIZE]:
+                where = function
+                if filename != "~":
+                    where = f"{Path(filename).name}:{lineno}({function})"
+                lines.append(
+                    f"{own_time:>9.3f}s own {cumulative:>9.3f}s total "
+                    f"{calls:>7} calls  {where}"
+                )
+
+        if "memory" in Profiler.modes:
+            tracemalloc.stop()
+            assert Profiler.peak_phase is not None
+            name, _, before, after = Profiler.peak_phase
+            diffs = [
+                diff
+                for diff in after.compare_to(before, "lineno")
+                if diff.size_diff > 0
+            ]
+            lines += ["", f"Allocations growing the most while {name}:"]
+            for diff in diffs[: Constants.PROFILE_SUMMARY_SIZE]:
+                frame = diff.traceback[0]
+                lines.append(
+                    f"{Profiler.size(diff.size_diff):>12} "
+                    f"{diff.count_diff:>8} blocks  "
+                    f"{Path(frame.filename).name}:{frame.lineno}"
+                )
+
+        summary = "\n".join(lines) + "\n"
+        (Constants.PROFILE_DIR / "summary.txt").write_text(summary)
+        Profiler.reset()
+        return summary
+
+    @staticmethod
+    def reset() -> None:
+        """Forget all profiles and phases."""
+        with Profiler.lock:
+            Profiler.profiles = []
+        Profiler.phases = []
+        Profiler.current = None
+        Profiler.snapshot = None
+        Profiler.peak_phase = None
+
+    @staticmethod
+    def size(size: int) -> str:
+        """Return a number of bytes in KiB or MiB, for the summary."""
+        if abs(size) < 1024 * 1024:
+            return f"{size / 1024:.1f} KiB"
+        return f"{size / 1024 / 1024:.1f} MiB"
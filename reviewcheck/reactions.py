@@ -0,0 +1,182 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the ReactionResolver class."""
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from reviewcheck.constants import Constants
+from reviewcheck.exceptions import RCException
+from reviewcheck.merge_request import MergeRequest
+from reviewcheck.metrics import Metrics
+from reviewcheck.utils import Utils
+
+
+class ReactionResolver:
+    """Find out how the user has reacted to MRs without asking per MR.
+
+    The reactions of an MR are used for two things: deciding whether
+    the user has reacted without upvoting, which decides whether the
+    MR is shown, and listing who has reacted in the info box of MRs
+    that are shown. The first only needs the reactions of the user,
+    and GitLab can list the MRs the owner of the token has reacted to,
+    and those they have upvoted, in one request per project. So all
+    reactions are only downloaded for the MRs that are shown, and they
+    are stored until the number of upvotes or downvotes changes.
+
+    The token has to belong to the configured user for this to work,
+    see create().
+    """
+
+    def __init__(
+        self,
+        secret_token: str,
+        api_url: str,
+        cache: Optional[Dict[str, Any]] = None,
+    ):
+        """Initialize a ReactionResolver object.
+
+        :param secret_token: Token to access the GitLab API.
+        :param api_url: The URL of the GitLab API.
+        :param cache: The reactions downloaded on earlier runs, as
+            stored by save(). Empty if not given.
+        """
+        self.secret_token = secret_token
+        self.api_url = api_url
+        self.cache: Dict[str, Any] = {} if cache is None else cache
+        self.lock = threading.Lock()
+        self.reacted: Set[str] = set()
+        self.upvoted: Set[str] = set()
+
+    @staticmethod
+    def create(
+        config: Dict[str, Any],
+        projects: List[int],
+        cache: Optional[Dict[str, Any]] = None,
+    ) -> Optional["ReactionResolver"]:
+        """Create a ReactionResolver, if the token belongs to the user.
+
+        GitLab only tells which MRs the owner of the token has reacted
+        to, which is not the user when another one is given with
+        --user. The MRs the user has reacted to are listed for each
+        project.
+
+        :param config: The resolved configuration of reviewcheck.
+        :param projects: The IDs of the projects with open MRs.
+        :param cache: The reactions downloaded on earlier runs, shared
+            by the resolvers of all GitLab instances. Read from disk if
+            not given.
+
+        :return: The new ReactionResolver object, with the reactions
+            stored on disk, or None if it cannot be used.
+        """
+        api_url = config["api_url"] + "/api/v4"
+        if cache is None:
+            cache = ReactionResolver.read_cache()
+        resolver = ReactionResolver(config["secret_token"], api_url, cache)
+        try:
+            token_user = Utils.decode_page(
+                Utils.get_gitlab_page(config["secret_token"], f"{api_url}/user")
+            )
+            if (
+                not isinstance(token_user, dict)
+                or str(token_user.get("username", "")).upper() != config["user"]
+            ):
+                return None
+            for project in projects:
+                resolver.list_project(project)
+        except RCException:
+            return None
+        return resolver
+
+    @staticmethod
+    def read_cache() -> Dict[str, Any]:
+        """Return the reactions stored on disk, by the URL of the MR."""
+        stored = Utils.read_json(Constants.REACTIONS_PATH, {})
+        return stored if isinstance(stored, dict) else {}
+
+    def save(self, open_keys: Set[str]) -> None:
+        """Store the downloaded reactions on disk for the next run.
+
+        :param open_keys: The web URLs of all MRs that are still open.
+            The reactions of any other MR are dropped.
+        """
+        Utils.write_json(
+            Constants.REACTIONS_PATH,
+            {key: value for key, value in self.cache.items() if key in open_keys},
+        )
+
+    def list_project(self, project: int) -> None:
+        """Find the open MRs of a project the user has reacted to.
+
+        :param project: The ID of the project.
+        """
+        url = (
+            f"{self.api_url}/projects/{project}/merge_requests"
+            "?state=opened&per_page=100&my_reaction_emoji="
+        )
+        reacted = Utils.download_gitlab_data(self.secret_token, f"{url}Any")
+        self.reacted.update(mr["web_url"] for mr in reacted)
+        # The user cannot have upvoted without having reacted
+        if reacted:
+            self.upvoted.update(
+                mr["web_url"]
+                for mr in Utils.download_gitlab_data(
+                    self.secret_token, f"{url}thumbsup"
+                )
+            )
+
+    def resolve(
+        self,
+        merge_request: MergeRequest,
+        metadata: Dict[str, Any],
+        show_all_discussions: bool,
+    ) -> None:
+        """Set the reactions of an MR.
+
+        :param merge_request: The MR, created without reactions.
+        :param metadata: The MR as listed by GitLab.
+        :param show_all_discussions: Whether the user has asked to see
+            all threads they are involved in.
+
+        :raises RCException: Raised when the reactions of an MR that
+            is shown cannot be downloaded.
+        """
+        reacted = merge_request.web_url in self.reacted
+        upvoted = merge_request.web_url in self.upvoted
+        merge_request.user_reacted = reacted
+        merge_request.user_upvoted = upvoted
+        if merge_request.needs_attention(show_all_discussions):
+            merge_request.set_reactions(self.reactions(metadata))
+            # The lists are filtered by GitLab for the user of the
+            # token, so they decide rather than the usernames
+            merge_request.user_reacted = reacted
+            merge_request.user_upvoted = upvoted
+
+    def reactions(self, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Return all reactions on an MR.
+
+        The reactions are downloaded unless they are stored from an
+        earlier run and the votes of the MR have not changed since.
+
+        :param metadata: The MR as listed by GitLab.
+
+        :return: The reactions as returned by GitLab.
+        """
+        key = metadata["web_url"]
+        votes = [metadata.get("upvotes", 0), metadata.get("downvotes", 0)]
+        with self.lock:
+            entry = self.cache.get(key)
+        if isinstance(entry, dict) and entry.get("votes") == votes:
+            Metrics.count("reviewcheck_cache_hits_total", cache="reactions")
+            return list(entry["reactions"])
+        Metrics.count("reviewcheck_cache_misses_total", cache="reactions")
+
+        reactions = Utils.download_gitlab_data(
+            self.secret_token,
+            f"{self.api_url}/projects/{metadata['project_id']}/merge_requests/"
+            f"{metadata['iid']}/award_emoji?per_page=100",
+        )
+        with self.lock:
+            self.cache[key] = {"votes": votes, "reactions": reactions}
+        return reactions
@@ -0,0 +1,123 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Functions for generating machine-readable records of review info."""
+from typing import Any, Dict
+
+from reviewcheck.merge_request import MergeRequest
+
+
+class RecordGenerator:
+    """Static functions for generating JSON-serializable records.
+
+    The records contain the same information as the components created
+    by RichGenerator, but are meant to be consumed by other tools.
+    """
+
+    @staticmethod
+    def merge_request_record(mr: MergeRequest) -> Dict[str, Any]:
+        """Return a record with the review info of a merge request.
+
+        :param mr: Data for the merge request in question.
+
+        :return: The record for the merge request.
+        """
+        return {
+            "type": "merge_request",
+            "project_id": mr.project,
+            "iid": mr.id,
+            "title": mr.title,
+            "author": mr.mr_author,
+            "web_url": mr.web_url,
+            "source_branch": mr.source_branch,
+            "created_at": mr.creation_time,
+            "jira": mr.jira_ticket_number,
+            "upvotes": mr.upvotes,
+            "reactors": sorted(
+                set(
+                    person
+                    for people in mr.reaction_and_name.values()
+                    for person in people
+                )
+            ),
+            "is_author": mr.is_author,
+            "reacted_without_upvote": mr.user_reacted_but_no_upvote(),
+            "open_threads": mr.number_of_open_threads,
+            "open_threads_for_user": mr.number_of_open_threads_for_user,
+            "open_threads_needing_reply": mr.number_of_open_threads_needing_user_reply,
+            "stale_since": mr.stale_since,
+            "resolved_threads": sorted(
+                thread_id
+                for thread_id, change in mr.thread_changes.items()
+                if change == "resolved"
+            ),
+        }
+
+    @staticmethod
+    def missing_record(metadata: Dict[str, Any], reason: str) -> Dict[str, Any]:
+        """Return a record for a merge request that was not downloaded.
+
+        :param metadata: The merge request as listed by GitLab.
+        :param reason: Why the merge request was not downloaded.
+
+        :return: The record for the merge request.
+        """
+        return {
+            "type": "missing",
+            "project_id": metadata["project_id"],
+            "iid": metadata["iid"],
+            "title": metadata["title"],
+            "web_url": metadata["web_url"],
+            "reason": reason,
+        }
+
+    @staticmethod
+    def unlisted_record(
+        host: str, kind: str, unlisted_id: Any, reason: str
+    ) -> Dict[str, Any]:
+        """Return a record for a project or group that was not listed.
+
+        :param host: The host of the GitLab instance.
+        :param kind: Either project or group.
+        :param unlisted_id: The ID of the project or group.
+        :param reason: Why it was not listed.
+
+        :return: The record for the project or group.
+        """
+        return {
+            "type": "unlisted",
+            "host": host,
+            "kind": kind,
+            "id": unlisted_id,
+            "reason": reason,
+        }
+
+    @staticmethod
+    def thread_record(mr: MergeRequest, thread: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a record with the messages of a thread.
+
+        :param mr: The merge request the thread belongs to.
+        :param thread: The thread in question.
+
+        :return: The record for the thread.
+        """
+        return {
+            "type": "thread",
+            "project_id": mr.project,
+            "iid": mr.id,
+            "id": thread["id"],
+            "web_url": f"{mr.web_url}#note_{thread['notes'][0]['id']}",
+            "needs_reply": mr.thread_needs_reply(thread),
+            "change": mr.thread_changes.get(str(thread["id"])),
+            "notes": [
+                {
+                    "id": note["id"],
+                    "author": note["author"]["username"],
+                    "author_name": note["author"]["name"],
+                    "updated_at": note["updated_at"],
+                    "body": note["body"],
+                    "change": mr.note_changes.get(str(note["id"])),
+                }
+                for note in thread["notes"]
+            ],
+        }
@@ -6,6 +6,7 @@ from typing import Any, Dict, List, Optional
 
 from rich import box
 from rich.table import Table
+from rich.text import Text
 
 from reviewcheck.constants import Constants
 from reviewcheck.merge_request import MergeRequest
@@ -68,7 +69,9 @@ class RichGenerator:
         """
         n_replies = len(comment["notes"])
         notes = comment["notes"]
-        author_list = [n["author"]["username"] for n in notes]
+        # Without regard to case, like in MergeRequest.is_user()
+        username = username.casefold()
+        author_list = [n["author"]["username"].casefold() for n in notes]
         if not needs_reply:
             return [""] * (n_replies)
         elif username not in author_list:
@@ -100,8 +103,32 @@ class RichGenerator:
         if mr.jira_ticket_number:
             title_elements.append(mr.jira_ticket_number)
 
+        if mr.stale_since:
+            title_elements.append(
+                f"[bold red]stale, downloaded {Utils.convert_time(mr.stale_since)}"
+            )
+
         return " | ".join(title_elements)
 
+    @staticmethod
+    def summary_line(mr: MergeRequest, color: str) -> Text:
+        """Return a single line about an MR, shown when it is collapsed.
+
+        :param mr: Data about the mr to summarize.
+        :param color: Color to use for the title when printing.
+
+        :return: The title of the info box, followed by the number of
+            open discussions that need a response.
+        """
+        line = Text.from_markup(
+            f"{RichGenerator.info_box_title(mr, color)}[/] | "
+            f"{mr.number_of_open_threads_needing_user_reply} of "
+            f"{mr.number_of_open_threads} open discussions need your response",
+            overflow="ellipsis",
+        )
+        line.no_wrap = True
+        return line
+
     @staticmethod
     def info_box_content(
         mr: MergeRequest,
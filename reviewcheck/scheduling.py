@@ -0,0 +1,120 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the Scheduler class for ordering MR downloads."""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from reviewcheck.constants import Constants
+from reviewcheck.exceptions import RCException
+from reviewcheck.utils import Utils
+
+
+class Scheduler:
+    """Static functions for deciding in which order MRs are fetched.
+
+    The order is decided using only the metadata that is returned when
+    listing the merge requests of a project, so that the MRs most
+    likely to need a reply from the user can be downloaded, and thereby
+    shown, first.
+    """
+
+    @staticmethod
+    def priority(
+        metadata: Dict[str, Any],
+        user: str,
+        now: Optional[datetime] = None,
+    ) -> int:
+        """Return the fetch priority of an MR, higher is more urgent.
+
+        :param metadata: The data for the MR as returned when listing
+            merge requests.
+        :param user: The username of the configured user.
+        :param now: The time to compare the update time of the MR to.
+            Defaults to the current time.
+
+        :return: The priority of the MR.
+        """
+        # Usernames are compared without regard to case, like in
+        # MergeRequest.is_user()
+        user = user.casefold()
+
+        def involves_user(people: Optional[List[Dict[str, Any]]]) -> bool:
+            return any(person["username"].casefold() == user for person in people or [])
+
+        priority = 0
+        author = metadata.get("author") or {}
+        if author.get("username", "").casefold() == user:
+            priority += Constants.PRIORITY_AUTHOR
+        if involves_user(metadata.get("reviewers")):
+            priority += Constants.PRIORITY_REVIEWER
+        if involves_user(metadata.get("assignees")):
+            priority += Constants.PRIORITY_ASSIGNEE
+
+        if now is None:
+            now = datetime.now(timezone.utc)
+        updated_at = Scheduler._updated_at(metadata)
+        if updated_at is not None and now - updated_at < timedelta(
+            hours=Constants.PRIORITY_RECENT_HOURS
+        ):
+            priority += Constants.PRIORITY_RECENTLY_UPDATED
+
+        return priority
+
+    @staticmethod
+    def order(
+        mr_pages: List[Dict[str, Any]],
+        user: str,
+    ) -> List[Dict[str, Any]]:
+        """Sort MRs so that the most urgent ones are fetched first.
+
+        MRs with the same priority are sorted with the most recently
+        updated first. The sort is stable, so MRs that are equal in
+        both regards keep the order they were listed in.
+
+        :param mr_pages: The MRs as returned when listing merge
+            requests.
+        :param user: The username of the configured user.
+
+        :return: A new list with the MRs in the order to fetch them.
+        """
+        return Scheduler.merge([(mr_pages, user)])
+
+    @staticmethod
+    def merge(
+        listings: List[Tuple[List[Dict[str, Any]], str]],
+    ) -> List[Dict[str, Any]]:
+        """Sort the MRs of several GitLab instances, like order().
+
+        :param listings: The MRs listed on each instance, and the
+            username of the user on that instance.
+
+        :return: A new list with the MRs in the order to fetch them.
+        """
+        now = datetime.now(timezone.utc)
+
+        def sort_key(metadata: Dict[str, Any], user: str) -> Tuple[int, float]:
+            updated_at = Scheduler._updated_at(metadata)
+            timestamp = updated_at.timestamp() if updated_at else 0.0
+            return (-Scheduler.priority(metadata, user, now), -timestamp)
+
+        keyed = [
+            (sort_key(metadata, user), metadata)
+            for mr_pages, user in listings
+            for metadata in mr_pages
+        ]
+        keyed.sort(key=lambda item: item[0])
+        return [metadata for _, metadata in keyed]
+
+    @staticmethod
+    def _updated_at(metadata: Dict[str, Any]) -> Optional[datetime]:
+        """Return the time the MR was last updated, if known."""
+        if not metadata.get("updated_at"):
+            return None
+        try:
+            updated_at = Utils.parse_time(metadata["updated_at"])
+        except RCException:
+            return None
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        return updated_at
@@ -0,0 +1,336 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the SearchIndex class for searching old notes."""
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from reviewcheck.constants import Constants
+from reviewcheck.exceptions import RCException
+
+
+class SearchIndex:
+    """A full-text index of the notes downloaded from GitLab.
+
+    The notes of each downloaded MR are added to an SQLite FTS5 index,
+    see add(), so that they can be searched later without asking GitLab,
+    see search(). Only the notes that are new or were updated since
+    they were added are written again, and notes that were deleted are
+    removed. The notes of MRs that are closed are kept, so that review
+    comments can still be found once the MR has been merged, until the
+    MR has not been seen open for a number of days, see prune().
+
+    The index is written from the threads downloading MRs, and can be
+    searched while another reviewcheck writes to it. When the index
+    cannot be opened, like when SQLite is built without FTS5, or is
+    turned off, nothing is added to it and searching raises an
+    RCException.
+    """
+
+    # Bumped when the tables change, which makes the index start over
+    SCHEMA_VERSION = 2
+    SCHEMA = (
+        """
+        CREATE TABLE merge_requests (
+            mr_url TEXT PRIMARY KEY,
+            seen_at REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE notes (
+            id INTEGER PRIMARY KEY,
+            mr_url TEXT NOT NULL,
+            mr_title TEXT NOT NULL,
+            thread_id TEXT NOT NULL,
+            note_id INTEGER NOT NULL,
+            author TEXT NOT NULL,
+            author_name TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            body TEXT NOT NULL,
+            UNIQUE (mr_url, note_id)
+        )
+        """,
+        """
+        CREATE VIRTUAL TABLE notes_fts USING fts5(
+            body, author, mr_title, content='notes', content_rowid='id'
+        )
+        """,
+        """
+        CREATE TRIGGER notes_insert AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts (rowid, body, author, mr_title)
+            VALUES (new.id, new.body, new.author, new.mr_title);
+        END
+        """,
+        """
+        CREATE TRIGGER notes_delete AFTER DELETE ON notes BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, body, author, mr_title)
+            VALUES ('delete', old.id, old.body, old.author, old.mr_title);
+        END
+        """,
+        """
+        CREATE TRIGGER notes_update AFTER UPDATE ON notes BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, body, author, mr_title)
+            VALUES ('delete', old.id, old.body, old.author, old.mr_title);
+            INSERT INTO notes_fts (rowid, body, author, mr_title)
+            VALUES (new.id, new.body, new.author, new.mr_title);
+        END
+        """,
+    )
+    # The start and end of each match in the snippets of search()
+    MARKS = ("\x02", "\x03")
+
+    def __init__(self, path: Optional[Path] = None, enabled: bool = True):
+        """Initialize a SearchIndex object, opening the index.
+
+        :param path: The file of the index. Defaults to
+            Constants.SEARCH_INDEX_PATH.
+        :param enabled: Whether to open the index. If not, nothing is
+            added to it, like when it cannot be opened.
+        """
+        self.path = Constants.SEARCH_INDEX_PATH if path is None else path
+        self.lock = threading.Lock()
+        self.connection: Optional[sqlite3.Connection] = None
+        self.error: Optional[str] = None
+        if not enabled:
+            self.error = "the search index is turned off"
+            return
+        try:
+            self.connection = SearchIndex.connect(self.path)
+        except sqlite3.Error as e:
+            logging.warning("could not open the search index %s: %s", self.path, e)
+            self.error = str(e)
+
+    @staticmethod
+    def connect(path: Path) -> sqlite3.Connection:
+        """Open the index, creating its tables if needed.
+
+        :param path: The file of the index.
+
+        :return: The connection, usable from any thread.
+        """
+        connection = sqlite3.connect(
+            path, timeout=Constants.REQUEST_TIMEOUT, check_same_thread=False
+        )
+        try:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            (version,) = connection.execute("PRAGMA user_version").fetchone()
+            if version != SearchIndex.SCHEMA_VERSION:
+                with connection:
+                    connection.execute("DROP TABLE IF EXISTS notes_fts")
+                    connection.execute("DROP TABLE IF EXISTS notes")
+                    connection.execute("DROP TABLE IF EXISTS merge_requests")
+                    for statement in SearchIndex.SCHEMA:
+                        connection.execute(statement)
+                    connection.execute(
+                        f"PRAGMA user_version = {SearchIndex.SCHEMA_VERSION}"
+                    )
+        except sqlite3.Error:
+            connection.close()
+            raise
+        return connection
+
+    def __enter__(self) -> "SearchIndex":
+        """Return the SearchIndex."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Close the index."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def add(self, metadata: Dict[str, Any], threads: Optional[Any]) -> None:
+        """Add the notes of a downloaded MR to the index.
+
+        System notes, like those about new commits, are left out.
+
+        :param metadata: The MR as listed by GitLab.
+        :param threads: The threads of the MR, or None if they were not
+            downloaded, in which case the notes added before are kept.
+        """
+        if self.connection is None or threads is None:
+            return
+        mr_url = metadata["web_url"]
+        mr_title = metadata["title"]
+        notes = {
+            note["id"]: (
+                mr_url,
+                mr_title,
+                str(thread["id"]),
+                note["id"],
+                note["author"]["username"],
+                note["author"]["name"],
+                note["created_at"],
+                note["updated_at"],
+                note["body"],
+            )
+            for thread in threads
+            for note in thread["notes"]
+            if not note.get("system")
+        }
+        try:
+            with self.lock, self.connection:
+                # When the MR is seen is updated by prune()
+                self.connection.execute(
+                    "INSERT INTO merge_requests (mr_url, seen_at) VALUES (?, ?) "
+                    "ON CONFLICT (mr_url) DO NOTHING",
+                    (mr_url, time.time()),
+                )
+                stored = {
+                    note_id: (updated_at, title)
+                    for note_id, updated_at, title in self.connection.execute(
+                        "SELECT note_id, updated_at, mr_title FROM notes "
+                        "WHERE mr_url = ?",
+                        (mr_url,),
+                    )
+                }
+                self.connection.executemany(
+                    "INSERT INTO notes (mr_url, mr_title, thread_id, note_id, "
+                    "author, author_name, created_at, updated_at, body) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (mr_url, note_id) DO UPDATE SET "
+                    "mr_title = excluded.mr_title, thread_id = excluded.thread_id, "
+                    "updated_at = excluded.updated_at, body = excluded.body",
+                    [
+                        row
+                        for note_id, row in notes.items()
+                        if stored.get(note_id) != (row[7], mr_title)
+                    ],
+                )
+                self.connection.executemany(
+                    "DELETE FROM notes WHERE mr_url = ? AND note_id = ?",
+                    [(mr_url, note_id) for note_id in stored if note_id not in notes],
+                )
+        except sqlite3.Error as e:
+            logging.warning("could not index the notes of %s: %s", mr_url, e)
+
+    def prune(
+        self,
+        open_urls: Iterable[str],
+        retention_days: float,
+        now: Optional[float] = None,
+    ) -> None:
+        """Remove the notes of MRs that have not been seen for a while.
+
+        :param open_urls: The web URLs of the MRs that are open, which
+            are seen now.
+        :param retention_days: The number of days to keep the notes of
+            an MR after it was last seen open or downloaded.
+        :param now: The time to compare to, as a Unix timestamp.
+            Defaults to the current time.
+        """
+        if self.connection is None:
+            return
+        if now is None:
+            now = time.time()
+        cutoff = now - retention_days * 24 * 60 * 60
+        try:
+            with self.lock, self.connection:
+                self.connection.executemany(
+                    "INSERT INTO merge_requests (mr_url, seen_at) VALUES (?, ?) "
+                    "ON CONFLICT (mr_url) DO UPDATE SET seen_at = excluded.seen_at",
+                    [(url, now) for url in open_urls],
+                )
+                self.connection.execute(
+                    "DELETE FROM notes WHERE mr_url IN "
+                    "(SELECT mr_url FROM merge_requests WHERE seen_at < ?)",
+                    (cutoff,),
+                )
+                self.connection.execute(
+                    "DELETE FROM merge_requests WHERE seen_at < ?", (cutoff,)
+                )
+        except sqlite3.Error as e:
+            logging.warning("could not prune the search index: %s", e)
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Return the threads with notes matching a query, best first.
+
+        :param query: What to search for, in the FTS5 query syntax. If
+            it is not a valid query, its words are searched for instead.
+        :param limit: The maximum number of threads to return.
+
+        :raises RCException: Raised when the index could not be opened
+            or the query has no words.
+
+        :return: For each thread, the URL and title of its MR, and the
+            matching notes with a snippet around each match, see MARKS.
+        """
+        if self.connection is None:
+            raise RCException(f"Could not open the search index: {self.error}")
+        words = " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+        try:
+            rows = self.matches(query, limit)
+        except sqlite3.OperationalError:
+            if not words:
+                raise RCException("Nothing to search for")
+            rows = self.matches(words, limit)
+
+        threads: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for row in rows:
+            mr_url, mr_title, thread_id, note_id, author, updated_at, snippet = row
+            thread = threads.get((mr_url, thread_id))
+            if thread is None:
+                thread = threads[mr_url, thread_id] = {
+                    "merge_request": mr_title,
+                    "web_url": mr_url,
+                    "notes": [],
+                }
+            thread["notes"].append(
+                {
+                    "author": author,
+                    "updated_at": updated_at,
+                    "snippet": snippet,
+                    "link": f"{mr_url}#note_{note_id}",
+                }
+            )
+        return list(threads.values())
+
+    def matches(self, query: str, limit: int) -> List[Any]:
+        """Return the notes matching an FTS5 query in the best threads.
+
+        The threads are ranked by their best matching note, and only
+        the notes of the best threads are returned, so that snippets
+        are made for those notes alone.
+
+        :param query: The query.
+        :param limit: The maximum number of threads.
+
+        :return: The MR URL and title, thread ID, note ID, author name,
+            update time and a snippet of each note, by thread, best
+            first.
+        """
+        assert self.connection is not None
+        with self.lock:
+            return self.connection.execute(
+                "WITH best AS ("
+                "SELECT notes.mr_url, notes.thread_id, MIN(notes_fts.rank) AS rank "
+                "FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid "
+                "WHERE notes_fts MATCH ? "
+                "GROUP BY notes.mr_url, notes.thread_id ORDER BY rank LIMIT ?) "
+                "SELECT notes.mr_url, notes.mr_title, notes.thread_id, "
+                "notes.note_id, notes.author_name, notes.updated_at, "
+                "snippet(notes_fts, -1, ?, ?, '...', ?) "
+                "FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid "
+                "JOIN best ON best.mr_url = notes.mr_url "
+                "AND best.thread_id = notes.thread_id "
+                "WHERE notes_fts MATCH ? ORDER BY best.rank, notes_fts.rank",
+                (
+                    query,
+                    limit,
+                    *SearchIndex.MARKS,
+                    Constants.SEARCH_SNIPPET_TOKENS,
+                    query,
+                ),
+            ).fetchall()
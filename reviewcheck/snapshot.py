@@ -0,0 +1,144 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""File containing the Snapshot class for showing the last result."""
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from rich.console import RenderableType
+from rich.progress import Progress
+from rich.text import Text
+
+from reviewcheck import __version__
+from reviewcheck.constants import Constants
+from reviewcheck.merge_request import MergeRequest
+from reviewcheck.rich_components import RichGenerator
+from reviewcheck.utils import Utils
+
+
+class Snapshot:
+    """The MRs that needed attention on the last run.
+
+    They are shown as soon as reviewcheck starts, marked with their
+    age, and replaced by the fresh result as it is downloaded. This is
+    usually accurate, since little changes between two runs.
+    """
+
+    def __init__(self, taken_at: float, merge_requests: List[MergeRequest]):
+        """Initialize a Snapshot object.
+
+        :param taken_at: The time the snapshot was taken, in seconds
+            since the epoch.
+        :param merge_requests: The MRs, in the order they were shown.
+        """
+        self.taken_at = taken_at
+        self.merge_requests = merge_requests
+
+    @staticmethod
+    def load(user: str) -> Optional["Snapshot"]:
+        """Read the snapshot taken on the last run.
+
+        :param user: The username of the configured user.
+
+        :return: The snapshot, or None if there is none for the user or
+            it was taken by another version of reviewcheck.
+        """
+        stored = Utils.read_json(Constants.SNAPSHOT_PATH, None)
+        if (
+            not isinstance(stored, dict)
+            or stored.get("user") != user
+            or stored.get("version") != __version__
+        ):
+            return None
+        return Snapshot(
+            stored["taken_at"],
+            [MergeRequest.from_state(state) for state in stored["merge_requests"]],
+        )
+
+    @staticmethod
+    def save(user: str, merge_requests: Iterable[MergeRequest]) -> None:
+        """Take a snapshot of the MRs shown on this run.
+
+        :param user: The username of the configured user.
+        :param merge_requests: The MRs that need attention, in order.
+        """
+        Utils.write_json(
+            Constants.SNAPSHOT_PATH,
+            {
+                "user": user,
+                "version": __version__,
+                "taken_at": time.time(),
+                "merge_requests": [mr.__getstate__() for mr in merge_requests],
+            },
+        )
+
+    def age(self) -> str:
+        """Return when the snapshot was taken, for showing to the user.
+
+        :return: The date and time, and how long ago that was.
+        """
+        minutes = int(time.time() - self.taken_at) // 60
+        for unit, length in (("day", 24 * 60), ("hour", 60), ("minute", 1)):
+            if minutes >= length:
+                count = minutes // length
+                ago = f"{count} {unit}{'s' if count > 1 else ''} ago"
+                break
+        else:
+            ago = "less than a minute ago"
+        taken_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.taken_at))
+        return f"{taken_at}, {ago}"
+
+
+class SnapshotProgress(Progress):
+    """A progress bar with a summary of the last result above it.
+
+    The summary of each MR is removed when the fresh version of the MR
+    is presented, and the rest when the progress bar is done.
+    """
+
+    def __init__(
+        self,
+        snapshot: Optional[Snapshot],
+        config: Dict[str, Any],
+        **kwargs: Any,
+    ):
+        """Initialize a SnapshotProgress object.
+
+        :param snapshot: The snapshot to summarize, if any.
+        :param config: The resolved configuration of reviewcheck.
+        :param kwargs: The arguments for Progress.
+        """
+        # Progress renders itself while it is initialized, before the
+        # summaries can be shown
+        self.header = Text()
+        self.summaries: Dict[str, RenderableType] = {}
+        super().__init__(**kwargs)
+        if snapshot is not None:
+            self.header = Text(
+                f"Status as of {snapshot.age()}, refreshing:", style="bold"
+            )
+            for mr in snapshot.merge_requests:
+                if mr.needs_attention(config["show_all_discussions"]):
+                    self.summaries[mr.web_url] = RichGenerator.summary_line(
+                        mr, Constants.COLORS[mr.id % len(Constants.COLORS)]
+                    )
+
+    def forget(self, key: str) -> None:
+        """Remove the summary of an MR that has been presented again.
+
+        :param key: The web URL of the MR.
+        """
+        with self._lock:
+            self.summaries.pop(key, None)
+
+    def get_renderables(self) -> Iterable[RenderableType]:
+        """Yield the summaries that fit on screen, then the progress."""
+        with self._lock:
+            summaries = list(self.summaries.values())
+        if summaries:
+            room = max(self.console.height - 3, 1)
+            yield self.header
+            yield from summaries[:room]
+            if len(summaries) > room:
+                yield Text(f"and {len(summaries) - room} more", style="dim")
+        yield from super().get_renderables()
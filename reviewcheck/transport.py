@@ -0,0 +1,206 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Backends for sending HTTP requests to GitLab."""
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Mapping, Optional
+
+import requests
+from requests.exceptions import RequestException
+from urllib3.util.retry import Retry
+
+from reviewcheck.constants import Constants
+from reviewcheck.exceptions import RCException, TransportError
+from reviewcheck.metrics import Metrics
+
+
+class TransportResponse:
+    """The parts of an HTTP response that reviewcheck uses."""
+
+    def __init__(
+        self,
+        url: str,
+        status_code: int,
+        headers: Mapping[str, str],
+        content: bytes,
+        elapsed: float,
+    ):
+        """Initialize a TransportResponse object.
+
+        :param url: The URL the response came from.
+        :param status_code: The HTTP status code.
+        :param headers: The response headers, with case-insensitive
+            names.
+        :param content: The response body.
+        :param elapsed: The number of seconds the request took.
+        """
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.elapsed = elapsed
+
+
+class Transport(ABC):
+    """Base class for the backends used to send requests to GitLab.
+
+    A transport is shared by all threads downloading data, and keeps a
+    pool of connections that are reused between requests.
+    """
+
+    NAMES = ["requests", "http2"]
+
+    @staticmethod
+    def create(name: str) -> "Transport":
+        """Create the transport with the given name.
+
+        :param name: One of the names in NAMES.
+
+        :raises RCException: Raised when the name is unknown.
+
+        :return: The new transport.
+        """
+        if name == "requests":
+            return RequestsTransport()
+        if name == "http2":
+            return Http2Transport()
+        raise RCException(
+            f"Unknown transport '{name}', must be one of {', '.join(Transport.NAMES)}"
+        )
+
+    @abstractmethod
+    def get(
+        self, url: str, headers: Dict[str, str], timeout: Optional[float] = None
+    ) -> TransportResponse:
+        """Send a GET request.
+
+        :param url: The URL to request.
+        :param headers: The headers to send.
+        :param timeout: The number of seconds to wait for the server to
+            answer, or None to wait forever.
+
+        :raises TransportError: Raised when no response was received.
+
+        :return: The response, whatever its status code.
+        """
+
+    def close(self) -> None:
+        """Close all connections."""
+
+
+class RequestsTransport(Transport):
+    """Send requests over HTTP/1.1 with the requests library.
+
+    Each concurrent request needs a connection of its own, so the pool
+    holds as many connections as there are download threads, and room
+    for the duplicates of slow requests sent by the Hedger.
+    """
+
+    def __init__(self) -> None:
+        """Initialize a RequestsTransport object."""
+        # This is how to create a reusable connection pool with python
+        # requests.
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_maxsize=Constants.THREADPOOL_MAXSIZE + Constants.HEDGE_MAX_IN_FLIGHT,
+            # Failed connections are retried, but not reads that time
+            # out, since each retry would wait for the full timeout
+            # again. Slow reads are sent again by the Hedger instead.
+            max_retries=Retry(total=3, read=0),
+            pool_block=True,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(
+        self, url: str, headers: Dict[str, str], timeout: Optional[float] = None
+    ) -> TransportResponse:
+        """Send a GET request, as described in the Transport class."""
+        try:
+            response = self.session.get(url, headers=headers, timeout=timeout)
+        except RequestException as e:
+            raise TransportError(
+                f"There was an issue connecting to GitLab. Failed GET {url}: {e}"
+            )
+        return TransportResponse(
+            response.url,
+            response.status_code,
+            response.headers,
+            response.content,
+            response.elapsed.total_seconds(),
+        )
+
+    def close(self) -> None:
+        """Close all connections."""
+        self.session.close()
+
+
+class Http2Transport(Transport):
+    """Send requests over HTTP/2 with the httpx library.
+
+    HTTP/2 multiplexes many concurrent requests as streams over a
+    single connection, so only a few connections are opened no matter
+    how many threads are downloading. This requires httpx with HTTP/2
+    support, which is not installed with reviewcheck. Servers that
+    don't support HTTP/2 are talked to over HTTP/1.1.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an Http2Transport object.
+
+        :raises RCException: Raised when httpx is not installed.
+        """
+        try:
+            import httpx
+        except ImportError:
+            raise RCException(
+                "The http2 transport requires httpx, install it with "
+                "`pip install reviewcheck[http2]`"
+            )
+
+        self.httpx: Any = httpx
+        self.client = httpx.Client(
+            transport=httpx.HTTPTransport(
+                http2=True,
+                retries=3,
+                limits=httpx.Limits(
+                    max_connections=Constants.HTTP2_MAX_CONNECTIONS,
+                    max_keepalive_connections=Constants.HTTP2_MAX_CONNECTIONS,
+                ),
+            ),
+        )
+
+    def get(
+        self, url: str, headers: Dict[str, str], timeout: Optional[float] = None
+    ) -> TransportResponse:
+        """Send a GET request, as described in the Transport class."""
+        for attempt in range(Constants.HTTP2_GOAWAY_RETRIES + 1):
+            try:
+                response = self.client.get(url, headers=headers, timeout=timeout)
+                break
+            except self.httpx.RemoteProtocolError as e:
+                # Servers close HTTP/2 connections after a number of
+                # requests, and streams still in flight then fail
+                # without having been processed. They are safe to send
+                # again, on a new connection.
+                if attempt == Constants.HTTP2_GOAWAY_RETRIES:
+                    raise TransportError(
+                        "There was an issue connecting to GitLab. "
+                        f"Failed GET {url}: {e}"
+                    )
+                Metrics.count("reviewcheck_retries_total", reason="goaway")
+            except self.httpx.HTTPError as e:
+                raise TransportError(
+                    f"There was an issue connecting to GitLab. Failed GET {url}: {e}"
+                )
+        return TransportResponse(
+            str(response.url),
+            response.status_code,
+            response.headers,
+            response.content,
+            response.elapsed.total_seconds(),
+        )
+
+    def close(self) -> None:
+        """Close all connections."""
+        self.client.close()
@@ -4,42 +4,72 @@
 """File containing utility functions."""
 import json
 import logging
+import os
+import threading
 import time
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
-
-import requests
-from requests.exceptions import HTTPError, RequestException
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
 
+from reviewcheck.concurrency import ConcurrencyLimiter
 from reviewcheck.constants import Constants
-from reviewcheck.exceptions import RCException
+from reviewcheck.exceptions import DeadlineExceeded, RCException, TransportError
+from reviewcheck.hedging import Hedger
+from reviewcheck.metrics import Metrics
+from reviewcheck.transport import Transport, TransportResponse
 
 
 class Utils:
     """Class that contains utility functions for reviewcheck."""
 
+    # The transport for hosts without one of their own, and the
+    # transport, hedger and limiter of each GitLab host, so that every
+    # instance has its own connection pool and request budget
+    transport: Optional[Transport] = None
+    transports: Dict[str, Transport] = {}
+    hedgers: Dict[str, Hedger] = {}
+    limiters: Dict[str, ConcurrencyLimiter] = {}
+    transport_lock = threading.Lock()
+    # The number of seconds to wait for each request, and the time on
+    # the monotonic clock when the current run has to be done, if any
+    request_timeout: float = Constants.REQUEST_TIMEOUT
+    deadline: Optional[float] = None
+
     @staticmethod
-    def convert_time(timestamp: str) -> str:
-        """Convert GitLab timestamps to human-readable timestamps.
+    def parse_time(timestamp: str) -> datetime:
+        """Parse a timestamp in the format that GitLab uses.
 
-        Convert timestamps from the format that GitLab uses to a human
-        readable one like so:
+        :param timestamp: The timestamp as given by the GitLab API.
 
-            <date> <short month> <hour><minute>
+        :raises RCException: Raised when the timestamp cannot be parsed.
+
+        :return: The timestamp as a datetime object.
         """
         try:
-            time = datetime.strptime(
+            return datetime.strptime(
                 timestamp,
                 "%Y-%m-%dT%H:%M:%S.%f%z",
             )
         except ValueError:
             try:
-                time = datetime.strptime(
+                return datetime.strptime(
                     timestamp[0:-6],
                     "%Y-%m-%dT%H:%M:%S.%f",
                 )
             except ValueError:
                 raise RCException(f"Couldn't parse GitLab timestamp '{timestamp}'")
+
+    @staticmethod
+    def convert_time(timestamp: str) -> str:
+        """Convert GitLab timestamps to human-readable timestamps.
+
+        Convert timestamps from the format that GitLab uses to a human
+        readable one like so:
+
+            <date> <short month> <hour><minute>
+        """
+        time = Utils.parse_time(timestamp)
         human_readable_time = datetime.strftime(
             time,
             "%d %b %H:%M",
@@ -48,22 +78,57 @@ class Utils:
 
     @staticmethod
     def download_data(
-        params: Tuple[str, str, Optional[str], Any]
+        params: Tuple[str, Optional[str], Optional[str], Any]
     ) -> Tuple[Any, Any, Any]:
         """Download data for MR, and for reaction if requested.
 
         This function just calls download_gitlab_data() twice. The point
         of this is that it makes it possible to download both reaction
         data and merge request data in the same loop in a multithreading
-        executor.
+        executor. Data that is not requested is returned as None.
         """
         token, mr_url, reaction_url, metadata = params
-        reaction_response = []
+        reaction_response = None
         if reaction_url:
             reaction_response = Utils.download_gitlab_data(token, reaction_url)
-        mr_response = Utils.download_gitlab_data(token, mr_url)
+        mr_response = None
+        if mr_url:
+            mr_response = Utils.download_gitlab_data(token, mr_url)
         return mr_response, reaction_response, metadata
 
+    @staticmethod
+    def read_json(path: Path, default: Any) -> Any:
+        """Read data stored as JSON in the reviewcheck data directory.
+
+        :param path: The file to read.
+        :param default: The value to return if the file does not exist
+            or cannot be parsed.
+
+        :return: The data in the file, or the default value.
+        """
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return default
+
+    @staticmethod
+    def write_json(path: Path, data: Any) -> None:
+        """Store data as JSON in the reviewcheck data directory.
+
+        The data is first written to a temporary file which then
+        replaces the old file, so that an interrupted run never leaves
+        a half-written file behind.
+
+        :param path: The file to write.
+        :param data: The data to store.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_name(f"{path.name}.tmp")
+        with open(temporary_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temporary_path, path)
+
     @staticmethod
     def download_gitlab_data(
         secret_token: str,
@@ -79,75 +144,235 @@ class Utils:
         :param url: URLs to download data from.
         :return: All data for the MR as a list.
         """
-        # This is how to create a reusable connection pool with python
-        # requests.
-
-        with requests.Session() as session:
-            session.mount(
-                "https://",
-                requests.adapters.HTTPAdapter(
-                    pool_maxsize=Constants.THREADPOOL_MAXSIZE,
-                    max_retries=3,
-                    pool_block=True,
-                ),
+        response_json: List[Dict[str, Any]] = []
+        for page in Utils.download_gitlab_pages(secret_token, url):
+            response_json += page
+        return response_json
+
+    @staticmethod
+    def download_gitlab_pages(
+        secret_token: str,
+        url: str,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Download the pages of data for a given URL one at a time.
+
+        Each page is downloaded only when the previous one has been
+        consumed, so the caller can stop early when the rest of the
+        pages are not needed.
+
+        :param secret_token: Token to access the GitLab API.
+        :param url: URLs to download data from.
+        :return: An iterator over the data of each page.
+        """
+        response = Utils.get_gitlab_page(secret_token, url)
+        yield Utils.check_page(Utils.decode_page(response))
+
+        num_pages = int(response.headers.get("X-Total-Pages", 1))
+        for page in range(2, num_pages + 1):
+            response = Utils.get_gitlab_page(secret_token, f"{url}&page={page}")
+            yield Utils.check_page(Utils.decode_page(response))
+
+    @staticmethod
+    def get_gitlab_page(secret_token: str, url: str) -> TransportResponse:
+        """Download one page of data with the configured transport.
+
+        :param secret_token: Token to access the GitLab API.
+        :param url: URL of the page to download.
+
+        :raises RCException: Raised when GitLab does not respond with a
+            successful status code.
+        :raises DeadlineExceeded: Raised when the deadline has passed.
+
+        :return: The response from GitLab.
+        """
+        Utils.time_left()
+        host = urlsplit(url).netloc
+        transport = Utils.get_transport(host)
+        limiter = Utils.get_limiter(host)
+        with Utils.transport_lock:
+            if host not in Utils.hedgers:
+                Utils.hedgers[host] = Hedger()
+            hedger = Utils.hedgers[host]
+
+        def send() -> TransportResponse:
+            # The time left is counted from when the request may be sent
+            timeout = Utils.time_left()
+            return transport.get(url, {"PRIVATE-TOKEN": secret_token}, timeout)
+
+        def status(response: TransportResponse) -> int:
+            return response.status_code
+
+        endpoint = Metrics.endpoint(url)
+        start = time.monotonic()
+        try:
+            # The request waits for the limiter before the hedger starts
+            # timing it, and a duplicate is only sent if the limit
+            # allows it right away. Each holds its place in the limit
+            # until done, even after losing to the other.
+            reserved = limiter.reserve(send, status)
+            assert reserved is not None
+            response = hedger.call(
+                reserved, lambda: limiter.reserve(send, status, blocking=False)
             )
-            response = session.get(url, headers={"PRIVATE-TOKEN": secret_token})
-            response_json = json.loads(response.content)
-            logging.info(
-                "request was completed in %s seconds [%s]",
-                response.elapsed.total_seconds(),
+        except TransportError:
+            Metrics.count("reviewcheck_requests_total", endpoint=endpoint, code="error")
+            raise
+        Metrics.count(
+            "reviewcheck_requests_total",
+            endpoint=endpoint,
+            code=str(response.status_code),
+        )
+        Metrics.observe(
+            "reviewcheck_request_duration_seconds",
+            time.monotonic() - start,
+            endpoint=endpoint,
+        )
+        logging.info(
+            "request was completed in %s seconds [%s]",
+            response.elapsed,
+            response.url,
+        )
+        if not 200 <= response.status_code < 300:
+            logging.error(
+                "request failed, error code %s [%s]",
+                response.status_code,
                 response.url,
             )
-            if response.status_code != 200:
-                logging.error(
-                    "request failed, error code %s [%s]",
-                    response.status_code,
-                    response.url,
-                )
             if 500 <= response.status_code < 600:
-                # server is overloaded? give it a break
-                time.sleep(5)
-
-            num_pages = int(response.headers["X-Total-Pages"])
-            for page in range(2, num_pages + 1):
-                get_url = f"{url}&page={page}"
-                try:
-                    response = session.get(
-                        get_url, headers={"PRIVATE-TOKEN": secret_token}
-                    )
-                    response.raise_for_status()
-                except HTTPError as e:
-                    raise RCException(f"Non-OK HTTP response from GitLab: '{e}'")
-                except RequestException:
-                    raise RCException(
-                        "There was an issue connecting to GitLab. "
-                        f"Failed GET {get_url}"
-                    )
-
-                try:
-                    response_json += json.loads(response.content)
-                except ValueError:
-                    raise RCException(
-                        f"Could not decode JSON. API endpoint might be wrong: {get_url}"
-                    )
-
-                logging.info(
-                    "request was completed in %s seconds [%s]",
-                    response.elapsed.total_seconds(),
-                    response.url,
-                )
-                if response.status_code != 200:
-                    logging.error(
-                        "request failed, error code %s [%s]",
-                        response.status_code,
-                        response.url,
-                    )
-                if 500 <= response.status_code < 600:
-                    # server is overloaded? give it a break
-                    time.sleep(5)
+                # server is overloaded? give it a break, but not past
+                # the deadline
+                backoff: float = Constants.SERVER_ERROR_BACKOFF
+                if Utils.deadline is not None:
+                    backoff = min(backoff, Utils.deadline - time.monotonic())
+                time.sleep(max(backoff, 0))
+            raise RCException(
+                "Non-OK HTTP response from GitLab: "
+                f"'{response.status_code} for url: {response.url}'"
+            )
+        return response
 
+    @staticmethod
+    def decode_page(response: TransportResponse) -> Any:
+        """Decode the JSON data of a page.
+
+        :param response: The response from GitLab.
+
+        :raises RCException: Raised when the data is not valid JSON.
+
+        :return: The decoded data.
+        """
+        try:
+            return json.loads(response.content)
+        except ValueError:
+            raise RCException(
+                f"Could not decode JSON. API endpoint might be wrong: {response.url}"
+            )
+
+    @staticmethod
+    def set_timeouts(request_timeout: float, deadline: Optional[float]) -> None:
+        """Set how long requests to GitLab may take.
+
+        :param request_timeout: The number of seconds to wait for an
+            answer to each request.
+        :param deadline: The number of seconds from now after which no
+            more requests are sent, or None for no deadline.
+        """
+        Utils.request_timeout = request_timeout
+        Utils.deadline = None if deadline is None else time.monotonic() + deadline
+
+    @staticmethod
+    def time_left() -> float:
+        """Return the number of seconds to wait for the next request.
+
+        :raises DeadlineExceeded: Raised when the deadline has passed.
+
+        :return: The request timeout, or the time left until the
+            deadline if that is shorter.
+        """
+        if Utils.deadline is None:
+            return Utils.request_timeout
+        time_left = Utils.deadline - time.monotonic()
+        if time_left <= 0:
+            raise DeadlineExceeded("The deadline passed before all data was downloaded")
+        return min(Utils.request_timeout, time_left)
+
+    @staticmethod
+    def deadline_passed() -> bool:
+        """Return whether the deadline of the current run has passed."""
+        return Utils.deadline is not None and time.monotonic() >= Utils.deadline
+
+    @staticmethod
+    def get_transport(host: str = "") -> Transport:
+        """Return the transport used to send requests to a GitLab host.
+
+        A transport using the requests library is created the first time
+        if none has been set with set_transport().
+
+        :param host: The host, with the port if any, of the request.
+            The transport for all hosts is returned if it has none of
+            its own.
+        """
+        with Utils.transport_lock:
+            if host in Utils.transports:
+                return Utils.transports[host]
+            if Utils.transport is None:
+                Utils.transport = Transport.create("requests")
+            return Utils.transport
+
+    @staticmethod
+    def set_transport(transport: Transport, host: Optional[str] = None) -> None:
+        """Set the transport used to send requests to GitLab.
+
+        :param transport: The transport to use from now on. The
+            previous one, if any, is closed.
+        :param host: The host to use the transport for, or None to use
+            it for all hosts without a transport of their own.
+        """
+        with Utils.transport_lock:
+            previous = Utils.transport if host is None else Utils.transports.get(host)
+            if previous is not None:
+                previous.close()
+            if host is None:
+                Utils.transport = transport
+            else:
+                Utils.transports[host] = transport
+
+    @staticmethod
+    def get_limiter(host: str = "") -> ConcurrencyLimiter:
+        """Return the limiter of requests sent to a host at once.
+
+        A limiter with the default starting limit is created the first
+        time if none has been set with set_limiter().
+
+        :param host: The host, with the port if any, of the requests.
+        """
+        with Utils.transport_lock:
+            if host not in Utils.limiters:
+                Utils.limiters[host] = ConcurrencyLimiter(host=host)
+            return Utils.limiters[host]
+
+    @staticmethod
+    def set_limiter(limiter: ConcurrencyLimiter, host: str = "") -> None:
+        """Set the limiter of requests sent at the same time to a host.
+
+        :param limiter: The limiter to use from now on.
+        :param host: The host, with the port if any, of the requests.
+        """
+        with Utils.transport_lock:
+            Utils.limiters[host] = limiter
+
+    @staticmethod
+    def check_page(response_json: Any) -> List[Dict[str, Any]]:
+        """Check that a page of data from GitLab is a list of objects.
+
+        :param response_json: The decoded data of the page.
+
+        :raises RCException: Raised when the data is malformed.
+
+        :return: The data of the page.
+        """
         if isinstance(response_json, list):
             if len(response_json) == 0 or isinstance(response_json[0], dict):
                 return response_json
 
-        raise Exception("Malformed data returned from GitLab.")
+        raise RCException("Malformed data returned from GitLab.")
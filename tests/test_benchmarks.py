@@ -0,0 +1,19 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the micro-benchmarks in benchmarks/micro.py."""
+from benchmarks import micro
+
+
+def test_no_benchmark_regressions() -> None:
+    """Test that no case is much slower than its stored baseline.
+
+    If any case seems slower, all are measured once more, so that a
+    single busy moment on the machine does not fail the test.
+    """
+    baseline = micro.load_baseline()
+    results = micro.run()
+    assert set(results) == set(baseline["cases"])
+    if micro.regressions(results, baseline):
+        results = micro.run()
+    assert micro.regressions(results, baseline) == []
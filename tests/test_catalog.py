@@ -0,0 +1,85 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the catalog.py file."""
+import time
+from pathlib import Path
+
+import pytest
+
+from reviewcheck.catalog import ProjectCatalog
+from reviewcheck.constants import Constants
+from reviewcheck.utils import Utils
+from tests.test_transport import FakeTransport
+
+api_url = "https://gitlab/api/v4"
+group_url = (
+    f"{api_url}/groups/10/projects?include_subgroups=true&archived=false"
+    "&with_merge_requests_enabled=true&simple=true&per_page=100"
+)
+old = "2024-01-01T10:00:00.000Z"
+
+
+def incremental_url(catalog: ProjectCatalog) -> str:
+    """Return the URL of the projects with activity since the update."""
+    updated_after = time.gmtime(
+        catalog.groups["10"]["updated_at"] - Constants.PROJECT_ACTIVITY_SLACK
+    )
+    return group_url + time.strftime(
+        "&last_activity_after=%Y-%m-%dT%H:%M:%SZ", updated_after
+    )
+
+
+def test_idle_projects_are_skipped(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that only projects that may have open MRs are listed."""
+    monkeypatch.setattr(Constants, "CATALOG_PATH", tmp_path / "projects.json")
+    monkeypatch.setattr(Constants, "SERVER_ERROR_BACKOFF", 0)
+    transport = FakeTransport(
+        {
+            group_url: [
+                {"id": 1, "last_activity_at": old},
+                {"id": 2, "last_activity_at": old},
+            ]
+        }
+    )
+    Utils.set_transport(transport)
+    Utils.set_timeouts(Constants.REQUEST_TIMEOUT, None)
+    try:
+        catalog = ProjectCatalog.load("gitlab")
+        catalog.refresh("token", api_url, 10)
+        # Never listed, so both are listed, and the configured project
+        # is listed first
+        assert catalog.projects([5], [10], "") == [5, "1", "2"]
+        catalog.record(5, True, time.time(), "")
+        catalog.record("1", True, time.time(), "")
+        catalog.record("2", False, time.time(), "")
+        catalog.save([10])
+
+        # Only the projects with activity since the last update are
+        # downloaded, and the project without open MRs is skipped
+        catalog = ProjectCatalog.load("gitlab")
+        transport.pages[incremental_url(catalog)] = []
+        catalog.refresh("token", api_url, 10)
+        assert "last_activity_after" in transport.requested[-1]
+        assert catalog.projects([], [10], "") == ["1"]
+
+        # The project is listed again if the filters change
+        assert catalog.projects([], [10], "[]") == ["1", "2"]
+
+        # Activity in the project, like an MR being opened, lists it
+        # again
+        transport.pages[incremental_url(catalog)] = [
+            {"id": 2, "last_activity_at": "2100-01-01T10:00:00.000Z"}
+        ]
+        catalog.refresh("token", api_url, 10)
+        assert catalog.projects([], [10], "") == ["1", "2"]
+
+        # The stored projects are used when the group cannot be listed
+        transport.pages[incremental_url(catalog)] = []
+        transport.status_code = 500
+        catalog.refresh("token", api_url, 10)
+        assert catalog.projects([], [10], "") == ["1", "2"]
+    finally:
+        Utils.transport = None
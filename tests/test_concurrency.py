@@ -0,0 +1,83 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the concurrency.py file."""
+from pathlib import Path
+
+import pytest
+
+from reviewcheck.app import read_concurrency_limit, write_concurrency_limits
+from reviewcheck.concurrency import ConcurrencyLimiter
+from reviewcheck.constants import Constants
+from reviewcheck.exceptions import TransportError
+from reviewcheck.utils import Utils
+
+
+def run_round(limiter: ConcurrencyLimiter, latency: float = 0.1) -> None:
+    """Send as many requests as allowed at once, which all succeed."""
+    tickets = [limiter.acquire() for _ in range(int(limiter.limit))]
+    for ticket in tickets:
+        limiter.release(ticket, latency)
+
+
+def test_limit_grows_while_server_keeps_up() -> None:
+    """Test that the limit grows by about one per full round."""
+    limiter = ConcurrencyLimiter(4)
+    for _ in range(3):
+        run_round(limiter)
+    assert 6.5 < limiter.limit < 7.5
+    for _ in range(100):
+        run_round(limiter)
+    assert limiter.limit == Constants.THREADPOOL_MAXSIZE
+
+
+def test_limit_is_halved_once_on_overload() -> None:
+    """Test that a burst of rejected requests halves the limit once."""
+    limiter = ConcurrencyLimiter(16)
+    tickets = [limiter.acquire() for _ in range(16)]
+    for ticket in tickets:
+        limiter.release(ticket, None)
+    assert limiter.limit == 8
+
+    # Requests sent after the decrease can decrease it again
+    limiter.release(limiter.acquire(), None)
+    assert limiter.limit == 4
+
+    # Failed requests count as overload, but never below the minimum
+    for _ in range(10):
+        with pytest.raises(TransportError):
+            limiter.call(lambda: _raise(), lambda status: status)
+    assert limiter.limit == Constants.CONCURRENCY_MIN
+    assert limiter.in_flight == 0
+
+
+def test_limit_is_lowered_when_requests_slow_down() -> None:
+    """Test that the limit is lowered when latency increases."""
+    limiter = ConcurrencyLimiter(10)
+    for _ in range(Constants.CONCURRENCY_MIN_SAMPLES):
+        limiter.release(limiter.acquire(), 0.1)
+    assert limiter.limit == 10
+    for _ in range(5):
+        limiter.release(limiter.acquire(), 1.0)
+    assert limiter.limit < 10
+
+
+def test_limit_is_stored_per_host(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that the next run starts at the limit reached on a host."""
+    monkeypatch.setattr(Constants, "CONCURRENCY_PATH", tmp_path / "limits.json")
+    assert read_concurrency_limit("a").limit == Constants.CONCURRENCY_INITIAL
+    try:
+        Utils.set_limiter(ConcurrencyLimiter(3), "a")
+        Utils.set_limiter(ConcurrencyLimiter(20), "b")
+        write_concurrency_limits(["a", "b"])
+        assert read_concurrency_limit("a").limit == 3
+        assert read_concurrency_limit("b").limit == 20
+    finally:
+        Utils.limiters.clear()
+
+
+def _raise() -> int:
+    """Fail like a request that got no answer."""
+    raise TransportError("connection refused")
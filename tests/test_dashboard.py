@@ -0,0 +1,144 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the dashboard.py file."""
+import io
+from typing import List
+
+from rich.console import Console
+from rich.text import Text
+
+from reviewcheck.dashboard import Dashboard, ScreenWriter
+
+
+def test_only_changed_lines_are_written() -> None:
+    """Test that the writer skips lines that are already on screen."""
+    terminal = io.StringIO()
+    writer = ScreenWriter(terminal)
+    writer.write(["first", "second", "third"])
+    assert "first" in terminal.getvalue()
+
+    terminal.truncate(0)
+    terminal.seek(0)
+    writer.write(["first", "changed"])
+    assert terminal.getvalue() == "\x1b[2;1Hchanged\x1b[0m\x1b[K\x1b[3;1H\x1b[K"
+
+    terminal.truncate(0)
+    terminal.seek(0)
+    assert writer.write(["first", "changed"]) == 0
+    assert terminal.getvalue() == ""
+
+
+def test_unchanged_merge_requests_are_not_redrawn() -> None:
+    """Test that a cycle with the same MRs only writes the status."""
+    terminal = io.StringIO()
+    console = Console(file=terminal, width=40, height=20, force_terminal=True)
+    dashboard = Dashboard(console, 40)
+
+    def cycle() -> str:
+        terminal.truncate(0)
+        terminal.seek(0)
+        dashboard.start_cycle()
+        dashboard.update("mr1", [Text("first merge request")])
+        dashboard.update("mr2", [])
+        dashboard.update("mr3", [Text("third merge request")])
+        dashboard.finish_cycle()
+        return terminal.getvalue()
+
+    assert "third merge request" in cycle()
+    output = cycle()
+    assert "first merge request" not in output
+    assert "third merge request" not in output
+
+
+def test_only_visible_parts_are_rendered() -> None:
+    """Test paging through many MRs and collapsing one of them."""
+    terminal = io.StringIO()
+    console = Console(file=terminal, width=40, height=10, force_terminal=True)
+    dashboard = Dashboard(console, 40)
+    for i in range(1000):
+        dashboard.update(
+            f"mr{i}",
+            [Text(f"header {i}"), Text(f"thread {i}")],
+            Text(f"summary {i}"),
+        )
+    dashboard.finish_cycle()
+    assert "header 0" in terminal.getvalue()
+    assert "header 10" not in terminal.getvalue()
+
+    # Each MR takes three lines, with the line below it
+    dashboard.handle_key(" ")
+    dashboard.handle_key("n")
+    dashboard.handle_key("\r")
+    screen = "\n".join(dashboard.writer.lines)
+    assert "summary 2" in screen
+    assert "thread 2" not in screen
+    assert "header 3" in screen
+    assert "MR 3 of 1000" in screen
+    assert sum(len(lines) for lines in dashboard.lines.values()) < 20
+
+
+def test_full_notes_are_only_created_when_asked_for() -> None:
+    """Test showing the notes of an MR in full and folded again."""
+    terminal = io.StringIO()
+    console = Console(file=terminal, width=40, height=10, force_terminal=True)
+    dashboard = Dashboard(console, 40)
+    calls = 0
+
+    def unfold() -> List[Text]:
+        nonlocal calls
+        calls += 1
+        return [Text("header"), Text("full note")]
+
+    dashboard.update("mr1", [Text("header"), Text("folded note")], "", unfold)
+    dashboard.finish_cycle()
+    assert calls == 0
+
+    dashboard.handle_key("F")
+    screen = "\n".join(dashboard.writer.lines)
+    assert "full note" in screen
+    assert "folded note" not in screen
+
+    dashboard.handle_key("F")
+    screen = "\n".join(dashboard.writer.lines)
+    assert "folded note" in screen
+    assert calls == 1
+
+
+def test_merge_requests_are_marked_while_refreshing() -> None:
+    """Test the line below MRs, and that removed MRs are forgotten."""
+    terminal = io.StringIO()
+    console = Console(file=terminal, width=60, height=20, force_terminal=True)
+    dashboard = Dashboard(console, 60)
+    for key in ("mr1", "mr2"):
+        dashboard.update(key, [Text(key)], Text(key), lambda: [Text("full")])
+    dashboard.finish_cycle()
+    dashboard.toggle("mr2", "unfold")
+    dashboard.toggle("mr2", "toggle")
+
+    dashboard.start_cycle()
+    dashboard.update("mr1", [Text("mr1")])
+    dashboard.draw(True)
+    screen = "\n".join(dashboard.writer.lines)
+    assert screen.count(Dashboard.PENDING_MARK) == 1
+    assert screen.index(Dashboard.PENDING_MARK) > screen.index("mr2")
+
+    dashboard.finish_cycle(["mr2"])
+    screen = "\n".join(dashboard.writer.lines)
+    assert Dashboard.PENDING_MARK not in screen
+    assert Dashboard.MISSING_MARK in screen
+
+    dashboard.start_cycle()
+    dashboard.update("mr1", [Text("mr1")])
+    dashboard.finish_cycle()
+    assert Dashboard.MISSING_MARK not in "\n".join(dashboard.writer.lines)
+    for state in (
+        dashboard.renderables,
+        dashboard.summaries,
+        dashboard.lines,
+        dashboard.unfolders,
+        dashboard.full_renderables,
+        dashboard.unfolded,
+        dashboard.collapsed,
+    ):
+        assert "mr2" not in state
@@ -0,0 +1,93 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the delta.py file."""
+from copy import deepcopy
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from reviewcheck.constants import Constants
+from reviewcheck.delta import DeltaEngine
+from reviewcheck.merge_request import MergeRequest
+from tests.test_merge_requests import sample_mr, sample_mr_response
+
+key = sample_mr["web_url"]
+
+
+def thread_needing_reply() -> List[Dict[str, Any]]:
+    """Return the threads of an MR with an open thread for janedoe."""
+    threads = deepcopy(sample_mr_response)
+    threads[0]["notes"][0]["resolved"] = False
+    threads[0]["notes"][0]["body"] = "@janedoe there is a bug"
+    return threads
+
+
+def diff(delta: DeltaEngine, threads: List[Dict[str, Any]]) -> MergeRequest:
+    """Create the MR with the threads and find its changes."""
+    mr = MergeRequest(threads, [], sample_mr, "janedoe")
+    delta.apply(key, mr)
+    return mr
+
+
+def test_changes_between_runs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that new and edited notes and resolved threads are found."""
+    monkeypatch.setattr(Constants, "NOTES_PATH", tmp_path / "notes.json")
+    monkeypatch.setattr(Constants, "COMMENT_NOTE_IDS_PATH", tmp_path / "ids")
+    threads = thread_needing_reply()
+
+    # Everything is new the first time
+    delta = DeltaEngine.load("janedoe")
+    mr = diff(delta, threads)
+    assert mr.note_changes == {"100000": "new"}
+    assert [record["id"] for record in mr.changed_threads(mr.threads)] == [
+        threads[0]["id"]
+    ]
+    delta.save({key})
+
+    # Nothing changed
+    delta = DeltaEngine.load("janedoe")
+    assert not diff(delta, threads).has_changes()
+
+    # Only updating the time of a note is not an edit
+    threads[0]["notes"][0]["updated_at"] = "2022-12-15T20:00:00.000+01:00"
+    assert not diff(delta, threads).has_changes()
+
+    # A reply and an edit
+    threads[0]["notes"][0]["body"] += ", please fix"
+    threads[0]["notes"][0]["updated_at"] = "2022-12-16T20:00:00.000+01:00"
+    reply = deepcopy(threads[0]["notes"][0])
+    reply["id"] = 100001
+    threads[0]["notes"].append(reply)
+    mr = diff(delta, threads)
+    assert mr.note_changes == {"100000": "edited", "100001": "new"}
+
+    # The thread is resolved, and then reopened
+    threads[0]["notes"][0]["resolved"] = True
+    mr = diff(delta, threads)
+    assert mr.thread_changes == {threads[0]["id"]: "resolved"}
+    assert mr.changed_threads(mr.threads) == []
+    threads[0]["notes"][0]["resolved"] = False
+    mr = diff(delta, threads)
+    assert mr.thread_changes == {threads[0]["id"]: "reopened"}
+    assert mr.note_changes == {}
+
+    # The MR is forgotten when it is closed
+    delta.save(set())
+    assert DeltaEngine.load("janedoe").merge_requests == {}
+
+
+def test_seen_ids_are_migrated(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that threads seen by earlier versions are not new."""
+    monkeypatch.setattr(Constants, "NOTES_PATH", tmp_path / "notes.json")
+    monkeypatch.setattr(Constants, "COMMENT_NOTE_IDS_PATH", tmp_path / "ids")
+    Constants.COMMENT_NOTE_IDS_PATH.write_text("100000\n")
+
+    delta = DeltaEngine.load("janedoe")
+    assert not diff(delta, thread_needing_reply()).has_changes()
+    delta.save({key})
+    assert not Constants.COMMENT_NOTE_IDS_PATH.exists()
+    assert key in DeltaEngine.load("janedoe").merge_requests
+    # The fingerprints are not used for another user
+    assert DeltaEngine.load("johndoe").merge_requests == {}
@@ -0,0 +1,82 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the fetcher.py file."""
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import pytest
+
+from reviewcheck import fallback
+from reviewcheck.constants import Constants
+from reviewcheck.fetcher import MergeRequestFetcher
+from reviewcheck.utils import Utils
+from tests.test_merge_requests import sample_mr, sample_mr_response
+from tests.test_transport import FakeTransport
+
+config: Dict[str, Any] = {
+    "secret_token": "token",
+    "api_url": "https://gitlab",
+    "user": "JANEDOE",
+    "aliases": [],
+    "group_handles": [],
+    "sync_notes": False,
+    "show_all_discussions": False,
+}
+
+
+def test_failed_mr_falls_back_to_stored_data(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that an MR failing to download is shown as stale."""
+    monkeypatch.setattr(Constants, "FALLBACK_DIR", tmp_path)
+    monkeypatch.setattr(Constants, "SERVER_ERROR_BACKOFF", 0)
+    url = "https://gitlab/api/v4/projects/500/merge_requests/300/discussions"
+    transport = FakeTransport({f"{url}?per_page=500": sample_mr_response})
+    Utils.set_transport(transport)
+    Utils.set_timeouts(Constants.REQUEST_TIMEOUT, None)
+    fetcher = MergeRequestFetcher(config)
+    try:
+        result = fetcher.fetch((sample_mr, True, False))
+        assert result.error is None
+        assert result.merge_request is not None
+        assert result.merge_request.stale_since is None
+        threads = result.merge_request.threads
+
+        transport.status_code = 500
+        result = fetcher.fetch((sample_mr, True, False))
+        assert result.error is not None
+        assert result.merge_request is not None
+        assert result.merge_request.stale_since is not None
+        assert result.merge_request.threads == threads
+
+        for path in tmp_path.iterdir():
+            path.unlink()
+        result = fetcher.fetch((sample_mr, True, False))
+        assert result.error is not None
+        assert result.merge_request is None
+    finally:
+        Utils.transport = None
+
+
+def test_stale_time_without_microseconds(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that data stored on a whole second can be shown as stale."""
+
+    class WholeSecond(datetime):
+        """A datetime whose now is on a whole second."""
+
+        @classmethod
+        def now(cls, tz: Optional[Any] = None) -> "WholeSecond":
+            """Return a time without microseconds."""
+            return cls(2024, 1, 24, 12, 30, 0, 0, tzinfo=timezone.utc)
+
+    monkeypatch.setattr(Constants, "FALLBACK_DIR", tmp_path)
+    monkeypatch.setattr(fallback, "datetime", WholeSecond)
+    fallback.FallbackStore.save(sample_mr, [], [])
+    stored = fallback.FallbackStore.load(sample_mr)
+    assert stored is not None
+    assert stored["downloaded_at"] == "2024-01-24T12:30:00.000000+00:00"
+    assert Utils.convert_time(stored["downloaded_at"]) == "24 Jan 12:30"
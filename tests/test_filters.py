@@ -0,0 +1,80 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the filters.py file."""
+from copy import deepcopy
+from typing import Any, Dict
+
+from reviewcheck.filters import ListFilter
+from tests.test_merge_requests import sample_mr
+
+config: Dict[str, Any] = {
+    "ignored_mrs": [],
+    "ignored_authors": [],
+    "labels": [],
+    "target_branches": [],
+    "hide_drafts": False,
+    "updated_within": None,
+}
+
+
+def test_no_filters() -> None:
+    """Test that all MRs are listed when there are no filters."""
+    list_filter = ListFilter(config)
+    assert list_filter.query() == ""
+    assert list_filter.matches(sample_mr)
+
+
+def test_filters_are_pushed_to_gitlab() -> None:
+    """Test that GitLab is asked to filter where it can."""
+    filters = {
+        **config,
+        "ignored_authors": ["bot"],
+        "labels": ["needs review", "backend"],
+        "target_branches": ["release/1.0"],
+        "hide_drafts": True,
+        "updated_within": 7,
+    }
+    list_filter = ListFilter(filters)
+    query = list_filter.query()
+    assert query.startswith("&updated_after=")
+    assert query.endswith(
+        "&wip=no&labels=needs%20review%2Cbackend"
+        "&target_branch=release%2F1.0&not[author_username]=bot"
+    )
+    # The key does not depend on when the filter was created, or on
+    # the order of the labels
+    assert (
+        list_filter.key()
+        == ListFilter({**filters, "labels": ["backend", "needs review"]}).key()
+    )
+    assert list_filter.key() != ListFilter(config).key()
+
+
+def test_filters_are_applied_to_listed_mrs() -> None:
+    """Test that all filters are applied to the listed MRs."""
+    list_filter = ListFilter(
+        {
+            **config,
+            "ignored_mrs": [sample_mr["iid"]],
+            "ignored_authors": ["bot", "JOHNDOE"],
+            "target_branches": ["main", "release"],
+            "hide_drafts": True,
+            "updated_within": 7,
+        }
+    )
+    # Several target branches and authors are not sent to GitLab
+    assert "target_branch" not in list_filter.query()
+    assert list_filter.query().endswith("&not[author_username]=bot")
+
+    mr = deepcopy(sample_mr)
+    mr["iid"] += 1
+    mr["author"] = {"username": "janedoe"}
+    mr["target_branch"] = "main"
+    mr["updated_at"] = "2100-01-01T10:00:00.000Z"
+    assert list_filter.matches(mr)
+    assert not list_filter.matches(dict(mr, iid=sample_mr["iid"]))
+    assert not list_filter.matches(dict(mr, author={"username": "johndoe"}))
+    assert not list_filter.matches(dict(mr, target_branch="feature"))
+    assert not list_filter.matches(dict(mr, draft=True))
+    assert not list_filter.matches(dict(mr, updated_at="2000-01-01T10:00:00.000Z"))
@@ -0,0 +1,48 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the folding.py file."""
+from typing import Any, Dict
+
+from reviewcheck.folding import NoteFolder
+
+
+def note(body: str, author: str = "ci-bot") -> Dict[str, Any]:
+    """Return a note with the given body."""
+    return {"author": {"username": author}, "body": body}
+
+
+def test_long_notes_are_cut() -> None:
+    """Test that notes are cut at the maximum lines and bytes."""
+    folder = NoteFolder(3, 100)
+    assert folder.fold("short") == "short"
+    assert folder.fold("1\n2\n3\n4\n5") == "1\n2\n3\n(... 2 more lines)"
+    assert folder.fold("é" * 60) == "é" * 50 + "\n(... 20 more bytes)"
+
+
+def test_long_code_blocks_are_folded() -> None:
+    """Test that only code blocks longer than the limit are folded."""
+    folder = NoteFolder(20, 10000)
+    log = "\n".join(f"line {i}" for i in range(100))
+    suggestion = "```suggestion:-0+0\nx = 1\n```"
+    assert folder.fold(f"Failed:\n```log\n{log}\n```\n{suggestion}") == (
+        f"Failed:\n```log\n(... 100 lines of code)\n```\n{suggestion}"
+    )
+    # A block that is never closed runs to the end of the note
+    assert folder.fold(f"~~~\n{log}") == "~~~\n(... 99 lines of code)\n~~~"
+
+
+def test_similar_notes_are_shown_once() -> None:
+    """Test that runs of notes only differing in numbers are merged."""
+    notes = [
+        note("Pipeline #1 failed"),
+        note("Pipeline #2 failed"),
+        note("Pipeline #3 failed", "janedoe"),
+        note("Pipeline #4 failed"),
+    ]
+    assert [n["body"] for n in NoteFolder(20, 10000).fold_thread(notes)] == [
+        "(2 similar notes, showing the last)\nPipeline #2 failed",
+        "Pipeline #3 failed",
+        "Pipeline #4 failed",
+    ]
+    assert notes[1]["body"] == "Pipeline #2 failed"
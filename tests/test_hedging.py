@@ -0,0 +1,106 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the hedging.py file."""
+import threading
+import time
+from typing import Dict, Optional
+
+import pytest
+
+from reviewcheck.concurrency import ConcurrencyLimiter
+from reviewcheck.constants import Constants
+from reviewcheck.hedging import Hedger
+from reviewcheck.transport import TransportResponse
+from reviewcheck.utils import Utils
+from tests.test_transport import FakeTransport
+
+
+def test_slow_request_is_hedged(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a duplicate is sent when a request is slow.
+
+    The request should count as hedged until the request that lost to
+    its duplicate is done too.
+    """
+    monkeypatch.setattr(Constants, "HEDGE_MAX_IN_FLIGHT", 1)
+    hedger = Hedger()
+    for _ in range(Constants.HEDGE_MIN_SAMPLES):
+        hedger.call(lambda: time.sleep(0.01))
+
+    calls = 0
+    lock = threading.Lock()
+    # The first request stalls until the duplicate has been returned
+    returned = threading.Event()
+
+    def request() -> str:
+        nonlocal calls
+        with lock:
+            calls += 1
+            call = calls
+        if call == 1:
+            returned.wait(timeout=10)
+            return "first"
+        return "duplicate"
+
+    try:
+        assert hedger.call(request) == "duplicate"
+        assert not hedger.hedges.acquire(blocking=False)
+    finally:
+        returned.set()
+    assert calls == 2
+    hedger.executor.shutdown(wait=True)
+    assert hedger.hedges.acquire(blocking=False)
+
+
+def test_duplicates_are_sent_within_the_limit() -> None:
+    """Test that a duplicate is only sent if the limiter allows it.
+
+    Each request, including one that lost to its duplicate, should hold
+    its place in the limit until it is done.
+    """
+    url = "https://gitlab/api/v4/projects/1/merge_requests?per_page=2"
+
+    class StallingTransport(FakeTransport):
+        """A transport whose first request stalls until released."""
+
+        def get(
+            self, url: str, headers: Dict[str, str], timeout: Optional[float] = None
+        ) -> TransportResponse:
+            """Return the page, stalling on the first request."""
+            with lock:
+                first = not self.requested
+            response = super().get(url, headers, timeout)
+            if first:
+                released.wait(timeout=10)
+            return response
+
+    lock = threading.Lock()
+    for limit in (1, 2):
+        released = threading.Event()
+        hedger = Hedger()
+        for _ in range(Constants.HEDGE_MIN_SAMPLES):
+            hedger.call(lambda: time.sleep(0.01))
+        limiter = ConcurrencyLimiter(limit)
+        transport = StallingTransport({url: [{"id": 1}]})
+        Utils.set_transport(transport)
+        Utils.set_limiter(limiter, "gitlab")
+        Utils.hedgers["gitlab"] = hedger
+        try:
+            if limit == 1:
+                # Nothing else may be sent while the request stalls
+                threading.Timer(0.5, released.set).start()
+                assert Utils.download_gitlab_data("token", url) == [{"id": 1}]
+                assert transport.requested == [url]
+            else:
+                assert Utils.download_gitlab_data("token", url) == [{"id": 1}]
+                assert transport.requested == [url, url]
+                # The stalled request still holds its place
+                assert limiter.in_flight == 1
+                released.set()
+                hedger.executor.shutdown(wait=True)
+                assert limiter.in_flight == 0
+        finally:
+            released.set()
+            Utils.transport = None
+            Utils.limiters.pop("gitlab")
+            Utils.hedgers.pop("gitlab")
@@ -0,0 +1,148 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the instances.py file."""
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import pytest
+
+from reviewcheck.constants import Constants
+from reviewcheck.exceptions import RCException
+from reviewcheck.filters import ListFilter
+from reviewcheck.instances import Instance
+from reviewcheck.scheduling import Scheduler
+from reviewcheck.transport import TransportResponse
+from reviewcheck.utils import Utils
+from tests.test_fetcher import config as fetcher_config
+from tests.test_filters import config as filter_config
+from tests.test_merge_requests import sample_mr
+from tests.test_scheduling import make_mr
+from tests.test_transport import FakeTransport
+
+base_config: Dict[str, Any] = {
+    "api_url": "https://gitlab.example.com/api/v4",
+    "secret_token": "token",
+    "user": "janedoe",
+    "project_ids": [1],
+    "group_ids": [],
+    "jira_url": "https://jira.example.com/browse/",
+}
+
+
+def test_single_instance() -> None:
+    """Test that the top-level settings are the only instance."""
+    configs = Instance.resolve(base_config)
+    assert len(configs) == 1
+    assert configs[0]["user"] == "JANEDOE"
+    assert configs[0]["api_url"] == "https://gitlab.example.com"
+    assert configs[0]["jira_url"] == "https://jira.example.com"
+    assert Instance.identity(configs) == "JANEDOE"
+    assert Instance.index(configs, "https://elsewhere.com/1/mr/1") == 0
+
+
+def test_several_instances() -> None:
+    """Test that each instance overrides the top-level settings."""
+    config = {
+        **base_config,
+        "instances": [
+            {},
+            {"api_url": "https://gitlab.other.com:8443", "user": "jdoe"},
+        ],
+    }
+    first, second = Instance.resolve(config)
+    assert first["api_url"] == "https://gitlab.example.com"
+    assert second["api_url"] == "https://gitlab.other.com:8443"
+    assert second["secret_token"] == "token"
+    assert "instances" not in second
+    configs = [first, second]
+    assert (
+        Instance.identity(configs)
+        == "JANEDOE@gitlab.example.com JDOE@gitlab.other.com:8443"
+    )
+    assert Instance.index(configs, "https://gitlab.other.com:8443/a/-/1") == 1
+    with pytest.raises(RCException):
+        Instance.index(configs, "https://elsewhere.com/1/mr/1")
+
+    # The user given on the command line is used on every instance
+    first, second = Instance.resolve(config, "johndoe")
+    assert first["user"] == second["user"] == "JOHNDOE"
+
+
+@pytest.mark.parametrize(
+    "instances",
+    [
+        {"api_url": "https://gitlab.other.com"},
+        [{"api_url": "https://gitlab.other.com", "colour": "blue"}],
+        [{}, {"user": "jdoe"}],
+    ],
+)
+def test_malformed_instances(instances: Any) -> None:
+    """Test that malformed or clashing instances are rejected."""
+    with pytest.raises(RCException):
+        Instance.resolve({**base_config, "instances": instances})
+
+
+def test_merged_order() -> None:
+    """Test that the MRs of all instances are ordered together."""
+    jane = {"username": "JANEDOE"}
+    john = {"username": "JDOE"}
+    old = make_mr(1, "2021-01-01T00:00:00.000Z", author=john)
+    new = make_mr(2, "2021-12-31T00:00:00.000Z")
+    other = make_mr(3, "2021-06-01T00:00:00.000Z", author=jane)
+    merged = Scheduler.merge([([new, other], "JANEDOE"), ([old], "JDOE")])
+    assert [mr["iid"] for mr in merged] == [3, 1, 2]
+
+
+def test_deadline_while_listing(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that the MRs listed before the deadline are kept.
+
+    The projects and groups not listed by then should be reported.
+    """
+    monkeypatch.setattr(Constants, "CATALOG_PATH", tmp_path / "projects.json")
+    monkeypatch.setattr(Constants, "REACTIONS_PATH", tmp_path / "reactions.json")
+    api_url = "https://gitlab.example.com/api/v4"
+    group_url = (
+        f"{api_url}/groups/7/projects?include_subgroups=true&archived=false"
+        "&with_merge_requests_enabled=true&simple=true&per_page=100"
+    )
+    project_url = f"{api_url}/projects/1/merge_requests?state=opened&per_page=100"
+
+    class ExpiringTransport(FakeTransport):
+        """A transport that lets the deadline pass after listing MRs."""
+
+        def get(
+            self, url: str, headers: Dict[str, str], timeout: Optional[float] = None
+        ) -> TransportResponse:
+            """Return the page, and make the deadline pass if of MRs."""
+            if url == project_url:
+                Utils.deadline = time.monotonic() - 1
+            return super().get(url, headers, timeout)
+
+    Utils.set_transport(ExpiringTransport({group_url: [], project_url: [sample_mr]}))
+    (config,) = Instance.resolve(
+        {**fetcher_config, **base_config, "project_ids": [1, 2], "group_ids": [7]}
+    )
+    try:
+        Utils.set_timeouts(Constants.REQUEST_TIMEOUT, 60)
+        instance = Instance(config)
+        instance.list_merge_requests(ListFilter(filter_config), {})
+        assert instance.mr_pages == [sample_mr]
+        assert [(r["kind"], r["id"]) for r in instance.unlisted] == [("project", 2)]
+
+        # A group that has never been listed is reported itself
+        Utils.set_timeouts(Constants.REQUEST_TIMEOUT, 0)
+        instance = Instance({**config, "group_ids": [8]})
+        instance.list_merge_requests(ListFilter(filter_config), {})
+        assert instance.mr_pages == []
+        assert [(r["kind"], r["id"]) for r in instance.unlisted] == [
+            ("group", 8),
+            ("project", 1),
+            ("project", 2),
+        ]
+    finally:
+        Utils.transport = None
+        Utils.set_timeouts(Constants.REQUEST_TIMEOUT, None)
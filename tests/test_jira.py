@@ -0,0 +1,68 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the jira.py file."""
+from typing import Dict, Optional
+
+import pytest
+
+from reviewcheck.exceptions import RCException
+from reviewcheck.jira import JiraExtractor
+
+
+def test_extract_from_title_and_branch() -> None:
+    """Test falling back to the title and the source branch."""
+    extractor = JiraExtractor(projects=["ABC", "DEF"])
+    assert (
+        extractor.extract(
+            {
+                "description": "No ticket here",
+                "title": "Fix ABC-12: crash",
+                "source_branch": "feature/DEF-34",
+            }
+        )
+        == "ABC-12"
+    )
+    assert (
+        extractor.extract({"description": None, "source_branch": "DEF-34-crash"})
+        == "DEF-34"
+    )
+    assert extractor.extract({"description": "See [XY-1](https://x)"}) == "XY-1"
+
+
+def test_no_tickets_from_other_words() -> None:
+    """Test that words looking like tickets are not taken as tickets."""
+    fields: Dict[str, Optional[str]] = {
+        "description": "Read the files as UTF-8",
+        "title": "Use SHA-256 and AES-128 for ISO-8601 dates",
+        "source_branch": "feature/UTF-8",
+    }
+    assert JiraExtractor().extract(fields) is None
+    assert JiraExtractor(projects=["ABC"]).extract(fields) is None
+    assert (
+        JiraExtractor(projects=["ABC"]).extract(
+            {**fields, "source_branch": "ABC-7-sha"}
+        )
+        == "ABC-7"
+    )
+
+
+def test_custom_patterns() -> None:
+    """Test configuring the patterns."""
+    extractor = JiraExtractor(
+        [{"field": "description", "pattern": r"(?m)^Ticket: (\S+)"}]
+    )
+    assert extractor.extract({"description": "Ticket: T-1\nJIRA: ABC-1"}) == "T-1"
+
+    with pytest.raises(RCException):
+        JiraExtractor([{"field": "labels", "pattern": "x"}])
+
+
+def test_long_description_without_ticket() -> None:
+    """Test that a huge description without a ticket has none.
+
+    How long this takes is measured by the jira_long_description case
+    in benchmarks/micro.py.
+    """
+    description = "JIRA" + " " * 200000 + "\n" + "log line\n" * 200000
+    assert JiraExtractor().extract({"description": description}) is None
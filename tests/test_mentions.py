@@ -0,0 +1,25 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the mentions.py file."""
+from reviewcheck.mentions import MentionMatcher
+
+
+def test_mentions_match_whole_handles() -> None:
+    """Test that only complete handles are matched."""
+    matcher = MentionMatcher(["BOB"])
+    assert matcher.is_mentioned("@bob, could you have a look?")
+    assert matcher.is_mentioned("Thanks @Bob.")
+    assert not matcher.is_mentioned("@bobby could you have a look?")
+    assert not matcher.is_mentioned("@bob-team could you have a look?")
+    assert not matcher.is_mentioned("Mail me at alice@bob.com")
+
+
+def test_mentions_of_aliases_and_groups() -> None:
+    """Test matching several handles, including group handles."""
+    matcher = MentionMatcher(["bob", "@robert", "@platform/reviewers"])
+    assert matcher.find_mentions(
+        "@Robert and @platform/reviewers, not @platform/testers"
+    ) == {"robert", "platform/reviewers"}
+    assert not matcher.is_mentioned("@platform is not a group of bob's")
+    assert not MentionMatcher([]).is_mentioned("@anyone")
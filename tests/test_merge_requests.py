@@ -4,7 +4,9 @@
 """Tests for the merge_requests.py file."""
 from typing import Any, Dict, List
 
+from reviewcheck.constants import Constants
 from reviewcheck.merge_request import MergeRequest
+from reviewcheck.scheduling import Scheduler
 
 sample_mr: Dict[str, Any] = {
     "approvals_before_merge": None,
@@ -136,3 +138,16 @@ JIRA: ABCD-1234
 Other text
 """
     assert merge_request_1.extract_jira() == "ABCD-1234"
+
+
+def test_user_without_regard_to_case() -> None:
+    """Test that the uppercased user is matched to GitLab usernames.
+
+    The scheduler should agree with the MR on who the author is.
+    """
+    reactions = [{"name": "thumbsup", "user": {"name": "John", "username": "johndoe"}}]
+    mr = MergeRequest(sample_mr_response, reactions, sample_mr, "JOHNDOE")
+    assert mr.is_author
+    assert mr.user_upvoted
+    assert not mr.thread_needs_reply(sample_mr_response[0])
+    assert Scheduler.priority(sample_mr, "JOHNDOE") >= Constants.PRIORITY_AUTHOR
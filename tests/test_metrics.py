@@ -0,0 +1,62 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the metrics.py file."""
+import urllib.request
+from pathlib import Path
+
+from reviewcheck.metrics import Metrics
+
+
+def test_endpoint() -> None:
+    """Test that IDs are removed from the endpoints of URLs."""
+    assert (
+        Metrics.endpoint(
+            "https://gitlab/api/v4/projects/group%2Fproject/merge_requests/12/"
+            "discussions?per_page=500&page=2"
+        )
+        == "projects/:id/merge_requests/:iid/discussions"
+    )
+    assert (
+        Metrics.endpoint("https://gitlab/api/v4/projects/500/merge_requests?page=1")
+        == "projects/:id/merge_requests"
+    )
+    assert Metrics.endpoint("https://gitlab/api/v4/user") == "user"
+
+
+def test_render(tmp_path: Path) -> None:
+    """Test that the metrics are written in the Prometheus format."""
+    Metrics.reset()
+    try:
+        Metrics.count("reviewcheck_requests_total", endpoint="user", code="200")
+        Metrics.count("reviewcheck_requests_total", endpoint="user", code="200")
+        Metrics.count("reviewcheck_cache_hits_total", cache='a "b"')
+        Metrics.set("reviewcheck_threads_needing_reply", 3)
+        Metrics.observe("reviewcheck_request_duration_seconds", 0.2, endpoint="user")
+        Metrics.observe("reviewcheck_request_duration_seconds", 60, endpoint="user")
+
+        text = Metrics.render()
+        lines = text.splitlines()
+        assert "# TYPE reviewcheck_requests_total counter" in lines
+        assert 'reviewcheck_requests_total{code="200",endpoint="user"} 2' in lines
+        assert 'reviewcheck_cache_hits_total{cache="a \\"b\\""} 1' in lines
+        assert "reviewcheck_threads_needing_reply 3" in lines
+        duration = "reviewcheck_request_duration_seconds"
+        assert f'{duration}_bucket{{endpoint="user",le="0.1"}} 0' in lines
+        assert f'{duration}_bucket{{endpoint="user",le="0.25"}} 1' in lines
+        assert f'{duration}_bucket{{endpoint="user",le="30"}} 1' in lines
+        assert f'{duration}_bucket{{endpoint="user",le="+Inf"}} 2' in lines
+        assert f'{duration}_sum{{endpoint="user"}} 60.2' in lines
+        assert f'{duration}_count{{endpoint="user"}} 2' in lines
+
+        Metrics.write(tmp_path / "reviewcheck.prom")
+        assert (tmp_path / "reviewcheck.prom").read_text() == text
+
+        port = Metrics.serve(0)
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.read().decode() == text
+    finally:
+        if Metrics.server is not None:
+            Metrics.server.shutdown()
+            Metrics.server = None
+        Metrics.reset()
@@ -0,0 +1,77 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the note_sync.py file."""
+from copy import deepcopy
+from typing import Any, Dict, List
+
+from reviewcheck.note_sync import NoteSync
+
+
+def make_note(id: int, updated_at: str, **kwargs: Any) -> Dict[str, Any]:
+    """Return a note with the given ID and update time."""
+    note = {
+        "id": id,
+        "author": {"username": "johndoe", "name": "John Doe"},
+        "body": f"note {id}",
+        "updated_at": updated_at,
+        "system": False,
+        "type": "DiscussionNote",
+        "resolvable": True,
+        "resolved": False,
+    }
+    note.update(kwargs)
+    return note
+
+
+discussions: List[Dict[str, Any]] = [
+    {
+        "id": "a",
+        "individual_note": False,
+        "notes": [
+            make_note(1, "2022-01-01T10:00:00.000Z"),
+            make_note(2, "2022-01-01T11:00:00.000Z"),
+        ],
+    }
+]
+
+
+def test_merge_edited_and_resolved_notes() -> None:
+    """Test that changes to known notes are merged in place."""
+    synced = deepcopy(discussions)
+    edited = make_note(2, "2022-01-02T10:00:00.000Z", body="edited", resolved=True)
+
+    assert NoteSync.merge(synced, [edited])
+    assert synced[0]["notes"][1]["body"] == "edited"
+    # The resolved state applies to the whole thread
+    assert synced[0]["notes"][0]["resolved"]
+    assert NoteSync.newest_update(synced) == "2022-01-02T10:00:00.000Z"
+
+
+def test_merge_new_notes() -> None:
+    """Test that new notes are added to their threads.
+
+    Notes outside of threads are added as threads of their own. A new
+    note that may belong to a thread can only be merged if it tells
+    which thread, and that thread is stored.
+    """
+    synced = deepcopy(discussions)
+    system_note = make_note(
+        3, "2022-01-02T10:00:00.000Z", system=True, type=None, resolvable=False
+    )
+    assert NoteSync.merge(synced, [system_note])
+    assert len(synced) == 2
+    assert NoteSync.count_user_notes(synced) == 2
+
+    reply = make_note(4, "2022-01-03T10:00:00.000Z")
+    assert not NoteSync.merge(synced, [reply])
+
+    reply = make_note(5, "2022-01-03T11:00:00.000Z", discussion_id="a", resolved=True)
+    assert NoteSync.merge(synced, [reply])
+    assert len(synced) == 2
+    assert [note["id"] for note in synced[0]["notes"]] == [1, 2, 5]
+    assert synced[0]["notes"][0]["resolved"]
+    assert NoteSync.count_user_notes(synced) == 3
+
+    new_thread = make_note(6, "2022-01-03T12:00:00.000Z", discussion_id="b")
+    assert not NoteSync.merge(synced, [new_thread])
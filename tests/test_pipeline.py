@@ -0,0 +1,58 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the pipeline.py file."""
+import threading
+import time
+from typing import Iterator
+
+from reviewcheck.pipeline import Pipeline
+
+
+def test_results_keep_order_and_input_is_bounded() -> None:
+    """Test that results are ordered and the input is read lazily.
+
+    The pipeline should never have taken more items from the input than
+    have been consumed plus the maximum number of items in flight.
+    """
+    taken = 0
+    lock = threading.Lock()
+
+    def items() -> Iterator[int]:
+        nonlocal taken
+        for i in range(100):
+            with lock:
+                taken += 1
+            yield i
+
+    def process(i: int) -> int:
+        # Make later items finish first
+        time.sleep((100 - i) / 100000)
+        return i * 2
+
+    results = []
+    for result in Pipeline(process, workers=4, max_in_flight=8).run(items()):
+        results.append(result)
+        assert taken <= len(results) + 8
+
+    assert results == [i * 2 for i in range(100)]
+
+
+def test_deadline_returns_what_is_done() -> None:
+    """Test that items not done by the deadline are kept as missed."""
+    # Every third item stalls until the run has returned
+    returned = threading.Event()
+
+    def process(i: int) -> int:
+        if i % 3 == 0:
+            returned.wait(timeout=10)
+        return i
+
+    pipeline = Pipeline(process, workers=4, max_in_flight=4)
+    try:
+        results = list(pipeline.run(range(10), deadline=time.monotonic() + 0.2))
+    finally:
+        returned.set()
+
+    assert sorted(results + pipeline.missed) == list(range(10))
+    assert 0 in pipeline.missed
@@ -0,0 +1,73 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the prefilter.py file."""
+from copy import deepcopy
+
+from reviewcheck.merge_request import MergeRequest
+from reviewcheck.prefilter import PreFilter
+from reviewcheck.reactions import ReactionResolver
+from tests.test_merge_requests import sample_mr, sample_mr_response
+
+
+def test_unknown_mr_is_downloaded() -> None:
+    """Test that MRs without history are always downloaded."""
+    assert PreFilter("JANEDOE").downloads_needed(sample_mr) == (True, True)
+
+
+def test_uninvolved_mr_is_skipped_until_it_changes() -> None:
+    """Test that an MR the user is not involved in is skipped.
+
+    The MR should be downloaded again once the number of notes or the
+    update time changes, since a new or edited note could mention the
+    user.
+    """
+    prefilter = PreFilter("JANEDOE", reactions=ReactionResolver("token", "api"))
+    mr = MergeRequest(sample_mr_response, [], sample_mr, "JANEDOE")
+    prefilter.record(mr, sample_mr, True)
+    assert prefilter.downloads_needed(sample_mr) == (False, False)
+
+    updated_mr = deepcopy(sample_mr)
+    updated_mr["user_notes_count"] += 1
+    assert prefilter.downloads_needed(updated_mr) == (True, False)
+
+    # A note edited to mention the user only changes the update time
+    edited_mr = deepcopy(sample_mr)
+    edited_mr["updated_at"] = "2022-01-02T00:00:00.000+02:00"
+    assert prefilter.downloads_needed(edited_mr) == (True, False)
+
+
+def test_mr_without_notes_needs_no_threads() -> None:
+    """Test that threads are never downloaded for MRs without notes."""
+    mr = deepcopy(sample_mr)
+    mr["user_notes_count"] = 0
+    mr["author"]["username"] = "janedoe"
+    assert PreFilter("JANEDOE").downloads_needed(mr) == (False, False)
+
+
+def test_new_reaction_is_noticed() -> None:
+    """Test that a reaction that is not a vote is noticed.
+
+    Such a reaction does not change the listed MR, so it is only seen
+    from the lists of the ReactionResolver, or by downloading the
+    reactions of the MR.
+    """
+    resolver = ReactionResolver("token", "api")
+    prefilter = PreFilter("JANEDOE", reactions=resolver)
+    mr = MergeRequest(sample_mr_response, [], sample_mr, "JANEDOE")
+    prefilter.record(mr, sample_mr, True)
+    assert prefilter.downloads_needed(sample_mr) == (False, False)
+
+    resolver.reacted.add(sample_mr["web_url"])
+    assert prefilter.downloads_needed(sample_mr) == (False, True)
+    resolver.upvoted.add(sample_mr["web_url"])
+    assert prefilter.downloads_needed(sample_mr) == (False, False)
+
+    # Without the lists, the reactions are always downloaded
+    prefilter = PreFilter("JANEDOE", prefilter.history)
+    assert prefilter.downloads_needed(sample_mr) == (False, True)
+
+    # The reactions of an MR by the user are listed in its info box
+    authored = deepcopy(sample_mr)
+    authored["author"]["username"] = "janedoe"
+    assert PreFilter("JANEDOE").downloads_needed(authored) == (True, True)
@@ -0,0 +1,49 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the prerender.py file."""
+import io
+from typing import Any, Dict
+
+from rich.console import Console
+
+from benchmarks import synthetic
+from reviewcheck.app import merge_request_renderables
+from reviewcheck.merge_request import MergeRequest
+from reviewcheck.prerender import PreRenderer
+
+config: Dict[str, Any] = {
+    "user": synthetic.USER,
+    "jira_url": "https://jira.example.com",
+    "show_all_discussions": True,
+    "hide_replied_discussions": False,
+    "changes_only": False,
+    "fold_notes": False,
+    "output_width": 100,
+}
+
+
+def test_output_is_the_same_as_printing_directly() -> None:
+    """Test that rendering in processes gives identical output."""
+    mrs = [
+        MergeRequest(
+            synthetic.discussions(5, 3, 200, involvement=0.5, seed=i),
+            [],
+            synthetic.merge_request(i),
+            synthetic.USER,
+        )
+        for i in range(6)
+    ]
+    outputs = []
+    for processes in (1, 3):
+        terminal = io.StringIO()
+        console = Console(file=terminal, width=120, force_terminal=True)
+        with PreRenderer(
+            console, processes, merge_request_renderables, config
+        ) as renderer:
+            for mr in mrs:
+                renderer.submit(mr)
+        outputs.append(terminal.getvalue())
+
+    assert "Discussion link" in outputs[0]
+    assert outputs[1] == outputs[0]
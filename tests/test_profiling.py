@@ -0,0 +1,55 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the profiling.py file."""
+import pstats
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from reviewcheck.constants import Constants
+from reviewcheck.profiling import Profiler
+
+
+def allocate_in_worker() -> List[str]:
+    """Allocate some memory, like a download in a worker thread."""
+    return [str(i) * 10 for i in range(10000)]
+
+
+def test_profile(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that all threads and phases are profiled and reported."""
+    monkeypatch.setattr(Constants, "PROFILE_DIR", tmp_path / "profile")
+    Profiler.start(["cpu", "memory"])
+    Profiler.phase("listing")
+    Profiler.phase("fetching")
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        kept = executor.submit(allocate_in_worker).result()
+    Profiler.phase("saving")
+    summary = Profiler.stop()
+    assert kept
+
+    assert summary is not None
+    assert [line.split()[0] for line in summary.splitlines()[3:7]] == [
+        "startup",
+        "listing",
+        "fetching",
+        "saving",
+    ]
+    assert "Allocations growing the most while fetching:" in summary
+    assert "test_profiling.py" in summary
+    stats = pstats.Stats(str(tmp_path / "profile" / "cpu.pstats"))
+    assert any(
+        function == "allocate_in_worker"
+        for _, _, function in stats.stats  # type: ignore[attr-defined]
+    )
+    assert len(list((tmp_path / "profile").glob("memory-*.tracemalloc"))) == 4
+    assert (tmp_path / "profile" / "summary.txt").read_text() == summary
+    assert not tracemalloc.is_tracing()
+
+    # Nothing is done unless profiling
+    Profiler.start([])
+    Profiler.phase("listing")
+    assert Profiler.stop() is None
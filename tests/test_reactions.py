@@ -0,0 +1,119 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the reactions.py file."""
+from copy import deepcopy
+from pathlib import Path
+
+import pytest
+
+from reviewcheck.constants import Constants
+from reviewcheck.merge_request import MergeRequest
+from reviewcheck.reactions import ReactionResolver
+from reviewcheck.utils import Utils
+from tests.test_merge_requests import sample_mr
+from tests.test_transport import FakeTransport
+
+api_url = "https://gitlab/api/v4"
+list_url = (
+    f"{api_url}/projects/500/merge_requests?state=opened&per_page=100"
+    "&my_reaction_emoji="
+)
+award_url = f"{api_url}/projects/500/merge_requests/300/award_emoji?per_page=100"
+reaction = {"name": "eyes", "user": {"username": "JANEDOE", "name": "Jane"}}
+
+
+def test_reactions_are_only_downloaded_for_shown_mrs(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that the user's reactions come from the MR lists."""
+    monkeypatch.setattr(Constants, "REACTIONS_PATH", tmp_path / "reactions.json")
+    transport = FakeTransport(
+        {
+            f"{api_url}/user": {"username": "janedoe"},
+            f"{list_url}Any": [sample_mr],
+            f"{list_url}thumbsup": [],
+            award_url: [reaction],
+        }
+    )
+    Utils.set_transport(transport)
+    Utils.set_timeouts(Constants.REQUEST_TIMEOUT, None)
+    config = {
+        "api_url": "https://gitlab",
+        "secret_token": "token",
+        "user": "JANEDOE",
+    }
+    try:
+        resolver = ReactionResolver.create(config, [500])
+        assert resolver is not None
+        mr = MergeRequest([], None, sample_mr, "JANEDOE")
+        resolver.resolve(mr, sample_mr, False)
+        # Shown since the user reacted without upvoting
+        assert mr.user_reacted_but_no_upvote()
+        assert mr.print_reactors() == "Jane"
+        resolver.save({sample_mr["web_url"]})
+
+        # The stored reactions are used while the votes are the same
+        resolver = ReactionResolver.create(config, [500])
+        assert resolver is not None
+        transport.requested.clear()
+        resolver.resolve(MergeRequest([], None, sample_mr, "JANEDOE"), sample_mr, False)
+        assert award_url not in transport.requested
+
+        upvoted = deepcopy(sample_mr)
+        upvoted["upvotes"] += 1
+        transport.pages[f"{list_url}thumbsup"] = [upvoted]
+        resolver = ReactionResolver.create(config, [500])
+        assert resolver is not None
+        transport.requested.clear()
+        mr = MergeRequest([], None, upvoted, "JANEDOE")
+        resolver.resolve(mr, upvoted, False)
+        # Not shown, so the reactions are not needed
+        assert not mr.needs_attention(False)
+        assert award_url not in transport.requested
+
+        config["user"] = "JOHNDOE"
+        assert ReactionResolver.create(config, [500]) is None
+    finally:
+        Utils.transport = None
+
+
+def test_reactions_keep_the_listed_votes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that downloading the reactions keeps what the lists tell.
+
+    GitLab returns the username in lowercase, while the configured user
+    is in uppercase, so the reactions alone would not tell that the
+    user has reacted.
+    """
+    monkeypatch.setattr(Constants, "REACTIONS_PATH", tmp_path / "reactions.json")
+    lowercase_reaction = {
+        "name": "eyes",
+        "user": {"username": "janedoe", "name": "Jane"},
+    }
+    transport = FakeTransport(
+        {
+            f"{api_url}/user": {"username": "janedoe"},
+            f"{list_url}Any": [sample_mr],
+            f"{list_url}thumbsup": [],
+            award_url: [lowercase_reaction],
+        }
+    )
+    Utils.set_transport(transport)
+    Utils.set_timeouts(Constants.REQUEST_TIMEOUT, None)
+    config = {
+        "api_url": "https://gitlab",
+        "secret_token": "token",
+        "user": "JANEDOE",
+    }
+    try:
+        resolver = ReactionResolver.create(config, [500])
+        assert resolver is not None
+        mr = MergeRequest([], None, sample_mr, "JANEDOE")
+        resolver.resolve(mr, sample_mr, False)
+        assert award_url in transport.requested
+        assert mr.user_reacted_but_no_upvote()
+        assert mr.print_reactors() == "Jane"
+    finally:
+        Utils.transport = None
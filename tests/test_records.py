@@ -0,0 +1,31 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the records.py file."""
+import json
+from copy import deepcopy
+
+from reviewcheck.merge_request import MergeRequest
+from reviewcheck.records import RecordGenerator
+from tests.test_merge_requests import sample_mr, sample_mr_response
+
+
+def test_thread_record_needs_reply() -> None:
+    """Test that thread records tell whether the user needs to reply."""
+    threads = deepcopy(sample_mr_response)
+    threads[0]["notes"][0]["resolved"] = False
+    threads[0]["notes"][0]["body"] = "@JANEDOE there is a bug"
+    mr = MergeRequest(threads, [], sample_mr, "JANEDOE")
+
+    assert mr.needs_attention(show_all_discussions=False)
+    records = [RecordGenerator.merge_request_record(mr)] + [
+        RecordGenerator.thread_record(mr, thread)
+        for thread in mr.visible_threads(hide_replied_discussions=True)
+    ]
+
+    # All records should be serializable
+    records = json.loads(json.dumps(records))
+    assert [record["type"] for record in records] == ["merge_request", "thread"]
+    assert records[0]["open_threads_needing_reply"] == 1
+    assert records[1]["needs_reply"]
+    assert records[1]["web_url"] == f"{sample_mr['web_url']}#note_100000"
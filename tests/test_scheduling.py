@@ -0,0 +1,47 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the scheduling.py file."""
+from copy import deepcopy
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+from reviewcheck.scheduling import Scheduler
+from tests.test_merge_requests import sample_mr
+
+
+def make_mr(iid: int, updated_at: str, **kwargs: Any) -> Dict[str, Any]:
+    """Return a copy of the sample MR with some fields replaced."""
+    mr = deepcopy(sample_mr)
+    mr["iid"] = iid
+    mr["updated_at"] = updated_at
+    mr.update(kwargs)
+    return mr
+
+
+def test_priority_of_roles() -> None:
+    """Test that authors outrank reviewers, who outrank assignees."""
+    now = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    person = {"username": "janedoe"}
+    author = make_mr(1, "2021-01-01T00:00:00.000Z", author=person)
+    reviewer = make_mr(2, "2021-01-01T00:00:00.000Z", reviewers=[person])
+    assignee = make_mr(3, "2021-01-01T00:00:00.000Z", assignees=[person])
+    other = make_mr(4, "2021-12-31T23:00:00.000Z")
+
+    # The configured username is uppercase, but should still match
+    priorities = [
+        Scheduler.priority(mr, "JANEDOE", now)
+        for mr in [author, reviewer, assignee, other]
+    ]
+    assert priorities == sorted(priorities, reverse=True)
+    assert priorities[-1] > 0
+
+
+def test_order_falls_back_to_update_time() -> None:
+    """Test that MRs of equal priority are sorted by update time."""
+    old = make_mr(1, "2020-01-01T00:00:00.000+02:00")
+    new = make_mr(2, "2020-06-01T00:00:00.000+02:00")
+    mine = make_mr(3, "2019-01-01T00:00:00.000Z", reviewers=[{"username": "JD"}])
+
+    ordered = Scheduler.order([old, new, mine], "JD")
+    assert [mr["iid"] for mr in ordered] == [3, 2, 1]
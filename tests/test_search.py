@@ -0,0 +1,109 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the search.py file."""
+import time
+from copy import deepcopy
+from pathlib import Path
+
+import pytest
+
+from reviewcheck.exceptions import RCException
+from reviewcheck.search import SearchIndex
+from tests.test_merge_requests import sample_mr, sample_mr_response
+
+
+def test_notes_are_indexed_incrementally(tmp_path: Path) -> None:
+    """Test that only new, edited and deleted notes are written."""
+    threads = deepcopy(sample_mr_response)
+    threads[0]["notes"][0]["system"] = False
+    threads[0]["notes"][0]["body"] = "The parser leaks memory on retries"
+    with SearchIndex(tmp_path / "search.sqlite") as index:
+        assert index.connection is not None
+        index.add(sample_mr, threads)
+        written = index.connection.total_changes
+        assert written > 0
+
+        # Nothing changed, or the threads were not downloaded
+        index.add(sample_mr, threads)
+        index.add(sample_mr, None)
+        assert index.connection.total_changes == written
+
+        (thread,) = index.search("leaks", 10)
+        assert thread["web_url"] == sample_mr["web_url"]
+        (note,) = thread["notes"]
+        assert note["link"] == f"{sample_mr['web_url']}#note_100000"
+        start, end = SearchIndex.MARKS
+        assert f"{start}leaks{end}" in note["snippet"]
+
+        # An edit replaces the old body
+        threads[0]["notes"][0]["body"] = "The parser is fixed"
+        threads[0]["notes"][0]["updated_at"] = "2022-12-16T20:00:00.000+01:00"
+        index.add(sample_mr, threads)
+        assert index.search("leaks", 10) == []
+        assert len(index.search("pars*", 10)) == 1
+
+        # Words that are not a valid query are searched for as words
+        assert len(index.search('"parser fixed', 10)) == 1
+        with pytest.raises(RCException):
+            index.search(" ", 10)
+
+        # Deleted notes are removed
+        index.add(sample_mr, [])
+        assert index.search("parser", 10) == []
+
+
+def test_search_limit(tmp_path: Path) -> None:
+    """Test that at most the given number of threads are returned."""
+    threads = deepcopy(sample_mr_response)
+    threads[0]["notes"][0]["system"] = False
+    with SearchIndex(tmp_path / "search.sqlite") as index:
+        for iid in range(3):
+            mr = dict(sample_mr, iid=iid, web_url=f"{sample_mr['web_url']}{iid}")
+            index.add(mr, threads)
+        assert len(index.search("bug", 2)) == 2
+        assert len(index.search("bug", 5)) == 3
+
+        # The limit is on threads, each with all its matching notes
+        reply = dict(threads[0]["notes"][0], id=100001, body="Another bug")
+        threads[0]["notes"].append(reply)
+        index.add(mr, threads)
+        (thread,) = index.search("another bug", 1)
+        assert len(thread["notes"]) == 1
+        assert len(index.search("bug", 1)[0]["notes"]) == 2
+
+
+def test_notes_of_old_merge_requests_are_pruned(tmp_path: Path) -> None:
+    """Test that notes are kept until their MR is not seen for long."""
+    threads = deepcopy(sample_mr_response)
+    threads[0]["notes"][0]["system"] = False
+    day = 24 * 60 * 60
+    open_mr = dict(sample_mr, web_url=f"{sample_mr['web_url']}1")
+    closed_mr = dict(sample_mr, web_url=f"{sample_mr['web_url']}2")
+    with SearchIndex(tmp_path / "search.sqlite") as index:
+        index.add(open_mr, threads)
+        index.add(closed_mr, threads)
+        now = time.time()
+
+        # The closed MR is kept for the retention period
+        index.prune([open_mr["web_url"]], 30, now + 29 * day)
+        assert len(index.search("bug", 10)) == 2
+        index.prune([open_mr["web_url"]], 30, now + 31 * day)
+        (thread,) = index.search("bug", 10)
+        assert thread["web_url"] == open_mr["web_url"]
+
+        # Open MRs are kept however long ago they were downloaded
+        index.prune([open_mr["web_url"]], 30, now + 365 * day)
+        assert len(index.search("bug", 10)) == 1
+        index.prune([], 30, now + 396 * day)
+        assert index.search("bug", 10) == []
+
+
+def test_turned_off(tmp_path: Path) -> None:
+    """Test that nothing is written when the index is turned off."""
+    with SearchIndex(tmp_path / "search.sqlite", enabled=False) as index:
+        index.add(sample_mr, sample_mr_response)
+        index.prune([sample_mr["web_url"]], 30)
+        with pytest.raises(RCException):
+            index.search("bug", 10)
+    assert not (tmp_path / "search.sqlite").exists()
@@ -0,0 +1,37 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the snapshot.py file."""
+import time
+from pathlib import Path
+
+import pytest
+
+from reviewcheck.constants import Constants
+from reviewcheck.merge_request import MergeRequest
+from reviewcheck.snapshot import Snapshot
+from tests.test_merge_requests import sample_mr, sample_mr_response
+
+
+def test_snapshot_round_trip(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a snapshot is read back for the same user only."""
+    monkeypatch.setattr(Constants, "SNAPSHOT_PATH", tmp_path / "snapshot.json")
+    assert Snapshot.load("janedoe") is None
+
+    mr = MergeRequest(sample_mr_response, [], sample_mr, "janedoe")
+    Snapshot.save("janedoe", [mr])
+    snapshot = Snapshot.load("janedoe")
+    assert snapshot is not None
+    [restored] = snapshot.merge_requests
+    assert restored.web_url == mr.web_url
+    assert restored.title == mr.title
+    assert restored.threads == mr.threads
+    assert Snapshot.load("johndoe") is None
+
+
+def test_snapshot_age() -> None:
+    """Test how the age of a snapshot is described."""
+    assert Snapshot(time.time(), []).age().endswith("less than a minute ago")
+    assert Snapshot(time.time() - 60, []).age().endswith(", 1 minute ago")
+    assert Snapshot(time.time() - 3 * 3600, []).age().endswith(", 3 hours ago")
+    assert Snapshot(time.time() - 2 * 86400, []).age().endswith(", 2 days ago")
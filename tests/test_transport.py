@@ -0,0 +1,99 @@
+# Copyright 2024 Volvo Car Corporation
+# Licensed under Apache 2.0.
+
+"""Tests for the transport.py file."""
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from reviewcheck.constants import Constants
+from reviewcheck.exceptions import RCException
+from reviewcheck.transport import Transport, TransportResponse
+from reviewcheck.utils import Utils
+
+
+class FakeTransport(Transport):
+    """A transport answering from a dict of pages instead of GitLab."""
+
+    def __init__(self, pages: Dict[str, Any], status_code: int = 200):
+        """Initialize a FakeTransport object.
+
+        :param pages: The data to answer with for each URL. Further
+            pages of a URL are given as the URL followed by &page=N.
+        """
+        self.pages = pages
+        self.status_code = status_code
+        self.requested: List[str] = []
+
+    def get(
+        self, url: str, headers: Dict[str, str], timeout: Optional[float] = None
+    ) -> TransportResponse:
+        """Return the page for the URL."""
+        self.requested.append(url)
+        return TransportResponse(
+            url,
+            self.status_code,
+            {
+                "X-Total-Pages": str(
+                    1 + sum(key.startswith(f"{url}&page=") for key in self.pages)
+                )
+            },
+            json.dumps(self.pages[url]).encode(),
+            0.0,
+        )
+
+
+def test_download_goes_through_transport() -> None:
+    """Test that pages are downloaded with the configured transport."""
+    url = "https://gitlab/api/v4/projects/1/merge_requests?per_page=2"
+    transport = FakeTransport(
+        {url: [{"id": 1}, {"id": 2}], f"{url}&page=2": [{"id": 3}]}
+    )
+    Utils.set_transport(transport)
+    try:
+        assert Utils.download_gitlab_data("token", url) == [
+            {"id": 1},
+            {"id": 2},
+            {"id": 3},
+        ]
+        assert transport.requested == [url, f"{url}&page=2"]
+
+        transport.status_code = 404
+        with pytest.raises(RCException):
+            Utils.download_gitlab_data("token", url)
+    finally:
+        Utils.transport = None
+
+
+def test_server_error_backs_off(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that GitLab is given a break after a server error.
+
+    The break should never last past the deadline.
+    """
+    url = "https://gitlab/api/v4/projects/1/merge_requests?per_page=2"
+    sleeps: List[float] = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    Utils.set_transport(FakeTransport({url: []}, status_code=503))
+    try:
+        Utils.set_timeouts(Constants.REQUEST_TIMEOUT, None)
+        with pytest.raises(RCException):
+            Utils.download_gitlab_data("token", url)
+        assert sleeps == [Constants.SERVER_ERROR_BACKOFF]
+
+        Utils.set_timeouts(Constants.REQUEST_TIMEOUT, 1)
+        with pytest.raises(RCException):
+            Utils.download_gitlab_data("token", url)
+        assert 0 < sleeps[1] <= 1
+    finally:
+        Utils.transport = None
+        Utils.set_timeouts(Constants.REQUEST_TIMEOUT, None)
+
+
+def test_unknown_transport() -> None:
+    """Test that an unknown transport name is reported."""
+    with pytest.raises(RCException):
+        Transport.create("carrier-pigeon")
+    with pytest.raises(TypeError):
+        Transport()  # type: ignore[abstract]